@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+端到端下载基准 (离线)
+
+在子进程中启动本地假报纸服务器 (benchmarks/fake_server.py)，把各报纸网站的
+请求转到本地，然后用 EditionPipeline 逐期下载、校验、合并 (包括缩略图、
+全文索引等后续步骤)，报告每个平台的期/分钟、版/秒和 CPU 时间。服务器运行
+在单独的进程中，CPU 时间只统计下载端。
+
+--record 把这次的网络交互 (包括注入的失败) 录制为磁带，之后用 --replay
+回放，不启动服务器，各版本之间的网络行为完全相同。
+
+用法:
+    python benchmarks/bench_download.py --editions 5 --pages 8
+    python benchmarks/bench_download.py --latency 0.05 --bandwidth 2000000 --failure-rate 0.1
+    python benchmarks/bench_download.py --failure-rate 0.1 --record /tmp/cassette
+    python benchmarks/bench_download.py --replay /tmp/cassette --timing recorded
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_server import (
+    FAILURE_MODES, FakeNewspaperServer, HostRewriteAdapter, redirect_hosts, restore_hosts,
+)
+from src.config import config
+from src.downloaders import get_available_platforms, get_downloader
+from src.downloaders.cassette import TIMING_MODES, start_recording, start_replay, stop_cassette
+from src.pipeline import EditionPipeline
+from src.utils import StorageManager
+from src.utils.metrics import metrics
+
+
+def serve(options: dict, ready):
+    """子进程入口：启动服务器并把端口号放入 ready 队列"""
+    server = FakeNewspaperServer(**options).start()
+    ready.put(server.port)
+    while True:
+        time.sleep(3600)
+
+
+def run_platform(platform_id: str, dates: list, base_path: str) -> dict:
+    storage = StorageManager(os.path.join(base_path, platform_id))
+    downloader = get_downloader(platform_id, config)
+    pipeline = EditionPipeline(platform_id, storage, verbose=False)
+    since = metrics.checkpoint()
+
+    editions = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        for day in dates:
+            success, _ = pipeline.run(downloader, day)
+            editions += bool(success)
+    finally:
+        downloader.close()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    fetches = metrics.summary(since)["histograms"].get("newspaper_fetch_seconds", [])
+    pages = sum(item["count"] for item in fetches if item["labels"].get("platform") == platform_id)
+    return {"editions": editions, "pages": pages, "wall": wall, "cpu": cpu}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端下载基准 (本地假服务器)")
+    parser.add_argument("--platforms", nargs="*", default=get_available_platforms(), help="平台ID，默认全部")
+    parser.add_argument("--editions", type=int, default=5, help="每个平台下载的期数")
+    parser.add_argument("--pages", type=int, default=8, help="每期版面数")
+    parser.add_argument("--page-kb", type=int, default=256, help="每个 PDF 版面额外的图片数据大小 (KB)")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个响应的延迟 (秒)")
+    parser.add_argument("--bandwidth", type=int, default=0, help="每个连接的带宽上限 (字节/秒)，0 表示不限")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="版面请求失败比例 (0~1)")
+    parser.add_argument("--failure-mode", choices=FAILURE_MODES, default="status", help="失败方式")
+    parser.add_argument("--auto-tune", action="store_true", help="开启并发自动调整 (download.auto_tune)")
+    parser.add_argument("--end-date", help="最后一期的日期 YYYY-MM-DD (默认昨天)；回放时需与录制时相同")
+    parser.add_argument("--record", metavar="DIR", help="把网络交互录制到磁带目录")
+    parser.add_argument("--replay", metavar="DIR", help="从磁带目录回放，不启动服务器")
+    parser.add_argument("--timing", choices=TIMING_MODES, default="recorded",
+                        help="回放的响应时间；synthetic 使用 --latency 和 --bandwidth")
+    args = parser.parse_args()
+
+    if args.auto_tune:
+        config._config["download"]["auto_tune"] = True
+
+    options = {
+        "pages": args.pages,
+        "latency": args.latency,
+        "bandwidth": args.bandwidth,
+        "failure_rate": args.failure_rate,
+        "failure_mode": args.failure_mode,
+        "page_kb": args.page_kb,
+    }
+    server = None
+    if args.replay:
+        cassette = start_replay(args.replay, timing=args.timing, latency=args.latency, bandwidth=args.bandwidth)
+        print(f"回放 {args.replay}: {cassette.stats()['interactions']} 个请求, 时间模式 {args.timing}")
+    else:
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(options, ready), daemon=True)
+        server.start()
+        port = ready.get(timeout=30)
+        if args.record:
+            start_recording(args.record, inner=HostRewriteAdapter(port))
+        else:
+            redirect_hosts(port)
+        print(f"每平台 {args.editions} 期 x {args.pages} 版, 延迟 {args.latency}s, "
+              f"带宽 {args.bandwidth or '不限'}, 失败率 {args.failure_rate} ({args.failure_mode})")
+
+    # 从最后一期往前连续取日期，假服务器每天都有报纸
+    end = date.fromisoformat(args.end_date) if args.end_date else date.today() - timedelta(days=1)
+    dates = [(end - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(args.editions)]
+
+    print(f"{'平台':<14}{'成功期数':>8}{'版面':>6}{'耗时(s)':>10}{'期/分钟':>10}{'版/秒':>9}{'CPU(s)':>9}{'CPU/期(s)':>11}")
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for platform_id in args.platforms:
+                result = run_platform(platform_id, dates, work_dir)
+                wall = result["wall"] or 1e-9
+                per_edition = result["cpu"] / result["editions"] if result["editions"] else 0.0
+                print(f"{platform_id:<14}{result['editions']:>8}{result['pages']:>6}{wall:>10.2f}"
+                      f"{result['editions'] * 60 / wall:>10.1f}{result['pages'] / wall:>9.1f}"
+                      f"{result['cpu']:>9.2f}{per_edition:>11.3f}")
+    finally:
+        cassette = stop_cassette()
+        restore_hosts()
+        if server is not None:
+            server.terminate()
+    if cassette is not None and args.record:
+        stats = cassette.stats()
+        print(f"已录制 {stats['interactions']} 个请求, {stats['bodies']} 个不同的响应内容 "
+              f"({stats['body_bytes'] / 1048576:.1f} MB, 去重前 {stats['response_bytes'] / 1048576:.1f} MB)")
+    elif cassette is not None and cassette.misses:
+        print(f"回放时有 {cassette.misses} 个请求不在录制中")
+
+
+if __name__ == "__main__":
+    main()
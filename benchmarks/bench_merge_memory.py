@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+PDF 合并内存基准
+
+生成 N 期人民日报式的日报 PDF，把它们合并为一个月卷，分别用
+PdfWriter 一次性合并、流式合并和带去重优化的流式合并，比较
+tracemalloc 峰值、耗时和输出大小。
+
+用法:
+    python benchmarks/bench_merge_memory.py --issues 30 --pages 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_font_program, make_rmrb_page
+from src.utils.pdf_tools import merge_pdfs
+
+
+def build_issues(work_dir: str, issues: int, pages: int, image_kb: int) -> list:
+    font_program = make_font_program()
+    issue_files = []
+    for issue in range(1, issues + 1):
+        page_files = []
+        for page in range(1, pages + 1):
+            path = os.path.join(work_dir, f"issue{issue:02d}_page{page:02d}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_rmrb_page(page, font_program=font_program,
+                                       image_size=image_kb * 1024))
+            page_files.append(path)
+        issue_path = os.path.join(work_dir, f"rmrb_{issue:02d}.pdf")
+        merge_pdfs(page_files, issue_path, streaming=True)
+        for path in page_files:
+            os.remove(path)
+        issue_files.append(issue_path)
+    return issue_files
+
+
+def measure(issue_files: list, output_path: str, streaming: bool, optimize: bool = False) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    merge_pdfs(issue_files, output_path, streaming=streaming, optimize=optimize)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, os.path.getsize(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 合并内存基准")
+    parser.add_argument("--issues", type=int, default=30, help="期数")
+    parser.add_argument("--pages", type=int, default=8, help="每期版面数")
+    parser.add_argument("--image-kb", type=int, default=256, help="每版图片数据大小 (KB)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        issue_files = build_issues(work_dir, args.issues, args.pages, args.image_kb)
+        input_size = sum(os.path.getsize(p) for p in issue_files)
+        print(f"输入: {args.issues} 期 x {args.pages} 版, 共 {input_size / 1048576:.1f} MB")
+        print(f"{'模式':<10}{'峰值内存(MB)':>14}{'耗时(s)':>10}{'输出(MB)':>10}")
+        modes = (("PdfWriter", False, False), ("streaming", True, False), ("optimize", True, True))
+        for name, streaming, optimize in modes:
+            output_path = os.path.join(work_dir, f"volume_{name}.pdf")
+            peak, elapsed, size = measure(issue_files, output_path, streaming, optimize)
+            print(f"{name:<10}{peak / 1048576:>14.1f}{elapsed:>10.2f}{size / 1048576:>10.1f}")
+            os.remove(output_path)
+
+
+if __name__ == "__main__":
+    main()
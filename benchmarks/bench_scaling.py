@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+多核扩展基准 (离线)
+
+同时下载多份报纸 (每份一个线程，与补全相同)，比较解析和合并在下载线程中
+进行 (execution.mode = thread，受 GIL 限制) 和在 1..N 个进程中进行
+(execution.mode = process) 时的吞吐量。假报纸服务器运行在单独的进程中。
+
+默认关闭缩略图、全文索引和合订本，只比较 获取信息 → 下载 → 合并；
+--postprocess 保留这些步骤。
+
+用法:
+    python benchmarks/bench_scaling.py --editions 4 --pages 8
+    python benchmarks/bench_scaling.py --max-workers 8 --image-size 2400x3400
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_download import serve
+from benchmarks.fake_server import redirect_hosts, restore_hosts
+from src.backfill import Gap, prioritize, run_backfill
+from src.config import config
+from src.downloaders import get_available_platforms
+from src.utils import StorageManager
+from src.utils.process_pool import get_process_pool, shutdown_process_pool
+
+
+def run_batch(platforms: list, dates: list, mode: str, workers: int) -> dict:
+    config._config.setdefault("execution", {}).update({"mode": mode, "workers": workers})
+    shutdown_process_pool()
+    gaps = prioritize([[Gap(platform_id, day) for day in dates] for platform_id in platforms])
+    with tempfile.TemporaryDirectory() as work_dir:
+        storage = StorageManager(work_dir)
+        if mode == "process":
+            # 预先启动子进程，不计入耗时
+            pool = get_process_pool(workers)
+            list(pool.map(abs, range(workers * 2)))
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = run_backfill(storage, gaps, editions_per_minute=0)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+    return {"editions": len(result.succeeded), "failed": len(result.failed), "wall": wall, "cpu": cpu}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析与合并的多核扩展基准 (本地假服务器)")
+    parser.add_argument("--platforms", nargs="*", default=get_available_platforms(), help="平台ID，默认全部")
+    parser.add_argument("--editions", type=int, default=4, help="每个平台下载的期数")
+    parser.add_argument("--pages", type=int, default=8, help="每期版面数")
+    parser.add_argument("--page-kb", type=int, default=256, help="每个 PDF 版面额外的图片数据大小 (KB)")
+    parser.add_argument("--image-size", default="1600x2300", help="图片版面的尺寸 (宽x高)")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="最多使用的进程数")
+    parser.add_argument("--postprocess", action="store_true", help="保留缩略图、全文索引和合订本")
+    args = parser.parse_args()
+
+    if not args.postprocess:
+        config._config.setdefault("thumbnails", {})["enabled"] = False
+        config._config.setdefault("search", {})["auto_index"] = False
+        config._config.setdefault("volumes", {})["auto_update"] = False
+    config._config.setdefault("metrics", {})["enabled"] = False
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    options = {"pages": args.pages, "page_kb": args.page_kb, "image_size": (width, height)}
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(options, ready), daemon=True)
+    server.start()
+    redirect_hosts(ready.get(timeout=30))
+
+    end = date.today() - timedelta(days=1)
+    dates = [(end - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(args.editions)]
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+    runs = [("thread", 1)] + [("process", workers) for workers in counts]
+
+    print(f"{len(args.platforms)} 份报纸 x {args.editions} 期 x {args.pages} 版, CPU 核数 {os.cpu_count()}")
+    print(f"{'方式':<10}{'进程':>6}{'成功':>6}{'失败':>6}{'耗时(s)':>10}{'期/分钟':>10}{'加速比':>8}{'主进程CPU(s)':>14}")
+    baseline = None
+    try:
+        for mode, workers in runs:
+            result = run_batch(args.platforms, dates, mode, workers)
+            wall = result["wall"] or 1e-9
+            throughput = result["editions"] * 60 / wall
+            baseline = baseline or throughput or 1e-9
+            print(f"{mode:<10}{workers if mode == 'process' else '-':>6}{result['editions']:>6}"
+                  f"{result['failed']:>6}{wall:>10.2f}{throughput:>10.1f}"
+                  f"{throughput / baseline:>8.2f}{result['cpu']:>14.2f}")
+    finally:
+        shutdown_process_pool()
+        restore_hosts()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# -*- coding: UTF-8 -*-
+"""
+本地假报纸服务器
+
+在 127.0.0.1 上按 Host 头模拟各报纸网站的页面结构，供离线测试和下载基准使用:
+
+- 人民日报 paper.people.com.cn: layout/index.html、layout/<yyyymm>/<dd>/node_NN.html，
+  版面 PDF 在 attachement/<yyyymm>/<dd>/<id>.pdf
+- 光明网 epaper.gmw.cn (光明日报 gmrb、文摘报 wzb、中华读书报 zhdsb):
+  <code>/html/layout/index.html 的 <ul id="list"> 版面列表，版面页中
+  <img id="map" src="....jpg.2">
+- 新华每日电讯 mrdx.cn: content/<yyyymmdd>/Page01BC.htm 中的 PageNNBC.jpg 版面图
+- 学习时报 paper.studytimes.cn: cntheory/<yyyy-mm>/<dd>/node_1.html 中的绝对 PDF 链接
+
+下载器里的网址是写死的，redirect_hosts() 通过下载器会话的适配器把这些
+网站的请求改发到本地端口 (保留原 Host 头)，下载器代码无需修改。
+
+可以模拟网络条件: 每个响应的延迟、每个连接的带宽上限，以及按比例对版面
+文件 (PDF/JPG) 注入失败 (503、断开连接或只发送一半数据)。
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from datetime import date as date_cls
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from benchmarks.fixtures import make_font_program, make_page_jpeg, make_rmrb_page
+from src.downloaders.base import mount_session_adapter, unmount_session_adapter
+
+SITE_HOSTS = ("paper.people.com.cn", "epaper.gmw.cn", "mrdx.cn", "paper.studytimes.cn")
+
+FAILURE_MODES = ("status", "reset", "truncate")
+
+# 限速时每次写出的最小字节数
+MIN_CHUNK = 1024
+
+
+def _edition_id(day: str, page: int) -> str:
+    """版面文件名中的十六进制 ID，末尾 4 位是版面号"""
+    return f"{hashlib.md5(day.encode()).hexdigest()[:8]}-{page:04d}"
+
+
+class HostRewriteAdapter(BaseAdapter):
+    """把请求改发到本地端口的 requests 适配器，Host 头保留原网站"""
+
+    def __init__(self, port: int):
+        super().__init__()
+        self.port = port
+        self._adapter = HTTPAdapter(pool_maxsize=32)
+
+    def send(self, request, **kwargs):
+        original_url = request.url
+        parts = urlsplit(original_url)
+        local = request.copy()
+        local.url = urlunsplit(("http", f"127.0.0.1:{self.port}", parts.path, parts.query, ""))
+        local.headers["Host"] = parts.netloc
+        response = self._adapter.send(local, **kwargs)
+        response.url = original_url
+        response.request = request
+        return response
+
+    def close(self):
+        # 多个下载器会话共用同一个适配器，会话关闭时不关闭连接池
+        pass
+
+    def shutdown(self):
+        self._adapter.close()
+
+
+_installed: List[Tuple[str, HostRewriteAdapter]] = []
+
+
+def redirect_hosts(port: int):
+    """之后创建的下载器把各报纸网站的请求发到本地 port"""
+    restore_hosts()
+    adapter = HostRewriteAdapter(port)
+    for host in SITE_HOSTS:
+        for scheme in ("http", "https"):
+            prefix = f"{scheme}://{host}/"
+            mount_session_adapter(prefix, adapter)
+            _installed.append((prefix, adapter))
+
+
+def restore_hosts():
+    adapters = {id(adapter): adapter for _, adapter in _installed}
+    for prefix, _ in _installed:
+        unmount_session_adapter(prefix)
+    _installed.clear()
+    for adapter in adapters.values():
+        adapter.shutdown()
+
+
+class FakeNewspaperServer:
+    """模拟各报纸网站的本地 HTTP 服务器
+
+    Args:
+        pages: 每期版面数
+        latency: 每个响应发送前的延迟 (秒)
+        bandwidth: 每个连接的带宽上限 (字节/秒)，0 表示不限
+        failure_rate: 版面文件请求失败的比例 (0~1)
+        failure_mode: 失败方式 status (返回 503) / reset (断开连接) / truncate (只发送一半数据)
+        image_size: 图片版版面的像素尺寸
+        page_kb: 每个 PDF 版面额外嵌入的图片数据大小 (KB)
+        today: 各网站首页 (最新一期) 的日期，默认今天
+        seed: 失败注入的随机种子
+    """
+
+    def __init__(
+        self,
+        pages: int = 8,
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        failure_rate: float = 0.0,
+        failure_mode: str = "status",
+        image_size: Tuple[int, int] = (1200, 1700),
+        page_kb: int = 0,
+        today: Optional[date_cls] = None,
+        seed: int = 0
+    ):
+        if failure_mode not in FAILURE_MODES:
+            raise ValueError(f"未知的失败方式: {failure_mode}")
+        self.pages = pages
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.image_size = image_size
+        self.page_kb = page_kb
+        self.today = today or date_cls.today()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies: Dict[tuple, bytes] = {}
+        self._font_program = make_font_program()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"requests": 0, "bytes": 0, "failures": 0}
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def start(self, port: int = 0) -> "FakeNewspaperServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-newspaper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def install(self):
+        """让之后创建的下载器连接本服务器"""
+        redirect_hosts(self.port)
+
+    def __enter__(self):
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        restore_hosts()
+        self.stop()
+        return False
+
+    def should_fail(self) -> bool:
+        if self.failure_rate <= 0:
+            return False
+        with self._lock:
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.stats["failures"] += 1
+        return fail
+
+    def pdf_page(self, page: int) -> bytes:
+        return self._cached(("pdf", page), lambda: make_rmrb_page(
+            page, font_program=self._font_program, image_size=self.page_kb * 1024
+        ))
+
+    def jpeg_page(self, page: int) -> bytes:
+        return self._cached(("jpg", page), lambda: make_page_jpeg(page, size=self.image_size))
+
+    def _cached(self, key: tuple, build) -> bytes:
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            body = build()
+            with self._lock:
+                self._bodies[key] = body
+        return body
+
+    def route(self, host: str, path: str) -> Optional[Tuple[str, bytes, bool]]:
+        """按网站和路径生成响应
+
+        Returns:
+            (Content-Type, 内容, 是否为版面文件)，找不到时为 None
+        """
+        host = host.split(":")[0]
+        if host == "paper.people.com.cn":
+            return self._route_rmrb(path)
+        if host == "epaper.gmw.cn":
+            return self._route_gmw(path)
+        if host == "mrdx.cn":
+            return self._route_mrdx(path)
+        if host == "paper.studytimes.cn":
+            return self._route_studytimes(path)
+        return None
+
+    def _page_range(self):
+        return range(1, self.pages + 1)
+
+    def _route_rmrb(self, path: str):
+        if path == "/rmrb/pc/layout/index.html":
+            day_path = self.today.strftime("%Y%m/%d")
+            links = "".join(f'<a href="{day_path}/node_{n:02d}.html">第{n:02d}版</a>' for n in self._page_range())
+            return _html(links)
+        match = re.fullmatch(r"/rmrb/pc/layout/(\d{6})/(\d{2})/node_(\d+)\.html", path)
+        if match:
+            month, day, page = match.group(1), match.group(2), int(match.group(3))
+            if page > self.pages:
+                return None
+            edition_id = _edition_id(month + day, page)
+            return _html(f'<a href="../../../attachement/{month}/{day}/{edition_id}.pdf">下载本版PDF</a>')
+        match = re.fullmatch(r"/rmrb/pc/attachement/\d{6}/\d{2}/[a-f0-9]+-(\d{4})\.pdf", path)
+        if match and 1 <= int(match.group(1)) <= self.pages:
+            return "application/pdf", self.pdf_page(int(match.group(1))), True
+        return None
+
+    def _route_gmw(self, path: str):
+        match = re.fullmatch(r"/(\w+)/html/layout/index\.html", path)
+        if match:
+            day_path = self.today.strftime("%Y%m/%d")
+            items = "".join(
+                f'<li><a href="{day_path}/node_{n:02d}.html">第{n:02d}版</a></li>' for n in self._page_range()
+            )
+            return _html(f'<ul id="list">{items}</ul>')
+        match = re.fullmatch(r"/(\w+)/html/layout/(\d{6})/(\d{2})/node_(\d+)\.html", path)
+        if match:
+            month, day, page = match.group(2), match.group(3), int(match.group(4))
+            if page > self.pages:
+                return None
+            return _html(
+                f'<div class="m-paper-version"><span class="mob-version">第{page:02d}版</span></div>'
+                f'<img id="map" src="../../../pic/{month}/{day}/{page:02d}/page_{page:02d}.jpg.2">'
+            )
+        match = re.fullmatch(r"/\w+/html/pic/\d{6}/\d{2}/\d{2}/page_(\d{2})\.jpg", path)
+        if match and 1 <= int(match.group(1)) <= self.pages:
+            return "image/jpeg", self.jpeg_page(int(match.group(1))), True
+        return None
+
+    def _route_mrdx(self, path: str):
+        match = re.fullmatch(r"/content/(\d{8})/Page01BC\.htm", path)
+        if match:
+            day = match.group(1)
+            images = "".join(f'<img src="../../images/{day}/Page{n:02d}BC.jpg">' for n in self._page_range())
+            return _html(images)
+        match = re.fullmatch(r"/images/\d{8}/Page(\d{2})BC\.jpg", path)
+        if match and 1 <= int(match.group(1)) <= self.pages:
+            return "image/jpeg", self.jpeg_page(int(match.group(1))), True
+        return None
+
+    def _route_studytimes(self, path: str):
+        if path == "/cntheory/":
+            return _html(f'<a href="./{self.today.strftime("%Y-%m/%d")}/node_1.html">最新一期</a>')
+        match = re.fullmatch(r"/cntheory/(\d{4}-\d{2})/(\d{2})/node_1\.html", path)
+        if match:
+            day = f"{match.group(1)}-{match.group(2)}"
+            links = "".join(
+                f'<a href="https://paper.studytimes.cn/files/Resource/yt/cntheory/{day}/{n:02d}/images/'
+                f'{n:02d}-{_edition_id(day, n)}.pdf">第{n}版</a>'
+                for n in self._page_range()
+            )
+            return _html(links)
+        match = re.fullmatch(
+            r"/files/Resource/yt/cntheory/\d{4}-\d{2}-\d{2}/\d{2}/images/\d{2}-[a-f0-9]+-(\d{4})\.pdf", path
+        )
+        if match and 1 <= int(match.group(1)) <= self.pages:
+            return "application/pdf", self.pdf_page(int(match.group(1))), True
+        return None
+
+
+def _html(body: str) -> Tuple[str, bytes, bool]:
+    page = f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body>{body}</body></html>"
+    return "text/html; charset=utf-8", page.encode("utf-8"), False
+
+
+def _make_handler(server: FakeNewspaperServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with server._lock:
+                server.stats["requests"] += 1
+            if server.latency:
+                time.sleep(server.latency)
+
+            result = server.route(self.headers.get("Host", ""), self.path.split("?")[0])
+            if result is None:
+                self._send(404, "text/html; charset=utf-8", b"<html>404</html>")
+                return
+            content_type, body, is_page = result
+
+            if is_page and server.should_fail():
+                if server.failure_mode == "reset":
+                    self.close_connection = True
+                    return
+                if server.failure_mode == "status":
+                    self._send(503, "text/html; charset=utf-8", b"<html>503</html>")
+                    return
+                self._send(200, content_type, body, limit=len(body) // 2)
+                self.close_connection = True
+                return
+            self._send(200, content_type, body)
+
+        def _send(self, status: int, content_type: str, body: bytes, limit: Optional[int] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            data = body if limit is None else body[:limit]
+            if server.bandwidth:
+                chunk = max(MIN_CHUNK, server.bandwidth // 20)
+                for offset in range(0, len(data), chunk):
+                    piece = data[offset:offset + chunk]
+                    self.wfile.write(piece)
+                    time.sleep(len(piece) / server.bandwidth)
+            else:
+                self.wfile.write(data)
+            with server._lock:
+                server.stats["bytes"] += len(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
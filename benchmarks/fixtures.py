@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+"""
+基准测试和离线测试用的样例数据
+
+生成与各网站结构相近的版面文件：人民日报式的单页 PDF (每页嵌入同一份
+字体程序) 和光明日报式的 JPG 版面图。
+"""
+import io
+import random
+import zlib
+
+from PIL import Image
+
+from src.utils.pdf_writer import PdfObjectWriter
+
+
+def make_font_program(size: int = 200 * 1024, seed: int = 7) -> bytes:
+    """生成固定内容的伪字体程序，同一 seed 每次结果相同"""
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def make_rmrb_page(page_num: int, text: str = "", font_program: bytes = None,
+                   image_size: int = 0) -> bytes:
+    """生成一页人民日报式 PDF
+
+    资源字典放在父 Pages 节点上由页面继承，字体程序作为 FontFile2 流嵌入，
+    与真实版面一样每个文件都带一份完整字体。
+
+    Args:
+        page_num: 版面号
+        text: 版面文字 (只支持 ASCII)
+        font_program: 嵌入的字体数据
+        image_size: 额外嵌入的未压缩图片数据大小，用于放大页面体积
+    """
+    if font_program is None:
+        font_program = make_font_program()
+    text = text or f"People's Daily page {page_num}"
+
+    buffer = io.BytesIO()
+    writer = PdfObjectWriter(buffer)
+    writer.write_header()
+    catalog_id, pages_id, page_id, content_id = (writer.reserve() for _ in range(4))
+    font_id, descriptor_id, file_id = (writer.reserve() for _ in range(3))
+
+    xobject = b""
+    if image_size:
+        image_id = writer.reserve()
+        side = int((image_size / 3) ** 0.5) or 1
+        pixels = bytes((page_num * 37 + i) % 256 for i in range(side * side * 3))
+        writer.write_stream(
+            image_id,
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceRGB /BitsPerComponent 8" % (side, side),
+            pixels,
+        )
+        xobject = b" /XObject << /Im0 %d 0 R >>" % image_id
+
+    writer.write_object(
+        catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    writer.write_object(
+        pages_id,
+        b"<< /Type /Pages /Kids [%d 0 R] /Count 1 /MediaBox [0 0 842 1191] "
+        b"/Resources << /Font << /F1 %d 0 R >>%s >> >>" % (page_id, font_id, xobject),
+    )
+    writer.write_object(
+        page_id, b"<< /Type /Page /Parent %d 0 R /Contents %d 0 R >>" % (pages_id, content_id))
+    content = b"BT /F1 24 Tf 72 1100 Td (%s) Tj ET" % text.encode("ascii")
+    if image_size:
+        content += b" q 400 0 0 400 72 400 cm /Im0 Do Q"
+    writer.write_stream(content_id, b"/Filter /FlateDecode", zlib.compress(content))
+    writer.write_object(
+        font_id,
+        b"<< /Type /Font /Subtype /TrueType /BaseFont /Helvetica "
+        b"/FirstChar 32 /LastChar 126 /FontDescriptor %d 0 R >>" % descriptor_id,
+    )
+    writer.write_object(
+        descriptor_id,
+        b"<< /Type /FontDescriptor /FontName /Helvetica /Flags 32 "
+        b"/FontBBox [0 -200 1000 900] /ItalicAngle 0 /Ascent 900 /Descent -200 "
+        b"/CapHeight 700 /StemV 80 /FontFile2 %d 0 R >>" % file_id,
+    )
+    writer.write_stream(
+        file_id, b"/Length1 %d /Filter /FlateDecode" % len(font_program),
+        zlib.compress(font_program, 1))
+    writer.write_trailer(catalog_id)
+    return buffer.getvalue()
+
+
+def make_page_jpeg(page_num: int, size=(1200, 1700), quality: int = 85) -> bytes:
+    """生成一张光明日报式的版面 JPG"""
+    img = Image.new("RGB", size, (245, 242, 235))
+    stripe = Image.new("RGB", (size[0], 40), ((page_num * 40) % 256, 60, 90))
+    for y in range(0, size[1], 120):
+        img.paste(stripe, (0, y))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
@@ -0,0 +1,21 @@
+# -*- coding: UTF-8 -*-
+"""
+报纸下载器 - 命令行入口
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import config
+from src.utils import logger
+from src.cli import main
+
+
+if __name__ == "__main__":
+    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+    if os.path.exists(config_path):
+        config.load(config_path)
+    logger.set_level(config.log_level)
+    logger.set_capacities(config.log_capacity)
+    sys.exit(main())
@@ -4,6 +4,7 @@
 """
 import sys
 import os
+import multiprocessing
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -12,6 +13,7 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QIcon
 
 from src.config import config
+from src.utils import logger
 from src.gui import MainWindow
 
 
@@ -19,6 +21,8 @@ def main():
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
     if os.path.exists(config_path):
         config.load(config_path)
+    logger.set_level(config.log_level)
+    logger.set_capacities(config.log_capacity)
     
     app = QApplication(sys.argv)
     app.setApplicationName(config.app_name)
@@ -35,4 +39,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,157 @@
+# -*- coding: UTF-8 -*-
+"""
+缺期检查与补全
+
+按报纸的出版日 (update_days) 列出一段日期内应有的各期，减去存档清单中已下载
+的日期，再排除更新日期记录中已确认没有出版的日期，得到缺少的 (平台, 日期)。
+
+补全时只下载这些日期：越近的日期越优先 (旧报纸可能已从网站下线)，各平台的
+队列交替排列，每个平台一个线程并按 editions_per_minute 限速。
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .config import config
+from .downloaders import get_downloader
+from .pipeline import EditionPipeline, build_image_profile, get_newspaper_name
+from .utils import ArchiveManifest, AvailabilityStore, StorageManager
+
+
+@dataclass(frozen=True)
+class Gap:
+    platform_id: str
+    date: str
+
+
+@dataclass
+class BackfillResult:
+    succeeded: List[Gap] = field(default_factory=list)
+    failed: List[Gap] = field(default_factory=list)
+    cancelled: bool = False
+
+
+def expected_dates(platform_id: str, date_from: str, date_to: str) -> List[str]:
+    """date_from 到 date_to (含) 之间报纸出版的日期，从新到旧"""
+    paper = config.get_newspaper(platform_id) or {}
+    update_days = paper.get("update_days", list(range(7)))
+    start = datetime.strptime(date_from, "%Y-%m-%d")
+    day = datetime.strptime(date_to, "%Y-%m-%d")
+    dates = []
+    while day >= start:
+        if day.weekday() in update_days:
+            dates.append(day.strftime("%Y-%m-%d"))
+        day -= timedelta(days=1)
+    return dates
+
+
+def known_unpublished(platform_id: str, dates: Iterable[str]) -> set:
+    """更新日期记录中已确认没有出版的日期"""
+    return AvailabilityStore.for_config(config).unpublished(platform_id, dates)
+
+
+def find_gaps(
+    storage: StorageManager,
+    platform_ids: Iterable[str],
+    date_from: str,
+    date_to: str
+) -> List[Gap]:
+    """各平台缺少的日期，按补全优先级排序"""
+    manifest = ArchiveManifest.for_storage(storage)
+    queues = []
+    for platform_id in platform_ids:
+        dates = expected_dates(platform_id, date_from, date_to)
+        missing = manifest.missing(get_newspaper_name(platform_id), dates, suffix=None)
+        skip = known_unpublished(platform_id, missing)
+        queues.append([Gap(platform_id, date) for date in missing if date not in skip])
+    return prioritize(queues)
+
+
+def prioritize(queues: List[List[Gap]]) -> List[Gap]:
+    """每个平台内从新到旧，平台之间按日期交替"""
+    gaps = [gap for queue in queues for gap in queue]
+    rank = {}
+    for queue in queues:
+        for position, gap in enumerate(sorted(queue, key=lambda g: g.date, reverse=True)):
+            rank[gap] = position
+    return sorted(gaps, key=lambda gap: (rank[gap], -int(gap.date.replace("-", "")), gap.platform_id))
+
+
+def run_backfill(
+    storage: StorageManager,
+    gaps: List[Gap],
+    editions_per_minute: Optional[float] = None,
+    image_profile: Optional[str] = None,
+    log: Optional[Callable[[str, str], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None
+) -> BackfillResult:
+    """下载缺少的各期：每个平台一个线程，按 gaps 的顺序依次下载并限速
+
+    Args:
+        editions_per_minute: 每个平台每分钟最多开始下载的期数，0 表示不限速
+    """
+    rate = config.backfill_rate if editions_per_minute is None else editions_per_minute
+    interval = 60.0 / rate if rate > 0 else 0.0
+    is_cancelled = is_cancelled or (lambda: False)
+    log = log or (lambda level, message: None)
+
+    queues: Dict[str, List[str]] = {}
+    for gap in gaps:
+        queues.setdefault(gap.platform_id, []).append(gap.date)
+
+    result = BackfillResult()
+    lock = threading.Lock()
+
+    def work(platform_id: str, dates: List[str]):
+        downloader = get_downloader(platform_id, config)
+        if not downloader:
+            log("ERROR", f"未知的平台: {platform_id}")
+            with lock:
+                result.failed.extend(Gap(platform_id, date) for date in dates)
+            return
+        next_start = time.monotonic()
+        done = 0
+        try:
+            pipeline = EditionPipeline(
+                platform_id, storage,
+                profile=build_image_profile(image_profile, platform_id),
+                log=log, is_cancelled=is_cancelled, verbose=False
+            )
+            for date in dates:
+                while not is_cancelled():
+                    remaining = next_start - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(0.2, remaining))
+                if is_cancelled():
+                    with lock:
+                        result.cancelled = True
+                    return
+                next_start = time.monotonic() + interval
+                try:
+                    success, _ = pipeline.run(downloader, date)
+                except Exception as e:
+                    log("WARNING", f"下载 {pipeline.newspaper_name} {date} 失败: {str(e)[:50]}")
+                    success = False
+                with lock:
+                    (result.succeeded if success else result.failed).append(Gap(platform_id, date))
+                done += 1
+        except Exception as e:
+            # 意外出错时其余日期记为失败，不从结果中消失
+            log("ERROR", f"{get_newspaper_name(platform_id)} 补全出错: {str(e)[:50]}")
+            with lock:
+                result.failed.extend(Gap(platform_id, date) for date in dates[done:])
+        finally:
+            downloader.close()
+
+    threads = [
+        threading.Thread(target=work, args=(platform_id, dates), name=f"backfill-{platform_id}", daemon=True)
+        for platform_id, dates in queues.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result
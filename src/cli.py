@@ -0,0 +1,330 @@
+# -*- coding: UTF-8 -*-
+"""
+命令行工具 - 下载、存档检索与整理
+
+    python cli.py download rmrb --date 2026-09-01
+    python cli.py download rmrb --days 7 --trace  # 记录性能剖析
+    python cli.py download rmrb --days 7 --record cassettes/rmrb   # 录制网络请求
+    python cli.py download rmrb --days 7 --replay cassettes/rmrb   # 离线回放
+    python cli.py index                    # 增量索引存档目录
+    python cli.py search 乡村振兴 --paper 人民日报 --from 2025-01-01
+    python cli.py volume --paper 人民日报   # 更新合订本
+    python cli.py thumbnails               # 补全缺少的缩略图
+    python cli.py reconcile                # 扫描存档目录重建存档清单
+    python cli.py gaps --days 90           # 列出最近 90 天缺少的各期
+    python cli.py gaps --from 2025-01-01 --backfill   # 补全缺少的各期
+    python cli.py cluster enqueue --from 2020-01-01   # 把缺少的各期加入多机任务队列
+    python cli.py cluster worker           # 在本机领取队列中的任务下载
+    python cli.py cluster status           # 查看队列和工作进程
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from .backfill import find_gaps, run_backfill
+from .cluster import enqueue_gaps, run_worker
+from .config import config
+from .downloaders import get_downloader
+from .downloaders.bandwidth import INTERACTIVE
+from .downloaders.cassette import start_recording, start_replay, stop_cassette
+from .pipeline import (
+    EditionPipeline, build_image_profile, build_thumbnail_cache, get_dates_for_range,
+    get_newspaper_name, export_run_metrics, start_profiling, finish_profiling,
+)
+from .utils import StorageManager, SearchIndex, VolumeBuilder, ArchiveManifest, WorkQueue
+from .utils.metrics import metrics
+from .utils.profiling import tracer
+
+
+def _print_log(level: str, message: str):
+    print(f"[{level}] {message}")
+
+
+def _cmd_download(args, storage: StorageManager) -> int:
+    if args.record and args.replay:
+        print("--record 和 --replay 不能同时使用")
+        return 2
+    if args.record:
+        start_recording(args.record)
+    elif args.replay:
+        start_replay(args.replay, timing=args.replay_timing)
+    try:
+        return _download(args, storage)
+    finally:
+        cassette = stop_cassette()
+        if cassette is not None and args.record:
+            stats = cassette.stats()
+            print(f"已录制 {stats['interactions']} 个请求，{stats['bodies']} 个不同的响应内容: {args.record}")
+        elif cassette is not None and cassette.misses:
+            print(f"回放时有 {cassette.misses} 个请求不在录制中")
+
+
+def _download(args, storage: StorageManager) -> int:
+    downloader = get_downloader(args.platform, config)
+    if not downloader:
+        print(f"未知的平台: {args.platform}")
+        return 2
+
+    if args.days:
+        dates = get_dates_for_range(args.platform, args.days)
+    else:
+        dates = [args.date]
+        # 下载一期时用户在等待结果
+        downloader.set_traffic_class(INTERACTIVE)
+
+    since = metrics.checkpoint()
+    if args.trace:
+        tracer.start(cprofile=True, tracemalloc_enabled=args.tracemalloc)
+    else:
+        start_profiling()
+
+    pipeline = EditionPipeline(
+        args.platform,
+        storage,
+        profile=build_image_profile(args.image_profile, args.platform),
+        log=_print_log,
+        verbose=len(dates) == 1
+    )
+    success_count = 0
+    try:
+        for date in dates:
+            success, _ = pipeline.run(downloader, date)
+            success_count += success
+    finally:
+        fail_count = len(dates) - success_count
+        export_run_metrics(
+            storage, since,
+            platform=args.platform, success_count=success_count, fail_count=fail_count
+        )
+        finish_profiling(storage, _print_log)
+
+    if len(dates) > 1:
+        print(f"批量下载完成: 成功 {success_count}，失败 {fail_count}")
+    return 0 if fail_count == 0 else 1
+
+
+def _cmd_index(args, storage: StorageManager) -> int:
+    index = SearchIndex.for_storage(storage)
+    try:
+        removed = index.remove_missing()
+        count = index.index_archive(storage, args.paper)
+        stats = index.stats()
+    finally:
+        index.close()
+    print(f"新索引 {count} 期，移除 {removed} 期；共 {stats['editions']} 期 {stats['pages']} 个版面")
+    return 0
+
+
+def _cmd_search(args, storage: StorageManager) -> int:
+    index = SearchIndex.for_storage(storage)
+    try:
+        start = time.perf_counter()
+        hits = index.search(
+            " ".join(args.query),
+            newspaper=args.paper,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            limit=args.limit
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        index.close()
+
+    for hit in hits:
+        snippet = " ".join(hit.snippet.split())
+        print(f"{hit.newspaper} {hit.date} 第{hit.page}版  {snippet}")
+        print(f"    {hit.path}")
+    print(f"共 {len(hits)} 条结果 ({elapsed:.1f} ms)")
+    return 0
+
+
+def _cmd_volume(args, storage: StorageManager) -> int:
+    builder = VolumeBuilder(storage, args.paper, args.period or config.volume_period)
+    keys = [builder.period_key(args.key)] if args.key else list(builder.pending())
+    if not keys:
+        print("没有需要更新的合订本")
+    for key in keys:
+        result = builder.update(key)
+        action = "重建" if result.rebuilt else "追加"
+        print(f"{result.path}: {action} {len(result.added)} 期，共 {result.page_count} 版")
+    return 0
+
+
+def _cmd_thumbnails(args, storage: StorageManager) -> int:
+    cache = build_thumbnail_cache(storage)
+    start = time.perf_counter()
+    count = cache.backfill(storage, workers=args.workers if args.workers is not None else config.thumbnail_workers)
+    print(f"生成 {count} 期缩略图 ({time.perf_counter() - start:.1f} 秒)")
+    return 0
+
+
+def _cmd_reconcile(args, storage: StorageManager) -> int:
+    manifest = ArchiveManifest.for_storage(storage)
+    start = time.perf_counter()
+    result = manifest.reconcile(args.paper)
+    stats = manifest.stats()
+    print(f"新增 {result.added} 期，更新 {result.updated} 期，移除 {result.removed} 期，"
+          f"未变化 {result.unchanged} 期 ({time.perf_counter() - start:.1f} 秒)")
+    print(f"清单共 {stats['editions']} 期 {stats['pages']} 个版面，{storage.format_size(stats['bytes'])}")
+    return 0
+
+
+def _gap_range(args):
+    """gaps / cluster enqueue 的平台和日期范围"""
+    platform_ids = args.platform or list(config.get_enabled_newspapers())
+    date_to = args.date_to or datetime.now().strftime("%Y-%m-%d")
+    if args.date_from:
+        date_from = args.date_from
+    else:
+        days = args.days or config.backfill_days
+        date_from = (datetime.strptime(date_to, "%Y-%m-%d") - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return platform_ids, date_from, date_to
+
+
+def _cmd_gaps(args, storage: StorageManager) -> int:
+    platform_ids, date_from, date_to = _gap_range(args)
+    gaps = find_gaps(storage, platform_ids, date_from, date_to)
+    if not args.backfill:
+        for gap in gaps:
+            print(f"{gap.platform_id}\t{gap.date}\t{get_newspaper_name(gap.platform_id)}")
+        print(f"{date_from} 至 {date_to} 共缺少 {len(gaps)} 期")
+        return 0
+    if not gaps:
+        print(f"{date_from} 至 {date_to} 没有缺少的报纸")
+        return 0
+
+    print(f"开始补全 {len(gaps)} 期")
+    since = metrics.checkpoint()
+    start_profiling()
+    try:
+        result = run_backfill(storage, gaps, args.rate, args.image_profile, log=_print_log)
+    finally:
+        finish_profiling(storage, _print_log)
+    export_run_metrics(
+        storage, since, platform="backfill",
+        success_count=len(result.succeeded), fail_count=len(result.failed)
+    )
+    for gap in result.failed:
+        print(f"失败: {gap.platform_id} {gap.date}")
+    print(f"补全完成: 成功 {len(result.succeeded)}，失败 {len(result.failed)}")
+    return 0 if not result.failed else 1
+
+
+def _cmd_cluster(args, storage: StorageManager) -> int:
+    queue = WorkQueue.for_storage(storage, config)
+    try:
+        if args.action == "enqueue":
+            platform_ids, date_from, date_to = _gap_range(args)
+            gaps, added = enqueue_gaps(storage, queue, platform_ids, date_from, date_to)
+            print(f"{date_from} 至 {date_to} 缺少 {len(gaps)} 期，新加入队列 {added} 期: {queue.db_path}")
+            return 0
+
+        if args.action == "worker":
+            since = metrics.checkpoint()
+            result = run_worker(
+                storage, queue, worker_id=args.id, threads=args.threads,
+                editions_per_minute=args.rate, image_profile=args.image_profile, log=_print_log
+            )
+            export_run_metrics(
+                storage, since, platform="cluster",
+                success_count=len(result.succeeded), fail_count=len(result.failed)
+            )
+            print(f"本机完成: 成功 {len(result.succeeded)}，失败 {len(result.failed)}")
+            if result.succeeded:
+                print("工作进程不更新全文索引和合订本，队列清空后在一台机器上运行 index 和 volume")
+            return 0 if not result.failed else 1
+
+        counts = queue.counts()
+        print(f"排队 {counts['pending']}，下载中 {counts['running']}，完成 {counts['done']}，失败 {counts['failed']}")
+        now = time.time()
+        for worker in queue.workers():
+            print(f"{worker.worker}\t{worker.host}\t{worker.running} 期\t{now - worker.last_seen:.0f} 秒前心跳")
+        for unit, _, attempts, message in queue.units("failed"):
+            print(f"失败: {unit.platform_id} {unit.date} (领取 {attempts} 次) {message}")
+        return 0
+    finally:
+        queue.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description=f"{config.app_name} 命令行工具")
+    parser.add_argument("-o", "--output", default=None, help="存档目录 (默认使用配置中的输出目录)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    download_parser = subparsers.add_parser("download", help="下载报纸")
+    download_parser.add_argument("platform", help="报纸平台ID (如 rmrb、xuexishibao)")
+    download_parser.add_argument("-d", "--date", help="日期 YYYY-MM-DD (默认最新一期)")
+    download_parser.add_argument("--days", type=int, help="下载最近 N 天")
+    download_parser.add_argument("--image-profile", help="图片版报纸的输出质量 (archive/screen/mobile)")
+    download_parser.add_argument("--trace", action="store_true", help="记录性能剖析 (Chrome trace + cProfile)")
+    download_parser.add_argument("--tracemalloc", action="store_true", help="剖析时同时记录内存分配")
+    download_parser.add_argument("--record", metavar="DIR", help="把网络请求录制到磁带目录")
+    download_parser.add_argument("--replay", metavar="DIR", help="从磁带目录回放，不访问网络")
+    download_parser.add_argument("--replay-timing", choices=["recorded", "none"], default="recorded",
+                                 help="回放时的响应时间: recorded 按录制时的耗时，none 立即返回")
+    download_parser.set_defaults(func=_cmd_download)
+
+    index_parser = subparsers.add_parser("index", help="增量更新全文检索索引")
+    index_parser.add_argument("--paper", help="只索引指定报纸 (报纸名称)")
+    index_parser.set_defaults(func=_cmd_index)
+
+    search_parser = subparsers.add_parser("search", help="全文检索")
+    search_parser.add_argument("query", nargs="+", help="关键词，多个关键词需同时出现")
+    search_parser.add_argument("--paper", help="只检索指定报纸 (报纸名称)")
+    search_parser.add_argument("--from", dest="date_from", help="起始日期 YYYY-MM-DD")
+    search_parser.add_argument("--to", dest="date_to", help="结束日期 YYYY-MM-DD")
+    search_parser.add_argument("--limit", type=int, default=20, help="最多显示条数")
+    search_parser.set_defaults(func=_cmd_search)
+
+    volume_parser = subparsers.add_parser("volume", help="生成或增量更新合订本")
+    volume_parser.add_argument("--paper", required=True, help="报纸名称")
+    volume_parser.add_argument("--period", choices=["month", "year"], help="按月或按年 (默认使用配置)")
+    volume_parser.add_argument("--key", help="只更新包含该日期的合订本 (如 2026-09)")
+    volume_parser.set_defaults(func=_cmd_volume)
+
+    thumbnails_parser = subparsers.add_parser("thumbnails", help="并行补全缺少的缩略图")
+    thumbnails_parser.add_argument("--workers", type=int, help="进程数 (0 表示 CPU 核数)")
+    thumbnails_parser.set_defaults(func=_cmd_thumbnails)
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="扫描存档目录重建存档清单")
+    reconcile_parser.add_argument("--paper", help="只处理指定报纸 (报纸名称)")
+    reconcile_parser.set_defaults(func=_cmd_reconcile)
+
+    gaps_parser = subparsers.add_parser("gaps", help="列出或补全存档中缺少的各期")
+    gaps_parser.add_argument("platform", nargs="*", help="报纸平台ID (默认所有启用的报纸)")
+    gaps_parser.add_argument("--from", dest="date_from", help="起始日期 YYYY-MM-DD")
+    gaps_parser.add_argument("--to", dest="date_to", help="结束日期 YYYY-MM-DD (默认今天)")
+    gaps_parser.add_argument("--days", type=int, help="检查到结束日期为止的 N 天 (默认使用配置)")
+    gaps_parser.add_argument("--backfill", action="store_true", help="下载缺少的各期")
+    gaps_parser.add_argument("--rate", type=float, help="每个平台每分钟最多下载的期数 (0 表示不限速)")
+    gaps_parser.add_argument("--image-profile", help="图片版报纸的输出质量 (archive/screen/mobile)")
+    gaps_parser.set_defaults(func=_cmd_gaps)
+
+    cluster_parser = subparsers.add_parser("cluster", help="多台机器通过共享任务队列补全缺少的各期")
+    cluster_actions = cluster_parser.add_subparsers(dest="action", required=True)
+    enqueue_parser = cluster_actions.add_parser("enqueue", help="把缺少的各期加入队列")
+    enqueue_parser.add_argument("platform", nargs="*", help="报纸平台ID (默认所有启用的报纸)")
+    enqueue_parser.add_argument("--from", dest="date_from", help="起始日期 YYYY-MM-DD")
+    enqueue_parser.add_argument("--to", dest="date_to", help="结束日期 YYYY-MM-DD (默认今天)")
+    enqueue_parser.add_argument("--days", type=int, help="检查到结束日期为止的 N 天 (默认使用配置)")
+    worker_parser = cluster_actions.add_parser("worker", help="领取队列中的任务下载，直到队列清空")
+    worker_parser.add_argument("--id", help="工作进程名称 (默认 主机名-进程号-随机串)")
+    worker_parser.add_argument("--threads", type=int, help="同时下载的期数 (默认使用配置)")
+    worker_parser.add_argument("--rate", type=float, help="每个平台每分钟最多下载的期数，所有机器合计 (0 表示不限速)")
+    worker_parser.add_argument("--image-profile", help="图片版报纸的输出质量 (archive/screen/mobile)")
+    cluster_actions.add_parser("status", help="查看队列和工作进程")
+    cluster_parser.set_defaults(func=_cmd_cluster)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    storage = StorageManager(args.output or config.default_output_dir)
+    return args.func(args, storage)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
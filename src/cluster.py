@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+"""
+多机补全 - 协调与工作进程
+
+协调端 (任意一台机器) 用 find_gaps 找出缺少的各期并加入共享的任务队列
+(utils/work_queue.py)；每台机器运行一个工作进程，从队列领取 (平台, 日期)
+下载到共同的存档目录。工作进程后台定期心跳，崩溃或断网的工作进程的任务在
+租约过期后由其他工作进程接手；某一期的租约被接手后，原来的工作进程中途
+停止这一期，不会与新的工作进程重复下载。
+
+存档清单也在共享目录中，以 DELETE 日志模式打开 (WAL 不能跨机器)。
+全文索引和合订本只能由一个进程更新，工作进程不自动更新，补全结束后在一台
+机器上运行 index 和 volume 统一更新。
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .backfill import BackfillResult, Gap, find_gaps
+from .config import config
+from .downloaders import get_downloader
+from .pipeline import EditionPipeline, build_image_profile, get_newspaper_name
+from .utils import ArchiveManifest, StorageManager, WorkQueue, WorkUnit
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def enqueue_gaps(
+    storage: StorageManager,
+    queue: WorkQueue,
+    platform_ids: Iterable[str],
+    date_from: str,
+    date_to: str
+) -> Tuple[List[Gap], int]:
+    """把缺少的各期按补全优先级加入队列，返回 (缺少的各期, 新加入的任务数)"""
+    gaps = find_gaps(storage, platform_ids, date_from, date_to)
+    added = queue.enqueue((gap.platform_id, gap.date) for gap in gaps)
+    return gaps, added
+
+
+def run_worker(
+    storage: StorageManager,
+    queue: WorkQueue,
+    worker_id: Optional[str] = None,
+    threads: Optional[int] = None,
+    editions_per_minute: Optional[float] = None,
+    image_profile: Optional[str] = None,
+    heartbeat_seconds: Optional[float] = None,
+    poll_seconds: float = 1.0,
+    log: Optional[Callable[[str, str], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None
+) -> BackfillResult:
+    """从队列领取任务并下载，直到队列中没有未结束的任务或被取消
+
+    Args:
+        threads: 同时下载的期数，默认使用配置
+        editions_per_minute: 每个平台每分钟最多开始下载的期数 (所有工作进程合计)，0 表示不限速
+        heartbeat_seconds: 心跳间隔，应明显小于队列的租约有效期
+        poll_seconds: 暂时没有可领取的任务 (限速或其他机器正在下载) 时的等待间隔
+    """
+    worker_id = worker_id or default_worker_id()
+    threads = max(1, threads or config.cluster_threads)
+    rate = config.backfill_rate if editions_per_minute is None else editions_per_minute
+    interval = 60.0 / rate if rate > 0 else 0.0
+    heartbeat_seconds = heartbeat_seconds or config.cluster_heartbeat_seconds
+    is_cancelled = is_cancelled or (lambda: False)
+    log = log or (lambda level, message: None)
+
+    ArchiveManifest.for_storage(storage, journal_mode="DELETE")
+    queue.register(worker_id, socket.gethostname(), os.getpid())
+    result = BackfillResult()
+    lock = threading.Lock()
+    held = set()
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(heartbeat_seconds):
+            # 心跳期间新领取的任务不在 before 中，不会被误判为已失去
+            with lock:
+                before = set(held)
+            try:
+                units = set(queue.heartbeat(worker_id))
+            except Exception as e:
+                log("WARNING", f"心跳失败: {str(e)[:50]}")
+                continue
+            with lock:
+                lost = (before - units) & held
+                held.difference_update(lost)
+            for unit in lost:
+                log("WARNING", f"{get_newspaper_name(unit.platform_id)} {unit.date} 的租约已过期，停止下载")
+
+    def work():
+        downloaders: Dict[str, object] = {}
+        pipelines: Dict[str, EditionPipeline] = {}
+        current: List[Optional[WorkUnit]] = [None]
+
+        def stop_requested() -> bool:
+            # 取消，或者这一期的租约已被其他工作进程接手
+            with lock:
+                return is_cancelled() or current[0] not in held
+
+        def download(unit: WorkUnit) -> Tuple[bool, str]:
+            platform_id = unit.platform_id
+            if platform_id not in downloaders:
+                downloader = get_downloader(platform_id, config)
+                if not downloader:
+                    log("ERROR", f"未知的平台: {platform_id}")
+                    return False, f"未知的平台: {platform_id}"
+                downloaders[platform_id] = downloader
+                pipelines[platform_id] = EditionPipeline(
+                    platform_id, storage,
+                    profile=build_image_profile(image_profile, platform_id),
+                    log=log, is_cancelled=stop_requested, verbose=False, shared_archive=True
+                )
+            pipeline = pipelines[platform_id]
+            try:
+                return pipeline.run(downloaders[platform_id], unit.date)
+            except Exception as e:
+                log("WARNING", f"下载 {pipeline.newspaper_name} {unit.date} 失败: {str(e)[:50]}")
+                return False, str(e)
+
+        try:
+            while not is_cancelled():
+                unit = queue.claim(worker_id, interval)
+                if unit is None:
+                    if queue.remaining() == 0:
+                        return
+                    time.sleep(poll_seconds)
+                    continue
+                with lock:
+                    held.add(unit)
+                current[0] = unit
+                success, message = download(unit)
+                with lock:
+                    held.discard(unit)
+                if is_cancelled() and not success:
+                    # 被取消打断的一期放回队列，由其他工作进程继续
+                    queue.release(worker_id, unit)
+                    break
+                if not queue.complete(worker_id, unit, success, message):
+                    log("WARNING", f"{get_newspaper_name(unit.platform_id)} {unit.date} 已由其他工作进程接手")
+                    continue
+                with lock:
+                    (result.succeeded if success else result.failed).append(Gap(unit.platform_id, unit.date))
+            with lock:
+                result.cancelled = True
+        finally:
+            for downloader in downloaders.values():
+                downloader.close()
+
+    heart = threading.Thread(target=beat, name="cluster-heartbeat", daemon=True)
+    heart.start()
+    workers = [
+        threading.Thread(target=work, name=f"cluster-worker-{i}", daemon=True) for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    try:
+        for thread in workers:
+            thread.join()
+    finally:
+        stopped.set()
+        heart.join()
+        queue.release(worker_id)
+    return result
@@ -4,7 +4,6 @@
 """
 import json
 import os
-import time
 from dataclasses import dataclass, field
 from typing import Optional, List
 
@@ -16,42 +15,125 @@ DEFAULT_CONFIG = {
         "rmrb": {
             "name": "人民日报",
             "enabled": True,
-            "update_days": [0, 1, 2, 3, 4, 5, 6]
+            "update_days": [0, 1, 2, 3, 4, 5, 6],
+            "download": {"concurrency": 4, "chunk_size": 65536}
         },
         "xuexishibao": {
             "name": "学习时报",
             "enabled": True,
-            "update_days": [0, 2, 4]
+            "update_days": [0, 2, 4],
+            "download": {"concurrency": 2, "chunk_size": 65536}
         },
         "guangming": {
             "name": "光明日报",
             "enabled": True,
-            "update_days": [0, 1, 2, 3, 4, 5, 6]
+            "update_days": [0, 1, 2, 3, 4, 5, 6],
+            "download": {"concurrency": 4, "chunk_size": 65536}
         },
         "xinhua_daily": {
             "name": "新华每日电讯",
             "enabled": True,
-            "update_days": [0, 1, 2, 3, 4, 5, 6]
+            "update_days": [0, 1, 2, 3, 4, 5, 6],
+            "download": {"concurrency": 2, "timeout": 30, "max_retries": 4, "max_concurrency": 4}
         },
         "zhonghuadushu": {
             "name": "中华读书报",
             "enabled": True,
-            "update_days": [0, 1, 2, 3, 4, 5, 6]
+            "update_days": [0, 1, 2, 3, 4, 5, 6],
+            "download": {"concurrency": 4, "chunk_size": 65536}
         },
         "wenzhai": {
             "name": "文摘报",
             "enabled": True,
-            "update_days": [0, 1, 2, 3, 4, 5, 6]
+            "update_days": [0, 1, 2, 3, 4, 5, 6],
+            "download": {"concurrency": 4, "chunk_size": 65536}
         }
     },
     "download": {
         "max_retries": 3,
         "timeout": 60,
-        "chunk_size": 8192
+        "chunk_size": 8192,
+        "concurrency": 2,
+        "requests_per_second": 0,
+        "auto_tune": False,
+        "min_concurrency": 1,
+        "max_concurrency": 8
+    },
+    "bandwidth": {
+        "max_kb_per_second": 0
+    },
+    "merge": {
+        "image_workers": 0,
+        "max_image_side": 0,
+        "streaming": True,
+        "optimize": True,
+        "linearize": False,
+        "image_profile": "archive",
+        "memory_limit_mb": 256,
+        "scratch_dir": ""
+    },
+    "execution": {
+        "mode": "thread",
+        "workers": 0
+    },
+    "image_profiles": {
+        "archive": {"dpi": 0, "quality": 0},
+        "screen": {"dpi": 150, "quality": 80},
+        "mobile": {"dpi": 96, "quality": 60}
+    },
+    "volumes": {
+        "auto_update": False,
+        "period": "month"
+    },
+    "jobs": {
+        "max_concurrent": 2
+    },
+    "availability": {
+        "path": "",
+        "today_ttl": 3600,
+        "unpublished_ttl": 604800
+    },
+    "backfill": {
+        "editions_per_minute": 20,
+        "days": 30
+    },
+    "cluster": {
+        "queue_path": "",
+        "lease_seconds": 120,
+        "heartbeat_seconds": 30,
+        "max_attempts": 3,
+        "threads": 2
+    },
+    "search": {
+        "auto_index": True
+    },
+    "thumbnails": {
+        "enabled": True,
+        "size": 200,
+        "preview_size": 800,
+        "max_cache_mb": 200,
+        "workers": 0
+    },
+    "metrics": {
+        "enabled": True,
+        "textfile": "",
+        "summary": ""
+    },
+    "profiling": {
+        "enabled": False,
+        "output_dir": "",
+        "cprofile": True,
+        "tracemalloc": False
+    },
+    "logging": {
+        "level": "INFO",
+        "capacity": {"DEBUG": 500, "INFO": 2000, "WARNING": 1000, "ERROR": 1000}
     },
     "ui": {
         "theme": "default",
-        "language": "zh_CN"
+        "language": "zh_CN",
+        "log_max_lines": 5000,
+        "log_flush_ms": 100
     }
 }
 
@@ -70,6 +152,8 @@ class Config:
             try:
                 with open(config_path, 'r', encoding='utf-8') as f:
                     loaded = json.load(f)
+                    # 旧版本按平台缓存的更新日期，已由 availability.db 取代
+                    loaded.pop("available_dates_cache", None)
                     self._merge_config(loaded)
                 self._config_path = config_path
                 return True
@@ -127,28 +211,234 @@ class Config:
     def chunk_size(self) -> int:
         return self._config.get("download", {}).get("chunk_size", 8192)
     
+    @property
+    def bandwidth_limit(self) -> float:
+        """所有下载合计的速率上限 (字节/秒)，0 表示不限"""
+        return self._config.get("bandwidth", {}).get("max_kb_per_second", 0) * 1024
+    
+    @property
+    def image_workers(self) -> int:
+        return self._config.get("merge", {}).get("image_workers", 0)
+    
+    @property
+    def max_image_side(self) -> int:
+        return self._config.get("merge", {}).get("max_image_side", 0)
+    
+    @property
+    def streaming_merge(self) -> bool:
+        return self._config.get("merge", {}).get("streaming", True)
+    
+    @property
+    def optimize_output(self) -> bool:
+        return self._config.get("merge", {}).get("optimize", True)
+    
+    @property
+    def linearize_output(self) -> bool:
+        return self._config.get("merge", {}).get("linearize", False)
+    
+    @property
+    def memory_limit_mb(self) -> int:
+        return self._config.get("merge", {}).get("memory_limit_mb", 256)
+    
+    @property
+    def scratch_dir(self) -> str:
+        return self._config.get("merge", {}).get("scratch_dir", "")
+    
+    @property
+    def execution_mode(self) -> str:
+        """thread: 解析和合并在下载线程中进行；process: 在共享进程池中进行"""
+        mode = self._config.get("execution", {}).get("mode", "thread")
+        return mode if mode in ("thread", "process") else "thread"
+    
+    @property
+    def execution_workers(self) -> int:
+        return self._config.get("execution", {}).get("workers", 0)
+    
+    @property
+    def image_profile(self) -> str:
+        return self._config.get("merge", {}).get("image_profile", "archive")
+    
+    @property
+    def volume_auto_update(self) -> bool:
+        return self._config.get("volumes", {}).get("auto_update", False)
+    
+    @property
+    def volume_period(self) -> str:
+        return self._config.get("volumes", {}).get("period", "month")
+    
+    @property
+    def max_concurrent_jobs(self) -> int:
+        return self._config.get("jobs", {}).get("max_concurrent", 2)
+    
+    @property
+    def availability_db_path(self) -> str:
+        """更新日期记录文件，默认与配置文件放在一起"""
+        path = self._config.get("availability", {}).get("path", "")
+        if path:
+            return path
+        base_dir = os.path.dirname(os.path.abspath(self._config_path)) if self._config_path else "."
+        return os.path.join(base_dir, "availability.db")
+    
+    @property
+    def availability_today_ttl(self) -> float:
+        return self._config.get("availability", {}).get("today_ttl", 3600)
+    
+    @property
+    def availability_unpublished_ttl(self) -> float:
+        """过去日期没有出版的记录多久后复查 (秒)"""
+        return self._config.get("availability", {}).get("unpublished_ttl", 604800)
+    
+    @property
+    def backfill_rate(self) -> float:
+        return self._config.get("backfill", {}).get("editions_per_minute", 20)
+    
+    @property
+    def backfill_days(self) -> int:
+        return self._config.get("backfill", {}).get("days", 30)
+    
+    @property
+    def cluster_queue_path(self) -> str:
+        """多机补全的任务队列文件，为空时放在存档目录下"""
+        return self._config.get("cluster", {}).get("queue_path", "")
+    
+    @property
+    def cluster_lease_seconds(self) -> float:
+        return self._config.get("cluster", {}).get("lease_seconds", 120)
+    
+    @property
+    def cluster_heartbeat_seconds(self) -> float:
+        return self._config.get("cluster", {}).get("heartbeat_seconds", 30)
+    
+    @property
+    def cluster_max_attempts(self) -> int:
+        return self._config.get("cluster", {}).get("max_attempts", 3)
+    
+    @property
+    def cluster_threads(self) -> int:
+        return self._config.get("cluster", {}).get("threads", 2)
+    
+    @property
+    def search_auto_index(self) -> bool:
+        return self._config.get("search", {}).get("auto_index", True)
+    
+    @property
+    def thumbnails_enabled(self) -> bool:
+        return self._config.get("thumbnails", {}).get("enabled", True)
+    
+    @property
+    def thumbnail_size(self) -> int:
+        return self._config.get("thumbnails", {}).get("size", 200)
+    
+    @property
+    def thumbnail_preview_size(self) -> int:
+        return self._config.get("thumbnails", {}).get("preview_size", 800)
+    
+    @property
+    def thumbnail_cache_mb(self) -> int:
+        return self._config.get("thumbnails", {}).get("max_cache_mb", 200)
+    
+    @property
+    def thumbnail_workers(self) -> int:
+        return self._config.get("thumbnails", {}).get("workers", 0)
+    
+    @property
+    def metrics_enabled(self) -> bool:
+        return self._config.get("metrics", {}).get("enabled", True)
+    
+    @property
+    def metrics_textfile(self) -> str:
+        return self._config.get("metrics", {}).get("textfile", "")
+    
+    @property
+    def metrics_summary(self) -> str:
+        return self._config.get("metrics", {}).get("summary", "")
+    
+    @property
+    def profiling_enabled(self) -> bool:
+        return self._config.get("profiling", {}).get("enabled", False)
+    
+    @property
+    def profiling_output_dir(self) -> str:
+        return self._config.get("profiling", {}).get("output_dir", "")
+    
+    @property
+    def profiling_cprofile(self) -> bool:
+        return self._config.get("profiling", {}).get("cprofile", True)
+    
+    @property
+    def profiling_tracemalloc(self) -> bool:
+        return self._config.get("profiling", {}).get("tracemalloc", False)
+    
+    @property
+    def log_level(self) -> str:
+        return self._config.get("logging", {}).get("level", "INFO")
+    
+    @property
+    def log_capacity(self) -> dict:
+        """各级别在内存中保留的条数，忽略未知的级别和无效的条数"""
+        capacity = {}
+        for level, count in self._config.get("logging", {}).get("capacity", {}).items():
+            level = str(level).upper()
+            if level not in ("DEBUG", "INFO", "WARNING", "ERROR"):
+                continue
+            try:
+                capacity[level] = max(0, int(count))
+            except (TypeError, ValueError):
+                continue
+        return capacity
+    
+    @property
+    def log_view_max_lines(self) -> int:
+        return self._config.get("ui", {}).get("log_max_lines", 5000)
+    
+    @property
+    def log_view_flush_ms(self) -> int:
+        return self._config.get("ui", {}).get("log_flush_ms", 100)
+    
+    @property
+    def image_profile_names(self) -> List[str]:
+        return list(self._config.get("image_profiles", {}).keys()) or ["archive"]
+    
+    def get_image_profile(self, name: str = None, platform_id: str = None) -> dict:
+        """获取图片版面的输出质量配置
+
+        报纸配置中的 image_profiles 可以覆盖全局同名配置的 dpi、quality，
+        page_width_mm (版面物理宽度) 也可以按报纸单独设置。
+
+        Returns:
+            {"name", "dpi", "quality", "page_width_mm"}
+        """
+        name = name or self.image_profile
+        profile = {"name": name, "dpi": 0, "quality": 0, "page_width_mm": 330.0}
+        profile.update(self._config.get("image_profiles", {}).get(name, {}))
+        
+        paper = self.get_newspaper(platform_id) if platform_id else None
+        if paper:
+            if "page_width_mm" in paper:
+                profile["page_width_mm"] = paper["page_width_mm"]
+            profile.update(paper.get("image_profiles", {}).get(name, {}))
+        return profile
+    
+    def get_download_profile(self, platform_id: str = None) -> dict:
+        """获取平台的下载配置
+
+        全局 download 配置作为默认值，报纸配置中的 download 覆盖同名项。
+
+        Returns:
+            {"max_retries", "timeout", "chunk_size", "concurrency", "requests_per_second",
+             "auto_tune", "min_concurrency", "max_concurrency"}
+        """
+        profile = dict(DEFAULT_CONFIG["download"])
+        profile.update(self._config.get("download", {}))
+        paper = self.get_newspaper(platform_id) if platform_id else None
+        if paper:
+            profile.update(paper.get("download", {}))
+        return profile
+    
     def get_newspaper(self, paper_id: str) -> Optional[dict]:
         return self.newspapers.get(paper_id)
     
     def get_enabled_newspapers(self) -> dict:
         return {k: v for k, v in self.newspapers.items() if v.get("enabled", True)}
-    
-    def get_cached_dates(self, platform_id: str) -> List[str]:
-        cache = self._config.get("available_dates_cache", {})
-        platform_cache = cache.get(platform_id, {})
-        cached_dates = platform_cache.get("dates", [])
-        cached_time = platform_cache.get("timestamp", 0)
-        
-        if cached_time and (time.time() - cached_time) < 86400:
-            return cached_dates
-        return []
-    
-    def set_cached_dates(self, platform_id: str, dates: List[str]):
-        cache = self._config.get("available_dates_cache", {})
-        cache[platform_id] = {
-            "dates": dates,
-            "timestamp": time.time()
-        }
-        self._config["available_dates_cache"] = cache
 
 config = Config()
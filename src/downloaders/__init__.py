@@ -6,8 +6,9 @@ from .guangming import GuangmingRibaoDownloader
 from .xinhua_daily import XinhuaDailyDownloader
 from .zhonghuadushu import ZhonghuadushuDownloader
 from .wenzhai import WenzhaiDownloader
+from ..utils.availability import AvailabilityStore
 from datetime import datetime, timedelta
-from typing import List
+from typing import Callable, List, Optional
 
 __all__ = [
     "PlatformDownloaderBase",
@@ -39,32 +40,59 @@ def get_downloader(platform_id: str, config):
 def get_available_platforms():
     return list(DOWNLOADER_REGISTRY.keys())
 
-def check_available_dates(platform_id: str, config, days: int = 7) -> List[str]:
+def check_available_dates(
+    platform_id: str,
+    config,
+    days: int = 7,
+    on_date: Optional[Callable[[str], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None,
+    store: Optional[AvailabilityStore] = None
+) -> List[str]:
     """检查报纸在指定天数内哪些日期有更新
     
+    已有有效记录的日期直接使用记录，只访问网站检查没有记录或已过期的日期，
+    检查结果写入记录 (检查失败的日期不记录)。
+    
     Args:
         platform_id: 报纸平台ID
         config: 配置对象
         days: 检查的天数
+        on_date: 每确认一个有更新的日期立即调用 (从今天往前)
+        is_cancelled: 返回 True 时停止检查，返回已确认的日期
+        store: 更新日期记录，默认使用配置中的记录文件
         
     Returns:
         有更新的日期列表 (格式: YYYY-MM-DD)
     """
-    downloader = get_downloader(platform_id, config)
-    if not downloader:
+    if platform_id not in DOWNLOADER_REGISTRY:
         return []
+    store = store or AvailabilityStore.for_config(config)
     
+    today = datetime.now()
+    dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+    known = store.lookup(platform_id, dates)
+    downloader = None
     available_dates = []
     
-    for i in range(days):
-        check_date = datetime.now() - timedelta(days=i)
-        date_str = check_date.strftime('%Y-%m-%d')
-        
-        try:
-            edition = downloader.get_latest_edition(date_str)
-            if edition and edition.page_urls and len(edition.page_urls) > 0:
+    try:
+        for date_str in dates:
+            if is_cancelled and is_cancelled():
+                break
+            
+            published = known.get(date_str)
+            if published is None:
+                downloader = downloader or get_downloader(platform_id, config)
+                published = downloader.probe_edition(date_str)
+                if published is None:
+                    continue
+                store.record(platform_id, date_str, published)
+            
+            if published:
                 available_dates.append(date_str)
-        except Exception:
-            pass
+                if on_date:
+                    on_date(date_str)
+    finally:
+        if downloader:
+            downloader.close()
     
     return available_dates
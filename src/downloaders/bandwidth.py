@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+"""
+全局带宽限制与流量优先级
+
+同一进程中所有下载 (download_to 的分块读取) 共用一个令牌桶，总速率不超过
+bandwidth.max_kb_per_second (0 表示不限)。流量分两类：
+
+- interactive: 用户正在等待的下载 (界面上的单期下载、命令行下载一期)；
+- batch: 批量下载和补全。
+
+类别只由任务类型决定，界面上把批量任务移到队列最前不会让它变成 interactive。
+
+interactive 优先：有 interactive 的下载在等待令牌时，batch 的下载全部暂停；
+interactive 的下载进行中时，batch 只能使用桶中积累的富余令牌 (interactive
+受限于网络本身、用不完带宽时才会积累)。interactive 因此独占带宽尽快完成，
+其余时间 batch 使用剩余的全部带宽。
+
+令牌可以透支：一次读取多于当前令牌数时照常放行，之后的读取按欠下的字节数
+等待，长期平均速率不超过上限。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# 令牌桶容量对应的时间 (秒)：空闲后最多一次性放行这么长时间的流量
+BURST_SECONDS = 0.25
+# 等待令牌时每次最长睡眠，以便及时响应限速的修改和优先级的变化
+MAX_WAIT = 0.1
+
+
+class BandwidthShaper:
+    """按优先级分配的全局令牌桶
+
+    Args:
+        rate: 速率上限 (字节/秒)，0 表示不限
+    """
+
+    def __init__(self, rate: float = 0):
+        self._cond = threading.Condition()
+        self._rate = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._waiting: Dict[str, int] = {INTERACTIVE: 0, BATCH: 0}
+        self._active: Dict[str, int] = {INTERACTIVE: 0, BATCH: 0}
+        self.waited: Dict[str, float] = {INTERACTIVE: 0.0, BATCH: 0.0}
+        self.set_rate(rate)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float):
+        """修改速率上限 (字节/秒)，0 表示不限"""
+        rate = max(0.0, float(rate or 0))
+        with self._cond:
+            if rate == self._rate:
+                return
+            self._refill()
+            self._rate = rate
+            self._tokens = min(self._tokens, self._burst())
+            self._cond.notify_all()
+
+    def _burst(self) -> float:
+        return self._rate * BURST_SECONDS
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate > 0:
+            self._tokens = min(self._burst(), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _may_proceed(self, traffic_class: str) -> bool:
+        if self._tokens <= 0:
+            return False
+        if traffic_class == INTERACTIVE:
+            return True
+        if self._waiting[INTERACTIVE]:
+            return False
+        # interactive 进行中时只放行富余的令牌
+        return not self._active[INTERACTIVE] or self._tokens >= self._burst() / 2
+
+    def _wait_time(self, traffic_class: str) -> float:
+        """距离可以放行还需要等待的时间 (估计值，最长 MAX_WAIT)"""
+        if traffic_class != INTERACTIVE and self._waiting[INTERACTIVE]:
+            return MAX_WAIT
+        needed = 0.0 if traffic_class == INTERACTIVE or not self._active[INTERACTIVE] else self._burst() / 2
+        return min(MAX_WAIT, max(needed - self._tokens, 1.0) / self._rate + 0.001)
+
+    @contextmanager
+    def stream(self, traffic_class: str = BATCH) -> Iterator[str]:
+        """标记一次下载 (一个响应的读取过程) 正在进行"""
+        traffic_class = INTERACTIVE if traffic_class == INTERACTIVE else BATCH
+        with self._cond:
+            self._active[traffic_class] += 1
+        try:
+            yield traffic_class
+        finally:
+            with self._cond:
+                self._active[traffic_class] -= 1
+                self._cond.notify_all()
+
+    def consume(self, nbytes: int, traffic_class: str = BATCH) -> float:
+        """按速率上限等待后计入 nbytes 字节，返回等待的秒数"""
+        if self._rate <= 0:
+            return 0.0
+        traffic_class = INTERACTIVE if traffic_class == INTERACTIVE else BATCH
+        start = time.monotonic()
+        with self._cond:
+            self._refill()
+            if not self._may_proceed(traffic_class):
+                self._waiting[traffic_class] += 1
+                try:
+                    while self._rate > 0:
+                        self._refill()
+                        if self._may_proceed(traffic_class):
+                            break
+                        self._cond.wait(self._wait_time(traffic_class))
+                finally:
+                    self._waiting[traffic_class] -= 1
+                    # interactive 不再等待时唤醒被挡住的 batch
+                    self._cond.notify_all()
+            self._tokens -= nbytes
+            waited = time.monotonic() - start
+            self.waited[traffic_class] += waited
+        return waited
+
+
+shaper = BandwidthShaper()
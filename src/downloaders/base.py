@@ -4,11 +4,18 @@
 """
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Callable, Optional, List
+from typing import Callable, Dict, Optional, List
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
 import os
+import time
 
 from ..utils.logger import logger
+from ..utils.metrics import metrics, url_host
+from ..utils.process_pool import run_in_process
+from ..utils.profiling import tracer
+from .bandwidth import BATCH, shaper
+from .tuning import DownloadProfile, host_tuning
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -16,6 +23,29 @@ HEADERS = {
     "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
 }
 
+# 连接池大小，不小于各平台的最大并发数
+POOL_MAXSIZE = 32
+
+# 挂载到之后创建的每个下载器会话上的适配器 (URL 前缀 -> 适配器)，
+# 离线基准测试用它把各报纸网站的请求转到本地服务器
+_session_adapters: Dict[str, BaseAdapter] = {}
+
+def mount_session_adapter(prefix: str, adapter: BaseAdapter):
+    """之后创建的下载器对以 prefix 开头的 URL 使用 adapter 发送请求"""
+    _session_adapters[prefix] = adapter
+
+def unmount_session_adapter(prefix: str):
+    _session_adapters.pop(prefix, None)
+
+def _trace_response(response, *args, **kwargs):
+    """剖析模式下把每个 HTTP 请求 (到收到响应头为止) 记为一个区间"""
+    if tracer.enabled:
+        elapsed = response.elapsed.total_seconds()
+        tracer.add_event(
+            "http", "network", time.perf_counter() - elapsed, elapsed,
+            {"url": response.url, "status": response.status_code}
+        )
+
 @dataclass
 class EditionInfo:
     url: str
@@ -36,12 +66,48 @@ class DownloadProgress:
     filename: str
     status: str = "downloading"
 
+class _DownloaderSession(requests.Session):
+    """记录传输失败次数 (连接错误、超时、除 404 外的 4xx/5xx)，用于区分 "没有出版" 和 "检查失败"
+
+    403 等拒绝访问的响应不能说明那天没有出版，只有 404 算作页面不存在。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.transport_errors = 0
+
+    def send(self, request, **kwargs):
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            self.transport_errors += 1
+            raise
+        if response.status_code >= 400 and response.status_code != 404:
+            self.transport_errors += 1
+        return response
+
 class PlatformDownloaderBase(ABC):
+    BASE_URL = ""
+    
     def __init__(self, config):
         self.config = config
         self._progress_callback: Optional[Callable[[DownloadProgress], None]] = None
-        self._session = requests.Session()
+        self._session = _DownloaderSession()
         self._session.headers.update(HEADERS)
+        self._session.hooks["response"].append(_trace_response)
+        self._session.mount("http://", HTTPAdapter(pool_maxsize=POOL_MAXSIZE))
+        self._session.mount("https://", HTTPAdapter(pool_maxsize=POOL_MAXSIZE))
+        self._profile: Optional[DownloadProfile] = None
+        self.traffic_class = BATCH
+        for prefix, adapter in _session_adapters.items():
+            self._session.mount(prefix, adapter)
+    
+    @property
+    def profile(self) -> DownloadProfile:
+        """本平台的下载配置 (全局 download 配置加报纸的覆盖项)"""
+        if self._profile is None:
+            self._profile = DownloadProfile.from_dict(self.config.get_download_profile(self.get_platform_id()))
+        return self._profile
     
     @abstractmethod
     def get_latest_edition(self, date: str = None) -> Optional[EditionInfo]:
@@ -55,6 +121,48 @@ class PlatformDownloaderBase(ABC):
     def get_platform_id(self) -> str:
         pass
     
+    def fetch_edition(self, date: str = None) -> Optional[EditionInfo]:
+        """获取报纸信息，并记录耗时和失败次数"""
+        labels = {"platform": self.get_platform_id(), "host": url_host(self.BASE_URL)}
+        edition = None
+        try:
+            with metrics.timer("newspaper_discovery_seconds", **labels):
+                edition = self.get_latest_edition(date)
+            return edition
+        finally:
+            if not edition or not edition.page_urls:
+                metrics.inc("newspaper_discovery_failures_total", **labels)
+    
+    def probe_edition(self, date: str) -> Optional[bool]:
+        """检查某天是否出版
+
+        Returns:
+            True 出版，False 没有出版 (页面不存在)，None 检查失败 (网络错误或除 404
+            外的错误响应，结果不可信)
+        """
+        errors = self._session.transport_errors
+        try:
+            edition = self.get_latest_edition(date)
+        except Exception:
+            return None
+        if edition and edition.page_urls:
+            return True
+        return None if self._session.transport_errors > errors else False
+    
+    def _parse(self, parser: Callable, *args):
+        """执行页面解析 parser(*args)
+
+        execution.mode 为 process 时在共享进程池中解析 (parser 须为模块级函数)，
+        网络请求仍在当前线程，多份报纸同时下载时解析不再互相争用 GIL。
+        """
+        if self.config.execution_mode == "process":
+            return run_in_process(parser, *args, workers=self.config.execution_workers)
+        return parser(*args)
+    
+    def set_traffic_class(self, traffic_class: str):
+        """设置之后下载的流量类别 (bandwidth.INTERACTIVE 或 BATCH)，限速时 interactive 优先"""
+        self.traffic_class = traffic_class
+    
     def set_progress_callback(self, callback: Callable[[DownloadProgress], None]):
         self._progress_callback = callback
     
@@ -63,57 +171,117 @@ class PlatformDownloaderBase(ABC):
             self._progress_callback(progress)
     
     def download_file(self, url: str, dest_path: str) -> bool:
-        max_retries = self.config.max_retries
-        timeout = self.config.timeout
-        chunk_size = self.config.chunk_size
+        """下载到文件：先写入 .part，成功后才改名，失败时不留下不完整的文件"""
+        part_path = dest_path + ".part"
+        success = False
+        try:
+            with open(part_path, 'wb') as f:
+                success = self.download_to(url, f, os.path.basename(dest_path))
+            if success:
+                os.replace(part_path, dest_path)
+            return success
+        finally:
+            if not success and os.path.exists(part_path):
+                os.remove(part_path)
+    
+    def download_to(self, url: str, target, filename: str = "") -> bool:
+        """下载到可写对象 (文件或内存缓冲)
+
+        Args:
+            url: 下载地址
+            target: 支持 write() 的对象；重试前若有 reset() 则调用，
+                否则 seek(0) 并 truncate() 丢弃上次写入的内容
+            filename: 进度回调中显示的文件名
+        """
+        profile = self.profile
+        max_retries = profile.max_retries
+        timeout = profile.timeout
+        chunk_size = profile.chunk_size
+        filename = filename or os.path.basename(url)
+        labels = {"platform": self.get_platform_id(), "host": url_host(url)}
+        controller = host_tuning.controller(labels["host"], profile)
+        shaper.set_rate(self.config.bandwidth_limit)
+        start = time.perf_counter()
+        error = "unknown"
         
         for attempt in range(max_retries):
+            if attempt > 0:
+                metrics.inc("newspaper_fetch_retries_total", **labels)
             try:
-                response = self._session.get(url, timeout=timeout, stream=True)
-                if response.status_code == 200:
-                    total_size = int(response.headers.get('content-length', 0))
-                    filename = os.path.basename(dest_path)
-                    
-                    self._report_progress(DownloadProgress(
-                        current=0,
-                        total=total_size,
-                        filename=filename,
-                        status="starting"
-                    ))
-                    
-                    downloaded = 0
-                    with open(dest_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=chunk_size):
-                            if chunk:
-                                f.write(chunk)
-                                downloaded += len(chunk)
-                                self._report_progress(DownloadProgress(
-                                    current=downloaded,
-                                    total=total_size,
-                                    filename=filename,
-                                    status="downloading"
-                                ))
-                    
-                    self._report_progress(DownloadProgress(
-                        current=downloaded,
-                        total=total_size,
-                        filename=filename,
-                        status="completed"
-                    ))
-                    return True
+                with controller.slot():
+                    response = self._session.get(url, timeout=timeout, stream=True)
+                    latency = response.elapsed.total_seconds()
+                    if response.status_code == 200:
+                        if attempt > 0:
+                            self._reset_target(target)
+                        total_size = int(response.headers.get('content-length', 0))
+                        
+                        self._report_progress(DownloadProgress(
+                            current=0,
+                            total=total_size,
+                            filename=filename,
+                            status="starting"
+                        ))
+                        
+                        downloaded = 0
+                        throttled = 0.0
+                        # 全局限速在读取各分块之间等待，读取变慢后由 TCP 流控降低服务器的发送速率
+                        with shaper.stream(self.traffic_class) as traffic_class:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                if chunk:
+                                    throttled += shaper.consume(len(chunk), traffic_class)
+                                    target.write(chunk)
+                                    downloaded += len(chunk)
+                                    self._report_progress(DownloadProgress(
+                                        current=downloaded,
+                                        total=total_size,
+                                        filename=filename,
+                                        status="downloading"
+                                    ))
+                        if throttled:
+                            metrics.inc("newspaper_bandwidth_wait_seconds_total", throttled, traffic=traffic_class)
+                        
+                        self._report_progress(DownloadProgress(
+                            current=downloaded,
+                            total=total_size,
+                            filename=filename,
+                            status="completed"
+                        ))
+                        controller.record(latency, True)
+                        metrics.observe("newspaper_fetch_seconds", time.perf_counter() - start, **labels)
+                        metrics.inc("newspaper_fetch_bytes_total", downloaded, **labels)
+                        return True
+                # 429 和 5xx 说明站点过载，404 等不影响并发调整
+                controller.record(latency, response.status_code != 429 and response.status_code < 500)
+                error = f"http_{response.status_code}"
             except requests.exceptions.Timeout as e:
+                controller.record(timeout, False)
+                error = "timeout"
                 logger.warning(f"下载超时 (尝试 {attempt + 1}/{max_retries}): {url}")
                 if attempt < max_retries - 1:
                     continue
             except requests.exceptions.ConnectionError as e:
+                controller.record(0.0, False)
+                error = "connection"
                 logger.warning(f"连接失败 (尝试 {attempt + 1}/{max_retries}): {url}")
                 if attempt < max_retries - 1:
                     continue
             except Exception as e:
+                controller.record(0.0, False)
+                error = "other"
                 logger.error(f"下载失败: {url}", details={"error": str(e), "attempt": attempt + 1})
                 if attempt < max_retries - 1:
                     continue
+        metrics.inc("newspaper_fetch_errors_total", reason=error, **labels)
         return False
     
+    @staticmethod
+    def _reset_target(target):
+        if hasattr(target, "reset"):
+            target.reset()
+        else:
+            target.seek(0)
+            target.truncate()
+    
     def close(self):
         self._session.close()
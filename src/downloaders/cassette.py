@@ -0,0 +1,320 @@
+# -*- coding: UTF-8 -*-
+"""
+HTTP 录制与回放
+
+录制模式把下载器会话的全部请求和响应保存为磁带 (cassette) 目录:
+cassette.json 记录每次交互的 URL、状态码、响应头和耗时，响应内容按
+SHA-256 存放在 bodies/ 下，相同内容只保存一份。
+
+回放模式通过同样的 requests.Session 适配器路径返回录制的响应，不访问
+网络。同一 URL 录制了多次时按顺序返回，用完后重复最后一次。响应时间
+可以是 none (立即返回)、recorded (按录制时的耗时) 或 synthetic (固定
+延迟加带宽)，用于在版本之间做可重复的性能对比。
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from http.client import responses as HTTP_REASONS
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .base import mount_session_adapter, unmount_session_adapter
+
+CASSETTE_FILENAME = "cassette.json"
+BODIES_DIRNAME = "bodies"
+CASSETTE_VERSION = 1
+
+TIMING_MODES = ("none", "recorded", "synthetic")
+
+# 挂载到所有下载器会话上的 URL 前缀
+_PREFIXES = ("http://", "https://")
+
+
+class Cassette:
+    """录制的 HTTP 交互
+
+    Args:
+        path: 磁带目录
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.interactions: List[dict] = []
+        self._by_key: Dict[tuple, List[dict]] = {}
+        self._cursor: Dict[tuple, int] = {}
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path)
+        with open(os.path.join(path, CASSETTE_FILENAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for interaction in data.get("interactions", []):
+            cassette._append(interaction)
+        return cassette
+
+    def save(self):
+        """原子写入 cassette.json (响应内容在录制时已写入)"""
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "interactions": list(self.interactions)}
+        index_path = os.path.join(self.path, CASSETTE_FILENAME)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, index_path)
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.path, BODIES_DIRNAME, digest[:2], digest)
+
+    def _append(self, interaction: dict):
+        self.interactions.append(interaction)
+        key = (interaction["method"], interaction["url"])
+        self._by_key.setdefault(key, []).append(interaction)
+
+    def add(
+        self,
+        method: str,
+        url: str,
+        status: int = 0,
+        headers: Optional[dict] = None,
+        body: bytes = b"",
+        elapsed: float = 0.0,
+        duration: float = 0.0,
+        error: Optional[str] = None
+    ):
+        """记录一次交互
+
+        Args:
+            elapsed: 发出请求到收到响应头的秒数
+            duration: 发出请求到读完响应内容的秒数
+            error: 请求失败时的错误类型 (timeout / connection / incomplete)，此时不保存响应
+        """
+        interaction = {"method": method, "url": url, "elapsed": round(elapsed, 6), "duration": round(duration, 6)}
+        if error:
+            interaction["error"] = error
+        else:
+            digest = hashlib.sha256(body).hexdigest()
+            body_path = self._body_path(digest)
+            if not os.path.exists(body_path):
+                os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, body_path)
+            interaction.update({"status": status, "headers": dict(headers or {}), "body": digest, "size": len(body)})
+        with self._lock:
+            self._append(interaction)
+
+    def next_interaction(self, method: str, url: str) -> Optional[dict]:
+        """按录制顺序取出 URL 的下一次交互，没有录制时为 None"""
+        key = (method, url)
+        with self._lock:
+            recorded = self._by_key.get(key)
+            if not recorded:
+                self.misses += 1
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return recorded[min(index, len(recorded) - 1)]
+
+    def read_body(self, digest: str) -> bytes:
+        with open(self._body_path(digest), "rb") as f:
+            return f.read()
+
+    def rewind(self):
+        with self._lock:
+            self._cursor.clear()
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            bodies = {item["body"]: item["size"] for item in self.interactions if "body" in item}
+            return {
+                "interactions": len(self.interactions),
+                "bodies": len(bodies),
+                "body_bytes": sum(bodies.values()),
+                "response_bytes": sum(item.get("size", 0) for item in self.interactions),
+            }
+
+
+class RecordingAdapter(BaseAdapter):
+    """发送真实请求并把响应记录到磁带
+
+    响应内容在适配器中读完后才返回，流式下载在录制时变为先读完再交给调用方。
+
+    Args:
+        cassette: 录制目标
+        inner: 实际发送请求的适配器，默认 HTTPAdapter
+    """
+
+    def __init__(self, cassette: Cassette, inner: Optional[BaseAdapter] = None):
+        super().__init__()
+        self.cassette = cassette
+        self._inner = inner or HTTPAdapter(pool_maxsize=32)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self._inner.send(request, **kwargs)
+            elapsed = time.perf_counter() - start
+            body = response.content
+        except requests.exceptions.Timeout:
+            self.cassette.add(request.method, request.url, elapsed=time.perf_counter() - start, error="timeout")
+            raise
+        except requests.exceptions.ChunkedEncodingError:
+            self.cassette.add(request.method, request.url, elapsed=time.perf_counter() - start, error="incomplete")
+            raise
+        except requests.exceptions.ConnectionError:
+            self.cassette.add(request.method, request.url, elapsed=time.perf_counter() - start, error="connection")
+            raise
+        self.cassette.add(
+            request.method, request.url, response.status_code, response.headers, body,
+            elapsed=elapsed, duration=time.perf_counter() - start
+        )
+        # 内容已读入内存，iter_content() 会直接切分 response.content
+        return response
+
+    def close(self):
+        # 所有下载器会话共用同一个适配器，会话关闭时不关闭连接池
+        pass
+
+    def shutdown(self):
+        self._inner.close()
+
+
+class _PacedReader(io.BytesIO):
+    """按设定速度读出内容的响应体"""
+
+    def __init__(self, data: bytes, seconds_per_byte: float):
+        super().__init__(data)
+        self._seconds_per_byte = seconds_per_byte
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = super().read(size)
+        if chunk and self._seconds_per_byte:
+            time.sleep(len(chunk) * self._seconds_per_byte)
+        return chunk
+
+
+class ReplayAdapter(BaseAdapter):
+    """从磁带返回响应，不访问网络
+
+    Args:
+        cassette: 录制的磁带
+        timing: none / recorded / synthetic
+        latency: synthetic 模式下每个响应头的延迟 (秒)
+        bandwidth: synthetic 模式下的传输速度 (字节/秒)，0 表示不限
+    """
+
+    def __init__(self, cassette: Cassette, timing: str = "none", latency: float = 0.0, bandwidth: int = 0):
+        super().__init__()
+        if timing not in TIMING_MODES:
+            raise ValueError(f"未知的回放时间模式: {timing}")
+        self.cassette = cassette
+        self.timing = timing
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.next_interaction(request.method, request.url)
+        if interaction is None:
+            return self._build_response(request, 404, {}, b"")
+
+        if interaction.get("error"):
+            self._sleep(interaction["elapsed"])
+            if interaction["error"] == "timeout":
+                raise requests.exceptions.ConnectTimeout(f"回放录制的超时: {request.url}", request=request)
+            if interaction["error"] == "incomplete":
+                raise requests.exceptions.ChunkedEncodingError(f"回放录制的不完整响应: {request.url}", request=request)
+            raise requests.exceptions.ConnectionError(f"回放录制的连接失败: {request.url}", request=request)
+
+        body = self.cassette.read_body(interaction["body"])
+        if self.timing == "recorded":
+            header_delay = interaction["elapsed"]
+            transfer = max(0.0, interaction["duration"] - interaction["elapsed"])
+        elif self.timing == "synthetic":
+            header_delay = self.latency
+            transfer = len(body) / self.bandwidth if self.bandwidth else 0.0
+        else:
+            header_delay = transfer = 0.0
+        self._sleep(header_delay)
+        return self._build_response(
+            request, interaction["status"], interaction["headers"], body,
+            seconds_per_byte=transfer / len(body) if body else 0.0
+        )
+
+    @staticmethod
+    def _sleep(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    @staticmethod
+    def _build_response(request, status: int, headers: dict, body: bytes, seconds_per_byte: float = 0.0):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        # 录制时已解压，去掉编码头避免再次解压
+        response.headers.pop("Content-Encoding", None)
+        response.headers["Content-Length"] = str(len(body))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _PacedReader(body, seconds_per_byte)
+        response.reason = HTTP_REASONS.get(status, "")
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+
+    def close(self):
+        pass
+
+
+_active: Optional[tuple] = None
+
+
+def start_recording(path: str, inner: Optional[BaseAdapter] = None) -> Cassette:
+    """之后创建的下载器把所有请求录制到 path"""
+    stop_cassette()
+    cassette = Cassette(path)
+    adapter = RecordingAdapter(cassette, inner)
+    _install(cassette, adapter)
+    return cassette
+
+
+def start_replay(path: str, timing: str = "none", latency: float = 0.0, bandwidth: int = 0) -> Cassette:
+    """之后创建的下载器从 path 的磁带回放，不访问网络"""
+    stop_cassette()
+    cassette = Cassette.load(path)
+    _install(cassette, ReplayAdapter(cassette, timing, latency, bandwidth))
+    return cassette
+
+
+def _install(cassette: Cassette, adapter: BaseAdapter):
+    global _active
+    for prefix in _PREFIXES:
+        mount_session_adapter(prefix, adapter)
+    _active = (cassette, adapter)
+
+
+def stop_cassette() -> Optional[Cassette]:
+    """卸下录制或回放适配器；录制的磁带在此时保存"""
+    global _active
+    if _active is None:
+        return None
+    cassette, adapter = _active
+    _active = None
+    for prefix in _PREFIXES:
+        unmount_session_adapter(prefix)
+    if isinstance(adapter, RecordingAdapter):
+        cassette.save()
+        adapter.shutdown()
+    return cassette
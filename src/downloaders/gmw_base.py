@@ -1,6 +1,8 @@
 # -*- coding: UTF-8 -*-
 """
 光明日报、文摘报、中华读书报的公共基类
+
+页面解析是模块级函数 (parse_*)，可以在进程池中执行，见 PlatformDownloaderBase._parse。
 """
 from abc import ABC
 from datetime import datetime
@@ -11,6 +13,77 @@ from .base import PlatformDownloaderBase, EditionInfo
 from ..utils.logger import logger
 
 
+def parse_page_list(html: str, layout_url: str) -> Tuple[List[str], List[str]]:
+    """从版面目录页解析各版面的页面地址和名称
+    
+    Args:
+        layout_url: 相对地址的基准 (.../html/layout/)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    list_ul = soup.find('ul', id='list')
+    page_urls = []
+    page_names = []
+    
+    if list_ul:
+        for li in list_ul.find_all('li'):
+            a = li.find('a', href=True)
+            if a and a.get('href'):
+                href = a.get('href')
+                if href.startswith('http'):
+                    page_url = href
+                else:
+                    page_url = f'{layout_url}{href}'
+                page_urls.append(page_url)
+                
+                page_name = li.get_text(strip=True)
+                page_names.append(page_name)
+    
+    return page_urls, page_names
+
+
+def _page_name(soup: BeautifulSoup) -> str:
+    version_div = soup.find('div', class_='m-paper-version')
+    if version_div:
+        span = version_div.find('span', class_='mob-version')
+        if span:
+            return span.get_text(strip=True)
+    return "未知版"
+
+
+def parse_page_image(html: str, page_url: str) -> Tuple[Optional[str], str]:
+    """光明日报的图片提取逻辑：版面图 img#map"""
+    soup = BeautifulSoup(html, 'html.parser')
+    page_name = _page_name(soup)
+    
+    img = soup.find('img', id='map')
+    if img and img.get('src'):
+        src = img.get('src')
+        if src:
+            abs_url = urljoin(page_url, src)
+            jpg_url = abs_url.replace('.jpg.2', '.jpg')
+            return jpg_url, page_name
+    
+    return None, page_name
+
+
+def parse_page_image_fallback(html: str, page_url: str) -> Tuple[Optional[str], str]:
+    """文摘报的图片提取逻辑：没有 img#map 时查找地址中带 page 的图片"""
+    img_url, page_name = parse_page_image(html, page_url)
+    if img_url:
+        return img_url, page_name
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        if src and 'page' in src and ('.jpg' in src or 'images' in src):
+            abs_url = urljoin(page_url, src)
+            jpg_url = abs_url.replace('.jpg.2', '.jpg').replace('../../../', 'https://img.gmw.cn/')
+            return jpg_url, page_name
+    
+    return None, page_name
+
+
 class GMWDownloaderBase(PlatformDownloaderBase):
     """光明日报、文摘报、中华读书报的公共基类
     
@@ -52,25 +125,9 @@ class GMWDownloaderBase(PlatformDownloaderBase):
             self._log_error(f"获取版面列表失败: {e}")
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        list_ul = soup.find('ul', id='list')
-        page_urls = []
-        page_names = []
-        
-        if list_ul:
-            for li in list_ul.find_all('li'):
-                a = li.find('a', href=True)
-                if a and a.get('href'):
-                    href = a.get('href')
-                    if href.startswith('http'):
-                        page_url = href
-                    else:
-                        page_url = f'{self.BASE_URL}/{self.PAPER_CODE}/html/layout/{href}'
-                    page_urls.append(page_url)
-                    
-                    page_name = li.get_text(strip=True)
-                    page_names.append(page_name)
+        page_urls, page_names = self._parse(
+            parse_page_list, html, f'{self.BASE_URL}/{self.PAPER_CODE}/html/layout/'
+        )
         
         if not page_urls:
             for page in range(1, 20):
@@ -105,64 +162,25 @@ class GMWDownloaderBase(PlatformDownloaderBase):
         """
         return None
     
-    def _extract_image_from_page_gmrb(self, page_url: str) -> Tuple[Optional[str], str]:
-        """光明日报的图片提取逻辑"""
+    def _fetch_html(self, page_url: str) -> Optional[str]:
         try:
             resp = self._session.get(page_url, timeout=30)
             resp.raise_for_status()
             resp.encoding = 'utf-8'
-            html = resp.text
-        except Exception as e:
+            return resp.text
+        except Exception:
+            return None
+    
+    def _extract_image_from_page_gmrb(self, page_url: str) -> Tuple[Optional[str], str]:
+        """光明日报的图片提取逻辑"""
+        html = self._fetch_html(page_url)
+        if html is None:
             return None, "未知版"
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        version_div = soup.find('div', class_='m-paper-version')
-        page_name = "未知版"
-        if version_div:
-            span = version_div.find('span', class_='mob-version')
-            if span:
-                page_name = span.get_text(strip=True)
-        
-        img = soup.find('img', id='map')
-        if img and img.get('src'):
-            src = img.get('src')
-            if src:
-                abs_url = urljoin(page_url, src)
-                jpg_url = abs_url.replace('.jpg.2', '.jpg')
-                return jpg_url, page_name
-        
-        return None, page_name
+        return self._parse(parse_page_image, html, page_url)
     
     def _extract_image_from_page_wenzhai(self, page_url: str) -> Tuple[Optional[str], str]:
         """文摘报的备用图片提取逻辑"""
-        img_url, page_name = self._extract_image_from_page_gmrb(page_url)
-        if img_url:
-            return img_url, page_name
-        
-        try:
-            resp = self._session.get(page_url, timeout=30)
-            resp.raise_for_status()
-            resp.encoding = 'utf-8'
-            html = resp.text
-        except Exception as e:
+        html = self._fetch_html(page_url)
+        if html is None:
             return None, "未知版"
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        version_div = soup.find('div', class_='m-paper-version')
-        page_name = "未知版"
-        if version_div:
-            span = version_div.find('span', class_='mob-version')
-            if span:
-                page_name = span.get_text(strip=True)
-        
-        all_imgs = soup.find_all('img')
-        for img in all_imgs:
-            src = img.get('src')
-            if src and 'page' in src and ('.jpg' in src or 'images' in src):
-                abs_url = urljoin(page_url, src)
-                jpg_url = abs_url.replace('.jpg.2', '.jpg').replace('../../../', 'https://img.gmw.cn/')
-                return jpg_url, page_name
-        
-        return None, page_name
+        return self._parse(parse_page_image_fallback, html, page_url)
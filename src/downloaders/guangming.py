@@ -43,13 +43,14 @@ class GuangmingRibaoDownloader(GMWDownloaderBase):
         date_str = today.strftime('%Y-%m-%d')
         return self._get_edition_by_date(date_str)
     
-    def _get_page_image_url(self, page_url: str) -> tuple:
-        """从版面页面获取图片URL和版名
+    def _get_page_image_url(self, page_url: str) -> Optional[str]:
+        """从版面页面获取图片URL
         
         Args:
             page_url: 版面页面URL
             
         Returns:
-            (图片URL, 版名) 的元组
+            图片URL，找不到时为 None
         """
-        return self._extract_image_from_page_gmrb(page_url)
+        img_url, _ = self._extract_image_from_page_gmrb(page_url)
+        return img_url
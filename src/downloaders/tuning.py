@@ -0,0 +1,218 @@
+# -*- coding: UTF-8 -*-
+"""
+下载性能配置与并发自动调整
+
+每个平台有自己的下载配置 (重试次数、超时、分块大小、并发数、请求速率)，
+在 config.json 的 download 中设置全局默认值，newspapers.<平台>.download
+中按报纸覆盖。
+
+同一站点的请求由 HostController 控制并发数和请求间隔。开启 auto_tune 后
+按 AIMD 方式调整并发数：每完成一个窗口 (当前并发数个请求)，失败率超过
+阈值或平均响应时间明显高于基准时成倍减小，否则加 1。调整后的并发数和
+基准响应时间保存在存档目录的 .download_tuning.json 中，下次运行沿用。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import Dict, Optional
+
+TUNING_FILENAME = ".download_tuning.json"
+
+# 加性增、乘性减
+ADDITIVE_INCREASE = 1.0
+MULTIPLICATIVE_DECREASE = 0.5
+# 响应变慢时的减小比例 (比出错时温和)
+LATENCY_DECREASE = 0.75
+# 窗口失败率超过此值时减小并发
+ERROR_RATE_LIMIT = 0.1
+# 平均响应时间超过基准的倍数时视为拥塞
+LATENCY_FACTOR = 2.0
+# 基准响应时间每个窗口最多上浮的比例，网络条件变化后逐渐跟上
+BASELINE_DRIFT = 1.02
+
+
+@dataclass
+class DownloadProfile:
+    """一个平台的下载配置"""
+    max_retries: int = 3
+    timeout: float = 60
+    chunk_size: int = 8192
+    concurrency: int = 2
+    requests_per_second: float = 0
+    auto_tune: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 8
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "DownloadProfile":
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in values.items() if key in names})
+
+    @property
+    def workers(self) -> int:
+        """一期报纸同时下载的版面数上限"""
+        if self.auto_tune:
+            return max(1, self.max_concurrency)
+        return max(1, self.concurrency)
+
+
+class HostController:
+    """一个站点的并发上限、请求间隔和 AIMD 调整
+
+    Args:
+        host: 站点
+        profile: 首次访问该站点的平台的下载配置
+        state: 上次保存的调整结果 {"concurrency", "latency"}
+    """
+
+    def __init__(self, host: str, profile: DownloadProfile, state: Optional[dict] = None):
+        self.host = host
+        self.auto_tune = profile.auto_tune
+        self.min_limit = max(1, profile.min_concurrency)
+        self.max_limit = max(self.min_limit, profile.max_concurrency)
+        self.interval = 1.0 / profile.requests_per_second if profile.requests_per_second > 0 else 0.0
+        self.baseline: Optional[float] = None
+
+        limit = float(max(1, profile.concurrency))
+        if self.auto_tune:
+            if state:
+                limit = float(state.get("concurrency", limit))
+                self.baseline = state.get("latency")
+            limit = min(max(limit, self.min_limit), self.max_limit)
+        self._limit = limit
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._next_start = 0.0
+        self._samples = 0
+        self._failures = 0
+        self._latency_sum = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额，并按请求速率排队"""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+            delay = 0.0
+            if self.interval:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self.interval
+                delay = start - now
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, latency: float, ok: bool):
+        """记录一个请求的结果
+
+        Args:
+            latency: 收到响应头的秒数
+            ok: False 表示超时、连接失败或 429/5xx 等拥塞信号
+        """
+        if not self.auto_tune:
+            return
+        with self._cond:
+            self._samples += 1
+            if ok:
+                self._latency_sum += latency
+            else:
+                self._failures += 1
+            if self._samples < self.limit:
+                return
+            self._adjust()
+            self._samples = self._failures = 0
+            self._latency_sum = 0.0
+            self._cond.notify_all()
+
+    def _adjust(self):
+        if self._failures / self._samples > ERROR_RATE_LIMIT:
+            self._limit = max(self.min_limit, self._limit * MULTIPLICATIVE_DECREASE)
+            return
+        average = self._latency_sum / (self._samples - self._failures)
+        if self.baseline is None:
+            self.baseline = average
+        else:
+            self.baseline = min(average, self.baseline * BASELINE_DRIFT)
+        if average > self.baseline * LATENCY_FACTOR:
+            self._limit = max(self.min_limit, self._limit * LATENCY_DECREASE)
+        else:
+            self._limit = min(self.max_limit, self._limit + ADDITIVE_INCREASE)
+
+    def state(self) -> dict:
+        with self._cond:
+            state = {"concurrency": round(self._limit, 2)}
+            if self.baseline is not None:
+                state["latency"] = round(self.baseline, 4)
+            return state
+
+
+class TuningRegistry:
+    """各站点的 HostController，以及调整结果的读写"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._controllers: Dict[str, HostController] = {}
+        self._saved: Dict[str, dict] = {}
+        self.path: Optional[str] = None
+
+    def attach(self, path: str):
+        """使用 path 中保存的调整结果 (切换存档目录时重新读取)"""
+        with self._lock:
+            if path == self.path:
+                return
+            self.path = path
+            self._controllers.clear()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._saved = json.load(f).get("hosts", {})
+            except (OSError, ValueError, AttributeError):
+                self._saved = {}
+
+    def controller(self, host: str, profile: DownloadProfile) -> HostController:
+        with self._lock:
+            controller = self._controllers.get(host)
+            if controller is None:
+                controller = HostController(host, profile, self._saved.get(host))
+                self._controllers[host] = controller
+            return controller
+
+    def save(self):
+        """保存开启了自动调整的站点的当前结果"""
+        with self._lock:
+            if not self.path:
+                return
+            hosts = dict(self._saved)
+            for host, controller in self._controllers.items():
+                if controller.auto_tune:
+                    hosts[host] = controller.state()
+            self._saved = hosts
+            path = self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"hosts": hosts}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._controllers.clear()
+            self._saved = {}
+            self.path = None
+
+
+host_tuning = TuningRegistry()
@@ -4,6 +4,7 @@
 官方网站: http://mrdx.cn/
 
 下载方式: 从HTML解析版面图片，下载后合并为PDF
+页面解析 parse_page_images 是模块级函数，可以在进程池中执行
 """
 import re
 import os
@@ -14,6 +15,38 @@ from typing import Optional, List
 from .base import PlatformDownloaderBase, EditionInfo
 
 
+def parse_page_images(html: str, date_str: str) -> List[str]:
+    """从版面页面中提取各版图片链接
+    
+    Args:
+        html: 第一版页面的 HTML
+        date_str: 日期字符串 YYYYMMDD
+        
+    Returns:
+        图片链接列表
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    urls = []
+    
+    all_imgs = soup.find_all('img')
+    
+    for img in all_imgs:
+        src = img.get('src')
+        if src and 'Page' in src and '.jpg' in src:
+            if src.startswith('http'):
+                img_url = src
+            elif src.startswith('../../'):
+                img_url = f'http://mrdx.cn/{src.replace("../../", "")}'
+            else:
+                img_url = urljoin(f'http://mrdx.cn/content/{date_str}/', src)
+            
+            if img_url not in urls:
+                urls.append(img_url)
+    
+    urls.sort()
+    return urls
+
+
 class XinhuaDailyDownloader(PlatformDownloaderBase):
     """新华每日电讯下载器
     
@@ -73,9 +106,7 @@ class XinhuaDailyDownloader(PlatformDownloaderBase):
             print(f"新华每日电讯暂时无法连接: {e}")
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        page_urls = self._get_image_urls_from_page(soup, date_str)
+        page_urls = self._parse(parse_page_images, html, date_str)
         
         if not page_urls:
             return None
@@ -86,33 +117,3 @@ class XinhuaDailyDownloader(PlatformDownloaderBase):
             date=date,
             page_urls=page_urls
         )
-    
-    def _get_image_urls_from_page(self, soup, date_str: str) -> List[str]:
-        """从页面中提取图片链接
-        
-        Args:
-            soup: BeautifulSoup对象
-            date_str: 日期字符串
-            
-        Returns:
-            图片链接列表
-        """
-        urls = []
-        
-        all_imgs = soup.find_all('img')
-        
-        for img in all_imgs:
-            src = img.get('src')
-            if src and 'Page' in src and '.jpg' in src:
-                if src.startswith('http'):
-                    img_url = src
-                elif src.startswith('../../'):
-                    img_url = f'http://mrdx.cn/{src.replace("../../", "")}'
-                else:
-                    img_url = urljoin(f'http://mrdx.cn/content/{date_str}/', src)
-                
-                if img_url not in urls:
-                    urls.append(img_url)
-        
-        urls.sort()
-        return urls
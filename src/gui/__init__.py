@@ -1,5 +1,6 @@
 # -*- coding: UTF-8 -*-
 from .main_window import MainWindow
 from .controller import DownloadController
+from .jobs import Job, JobManager
 
-__all__ = ["MainWindow", "DownloadController"]
+__all__ = ["MainWindow", "DownloadController", "Job", "JobManager"]
@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+"""
+后台刷新报纸更新日期
+
+在后台线程中同时检查多份报纸，每确认一个有更新的日期就通过信号通知界面，
+不阻塞 GUI 线程；可以随时取消，已确认的日期仍会报告。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from ..config import config
+from ..downloaders import check_available_dates
+
+
+class AvailabilityRefresher(QObject):
+    """后台检查报纸的更新日期
+
+    Signals:
+        date_found(platform_id, date): 确认一个有更新的日期
+        platform_finished(platform_id, dates, complete): 一份报纸检查结束，
+            取消时 dates 只是已确认的部分，complete 为 False
+        finished(cancelled): 全部检查结束
+    """
+
+    date_found = Signal(str, str)
+    platform_finished = Signal(str, list, bool)
+    finished = Signal(bool)
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._thread: Optional[threading.Thread] = None
+        self._cancel_requested = False
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, platform_ids: List[str], days: int) -> bool:
+        """开始刷新，已有刷新在进行时返回 False"""
+        if self.is_running() or not platform_ids:
+            return False
+        self._cancel_requested = False
+        self._thread = threading.Thread(
+            target=self._run, args=(list(platform_ids), days), name="availability-refresh", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, platform_ids: List[str], days: int):
+        with ThreadPoolExecutor(max_workers=len(platform_ids)) as executor:
+            for platform_id in platform_ids:
+                executor.submit(self._check, platform_id, days)
+        self.finished.emit(self._cancel_requested)
+
+    def _check(self, platform_id: str, days: int):
+        try:
+            dates = check_available_dates(
+                platform_id, config, days=days,
+                on_date=lambda date: self.date_found.emit(platform_id, date),
+                is_cancelled=lambda: self._cancel_requested
+            )
+        except Exception:
+            dates = []
+        self.platform_finished.emit(platform_id, dates, not self._cancel_requested)
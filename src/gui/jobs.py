@@ -0,0 +1,415 @@
+# -*- coding: UTF-8 -*-
+"""
+下载任务管理 - 任务队列、优先级、并发执行、暂停与取消
+
+每个任务是一个平台的一期或多期报纸。任务按优先级 (相同时按提交顺序) 排队，
+最多 jobs.max_concurrent 个任务在线程池中同时运行。
+
+暂停和取消都通过 EditionPipeline 的 is_cancelled 在当前这一期中途生效；
+被打断的一期不计入进度，继续时从这一期重新下载。暂停的任务让出线程，
+继续后重新排队。
+
+同时运行的任务共用全局指标，和性能剖析一样按 "一次运行" (从第一个任务
+开始到没有任务在运行) 统计，运行结束时导出一次。
+"""
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+from ..config import config
+from ..downloaders import get_downloader, DownloadProgress
+from ..downloaders.bandwidth import BATCH, INTERACTIVE
+from ..utils import StorageManager
+from ..utils.metrics import metrics
+from ..pipeline import (
+    EditionPipeline, build_image_profile, get_newspaper_name,
+    export_run_metrics, start_profiling, finish_profiling,
+)
+
+# 单独下载某一天 (界面上立即等待结果) 优先于批量下载
+INTERACTIVE_PRIORITY = 10
+BATCH_PRIORITY = 0
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+FAILED = "failed"
+
+STATE_LABELS = {
+    QUEUED: "排队中",
+    RUNNING: "下载中",
+    PAUSED: "已暂停",
+    CANCELLED: "已取消",
+    DONE: "已完成",
+    FAILED: "失败",
+}
+
+FINISHED_STATES = (CANCELLED, DONE, FAILED)
+
+
+class JobSignals(QObject):
+    progress_signal = Signal(str, int, int)
+    log_signal = Signal(str)
+    complete_signal = Signal(bool, str)
+    batch_complete_signal = Signal(int, int)
+    date_progress_signal = Signal(int, int, str)
+
+
+class Job:
+    """一个下载任务
+
+    Args:
+        dates: 要下载的日期，单期任务中 None 表示最新一期
+        batch: 批量任务完成时发出 batch_complete_signal，否则发出 complete_signal
+    """
+
+    def __init__(
+        self,
+        platform_id: str,
+        dates: List[Optional[str]],
+        output_dir: str,
+        image_profile: Optional[str] = None,
+        priority: int = BATCH_PRIORITY,
+        batch: bool = True
+    ):
+        self.id = 0
+        self.platform_id = platform_id
+        self.newspaper_name = get_newspaper_name(platform_id)
+        self.dates = list(dates)
+        self.output_dir = output_dir
+        self.image_profile = image_profile
+        self.priority = priority
+        self.batch = batch
+        self.signals = JobSignals()
+
+        self.state = QUEUED
+        self.next_index = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+        self.current_date: Optional[str] = None
+        self.message = ""
+        self._elapsed = 0.0
+        self._resumed_at: Optional[float] = None
+        self._pause_requested = False
+        self._cancel_requested = False
+
+    @property
+    def total(self) -> int:
+        return len(self.dates)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    @property
+    def elapsed(self) -> float:
+        """运行时间 (秒)，不含排队和暂停的时间"""
+        if self._resumed_at is None:
+            return self._elapsed
+        return self._elapsed + time.monotonic() - self._resumed_at
+
+    @property
+    def editions_per_minute(self) -> float:
+        elapsed = self.elapsed
+        return (self.succeeded + self.failed) * 60 / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_downloaded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def title(self) -> str:
+        if not self.dates or self.dates[0] is None:
+            return "最新一期"
+        if self.total == 1:
+            return self.dates[0]
+        return f"{self.dates[-1]} ~ {self.dates[0]} ({self.total} 期)"
+
+    @property
+    def traffic_class(self) -> str:
+        """全局限速时的流量类别：单期任务优先占用带宽
+
+        只由任务类型决定，与排队优先级无关：移到队列最前的批量任务仍是 batch 流量。
+        """
+        return BATCH if self.batch else INTERACTIVE
+
+    def stop_requested(self) -> bool:
+        return self._pause_requested or self._cancel_requested
+
+
+class _JobRunner(QRunnable):
+    """在线程池中下载一个任务尚未完成的日期"""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        super().__init__()
+        self.manager = manager
+        self.job = job
+        self.start_count = job.succeeded, job.failed
+
+    def run(self):
+        job = self.job
+        storage = StorageManager(job.output_dir or config.default_output_dir)
+        try:
+            self._download(storage)
+        except Exception as e:
+            job.message = str(e)
+            self._log("ERROR", f"下载出错: {str(e)[:50]}")
+            if not job.stop_requested():
+                # 开始下载前就出错 (如配置有误)：重新排队还会出同样的错，其余日期记为失败
+                job.failed += job.total - job.next_index
+                job.next_index = job.total
+        finally:
+            self.manager._runner_finished.emit(job.id)
+
+    def _download(self, storage: StorageManager):
+        job = self.job
+        downloader = get_downloader(job.platform_id, config)
+        if not downloader:
+            job.message = f"未知的平台: {job.platform_id}"
+            self._log("ERROR", job.message)
+            job.failed += job.total - job.next_index
+            job.next_index = job.total
+            return
+
+        received: Dict[str, int] = {}
+        lock = threading.Lock()
+
+        def progress_callback(progress: DownloadProgress):
+            if job.stop_requested():
+                return
+            with lock:
+                job.bytes_downloaded += max(0, progress.current - received.get(progress.filename, 0))
+                received[progress.filename] = progress.current
+            job.signals.progress_signal.emit(progress.filename, progress.current, progress.total)
+
+        downloader.set_progress_callback(progress_callback)
+        downloader.set_traffic_class(job.traffic_class)
+        pipeline = EditionPipeline(
+            job.platform_id,
+            storage,
+            profile=build_image_profile(job.image_profile, job.platform_id),
+            log=self._log,
+            is_cancelled=job.stop_requested,
+            verbose=not job.batch
+        )
+        try:
+            while job.next_index < job.total and not job.stop_requested():
+                date = job.dates[job.next_index]
+                job.current_date = date
+                if job.batch:
+                    job.signals.date_progress_signal.emit(job.next_index + 1, job.total, date)
+                    self._log("INFO", f"[{job.next_index + 1}/{job.total}] 正在下载 {date}...")
+                try:
+                    success, message = pipeline.run(downloader, date)
+                except Exception as e:
+                    success, message = False, str(e)
+                    self._log("WARNING", f"下载 {date} 失败: {str(e)[:50]}")
+                if not success and job.stop_requested():
+                    # 被暂停或取消打断的一期不计入进度
+                    break
+                job.message = message
+                if success:
+                    job.succeeded += 1
+                else:
+                    job.failed += 1
+                job.next_index += 1
+                self.manager.job_changed.emit(job.id)
+        finally:
+            job.current_date = None
+            downloader.close()
+
+    def _log(self, level: str, message: str):
+        self.job.signals.log_signal.emit(f"[{level}] [{self.job.newspaper_name}] {message}")
+
+
+class JobManager(QObject):
+    """下载任务队列和线程池
+
+    Args:
+        max_concurrent: 同时运行的任务数，默认使用配置
+    """
+
+    job_added = Signal(int)
+    job_changed = Signal(int)
+    idle = Signal()
+    _runner_finished = Signal(int)
+
+    def __init__(self, max_concurrent: Optional[int] = None, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._running: set = set()
+        self._runners: Dict[int, List[_JobRunner]] = {}
+        self._profiling = False
+        self._last_storage: Optional[StorageManager] = None
+        self._metrics_since: Optional[dict] = None
+        self._run_platforms: set = set()
+        self._run_counts = [0, 0]
+        self._pool = QThreadPool(self)
+        self.set_max_concurrent(max_concurrent if max_concurrent is not None else config.max_concurrent_jobs)
+        self._runner_finished.connect(self._on_runner_finished)
+
+    @property
+    def max_concurrent(self) -> int:
+        return self._max_concurrent
+
+    def set_max_concurrent(self, value: int):
+        self._max_concurrent = max(1, value)
+        self._pool.setMaxThreadCount(self._max_concurrent)
+        self._schedule()
+
+    def submit(self, job: Job) -> Job:
+        """加入队列 (连接好 job.signals 之后再提交，以免漏掉开头的日志)"""
+        job.id = next(self._ids)
+        job.state = QUEUED
+        self._jobs[job.id] = job
+        self.job_added.emit(job.id)
+        self._schedule()
+        return job
+
+    def job(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def queued(self) -> List[Job]:
+        """排队中的任务，按运行顺序"""
+        waiting = [job for job in self._jobs.values() if job.state == QUEUED]
+        return sorted(waiting, key=lambda job: (-job.priority, job.id))
+
+    def has_active(self) -> bool:
+        return any(job.state in (QUEUED, RUNNING) for job in self._jobs.values())
+
+    def set_priority(self, job_id: int, priority: int):
+        job = self._jobs.get(job_id)
+        if job and not job.finished:
+            job.priority = priority
+            self.job_changed.emit(job_id)
+            self._schedule()
+
+    def pause(self, job_id: int):
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        if job.state == QUEUED:
+            job.state = PAUSED
+            self.job_changed.emit(job_id)
+        elif job.state == RUNNING:
+            job._pause_requested = True
+
+    def resume(self, job_id: int):
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        job._pause_requested = False
+        if job.state == PAUSED:
+            job.state = QUEUED
+            self.job_changed.emit(job_id)
+            self._schedule()
+
+    def cancel(self, job_id: int):
+        job = self._jobs.get(job_id)
+        if not job or job.finished:
+            return
+        job._cancel_requested = True
+        if job.state != RUNNING:
+            self._finish(job)
+
+    def cancel_all(self):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+
+    def remove_finished(self) -> List[int]:
+        removed = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in removed:
+            del self._jobs[job_id]
+            self._runners.pop(job_id, None)
+        return removed
+
+    def wait(self, timeout_ms: int = -1) -> bool:
+        """等待正在运行的任务 (关闭窗口时用)"""
+        return self._pool.waitForDone(timeout_ms)
+
+    def _schedule(self):
+        for job in self.queued():
+            if len(self._running) >= self._max_concurrent:
+                break
+            self._start(job)
+
+    def _start(self, job: Job):
+        if not self._profiling:
+            start_profiling()
+            self._profiling = True
+        if self._metrics_since is None:
+            self._metrics_since = metrics.checkpoint()
+            self._run_platforms = set()
+            self._run_counts = [0, 0]
+        self._run_platforms.add(job.platform_id)
+        job.state = RUNNING
+        job._pause_requested = False
+        job._resumed_at = time.monotonic()
+        self._running.add(job.id)
+        self._last_storage = StorageManager(job.output_dir or config.default_output_dir)
+        self.job_changed.emit(job.id)
+        # 由 Python 持有 runner (线程池自动删除会与 Python 对象重复释放)，清除任务时才释放
+        runner = _JobRunner(self, job)
+        runner.setAutoDelete(False)
+        self._runners.setdefault(job.id, []).append(runner)
+        self._pool.start(runner)
+
+    @Slot(int)
+    def _on_runner_finished(self, job_id: int):
+        job = self._jobs.get(job_id)
+        self._running.discard(job_id)
+        if job is not None:
+            start_count = self._runners[job_id][-1].start_count
+            self._run_counts[0] += job.succeeded - start_count[0]
+            self._run_counts[1] += job.failed - start_count[1]
+            job._elapsed = job.elapsed
+            job._resumed_at = None
+            if job._cancel_requested or job.next_index >= job.total:
+                self._finish(job)
+            else:
+                # 暂停请求已被 resume 撤销时直接重新排队
+                job.state = PAUSED if job._pause_requested else QUEUED
+                self.job_changed.emit(job_id)
+        self._schedule()
+        if not self._running:
+            if self._last_storage is not None:
+                if self._metrics_since is not None:
+                    export_run_metrics(
+                        self._last_storage, self._metrics_since,
+                        platform=",".join(sorted(self._run_platforms)),
+                        success_count=self._run_counts[0], fail_count=self._run_counts[1]
+                    )
+                if self._profiling:
+                    finish_profiling(self._last_storage)
+            self._metrics_since = None
+            self._profiling = False
+            if not self.has_active():
+                self.idle.emit()
+
+    def _finish(self, job: Job):
+        if job._cancel_requested:
+            job.state = CANCELLED
+            job.signals.log_signal.emit(f"[INFO] [{job.newspaper_name}] 已取消下载")
+        elif job.failed:
+            job.state = FAILED
+        else:
+            job.state = DONE
+        self.job_changed.emit(job.id)
+        if job.batch:
+            job.signals.log_signal.emit(
+                f"[INFO] [{job.newspaper_name}] 批量下载完成: 成功 {job.succeeded}，失败 {job.failed}"
+            )
+            job.signals.batch_complete_signal.emit(job.succeeded, job.failed)
+        else:
+            job.signals.complete_signal.emit(job.state == DONE, job.message or STATE_LABELS[job.state])
@@ -0,0 +1,240 @@
+# -*- coding: UTF-8 -*-
+"""
+日志视图 - 大量日志时不卡界面
+
+工作线程的日志先放入缓冲区，定时批量加入模型 (每次刷新只插入一次行)，
+模型最多保留 ui.log_max_lines 行，超出时删除最早的行。列表视图只绘制可见的行；
+按级别、报纸筛选由代理模型完成，不需要重新生成全部文本。
+"""
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QTimer, Signal,
+)
+from PySide6.QtGui import QColor, QFont
+from PySide6.QtWidgets import QComboBox, QHBoxLayout, QLabel, QListView, QPushButton, QVBoxLayout, QWidget
+
+from ..config import config
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+LEVEL_COLORS = {
+    "DEBUG": QColor(128, 128, 128),
+    "WARNING": QColor(190, 120, 0),
+    "ERROR": QColor(200, 0, 0),
+}
+
+# "[级别] [报纸] 内容"，级别和报纸都可以省略
+_LINE_PATTERN = re.compile(r"^(?:\[(DEBUG|INFO|WARNING|ERROR|CRITICAL)\]\s*)?(?:\[([^\]]+)\]\s*)?(.*)$", re.S)
+
+LEVEL_ROLE = Qt.UserRole + 1
+PAPER_ROLE = Qt.UserRole + 2
+
+
+class LogRecord:
+    __slots__ = ("level", "paper", "text")
+
+    def __init__(self, level: str, paper: str, text: str):
+        self.level = level
+        self.paper = paper
+        self.text = text
+
+
+def parse_log_line(line: str, level: Optional[str] = None, timestamp: Optional[str] = None) -> LogRecord:
+    """解析工作线程发出的日志行
+
+    Args:
+        level: 指定级别 (行内没有级别时使用)，默认 INFO
+    """
+    match = _LINE_PATTERN.match(line)
+    line_level, paper, message = match.group(1), match.group(2) or "", match.group(3)
+    if line_level == "CRITICAL":
+        line_level = "ERROR"
+    level = line_level or level or "INFO"
+    timestamp = timestamp or datetime.now().strftime("%H:%M:%S")
+    prefix = f"[{timestamp}] "
+    if line_level or level != "INFO":
+        prefix += f"[{level}] "
+    if paper:
+        prefix += f"[{paper}] "
+    return LogRecord(level, paper, prefix + message)
+
+
+class LogModel(QAbstractListModel):
+    """缓冲写入、限制行数的日志模型
+
+    Args:
+        max_lines: 最多保留的行数
+        flush_ms: 缓冲区刷新间隔，0 表示只在调用 flush() 时刷新
+    """
+
+    paper_added = Signal(str)
+    flushed = Signal()
+
+    def __init__(self, max_lines: Optional[int] = None, flush_ms: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        self.max_lines = max(1, max_lines if max_lines is not None else config.log_view_max_lines)
+        self._records: List[LogRecord] = []
+        self._pending: List[LogRecord] = []
+        self._papers = set()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        flush_ms = config.log_view_flush_ms if flush_ms is None else flush_ms
+        if flush_ms > 0:
+            self._timer.start(flush_ms)
+
+    def append(self, line: str, level: Optional[str] = None):
+        """加入一行日志 (在 GUI 线程中调用，显示要等下一次刷新)"""
+        self._pending.append(parse_log_line(line, level))
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending[-self.max_lines:], []
+
+        excess = len(self._records) + len(pending) - self.max_lines
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            del self._records[:excess]
+            self.endRemoveRows()
+
+        start = len(self._records)
+        self.beginInsertRows(QModelIndex(), start, start + len(pending) - 1)
+        self._records.extend(pending)
+        self.endInsertRows()
+
+        for record in pending:
+            if record.paper and record.paper not in self._papers:
+                self._papers.add(record.paper)
+                self.paper_added.emit(record.paper)
+        self.flushed.emit()
+
+    def clear(self):
+        self.beginResetModel()
+        self._records.clear()
+        self._pending.clear()
+        self.endResetModel()
+
+    def papers(self) -> List[str]:
+        return sorted(self._papers)
+
+    def text(self) -> str:
+        """全部已显示的日志文本"""
+        return "\n".join(record.text for record in self._records)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._records[index.row()]
+        if role == Qt.DisplayRole:
+            return record.text
+        if role == Qt.ForegroundRole:
+            return LEVEL_COLORS.get(record.level)
+        if role == LEVEL_ROLE:
+            return record.level
+        if role == PAPER_ROLE:
+            return record.paper
+        return None
+
+
+class LogFilterProxy(QSortFilterProxyModel):
+    """按最低级别和报纸筛选日志"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._min_level = 0
+        self._paper = ""
+
+    def set_min_level(self, level: str):
+        self._change_filter(_min_level=LEVELS.index(level) if level in LEVELS else 0)
+
+    def set_paper(self, paper: str):
+        """只显示该报纸的日志，空字符串表示全部"""
+        self._change_filter(_paper=paper)
+
+    def _change_filter(self, **values):
+        # Qt 6.10 起 invalidateFilter 已弃用，改为 begin/endFilterChange
+        if hasattr(self, "beginFilterChange"):
+            self.beginFilterChange()
+            for name, value in values.items():
+                setattr(self, name, value)
+            self.endFilterChange()
+        else:
+            for name, value in values.items():
+                setattr(self, name, value)
+            self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        record = self.sourceModel()._records[source_row]
+        if LEVELS.index(record.level) < self._min_level:
+            return False
+        return not self._paper or record.paper == self._paper
+
+
+class LogView(QWidget):
+    """日志面板：级别和报纸筛选、清空，新日志到达时停留在底部则自动滚动"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = LogModel(parent=self)
+        self.proxy = LogFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("级别:"))
+        self.level_combo = QComboBox()
+        self.level_combo.addItem("全部", LEVELS[0])
+        for level in LEVELS[1:]:
+            self.level_combo.addItem(f"{level} 及以上", level)
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(QLabel("报纸:"))
+        self.paper_combo = QComboBox()
+        self.paper_combo.addItem("全部", "")
+        filter_layout.addWidget(self.paper_combo)
+        filter_layout.addStretch()
+        self.clear_btn = QPushButton("清空")
+        filter_layout.addWidget(self.clear_btn)
+        layout.addLayout(filter_layout)
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setEditTriggers(QListView.NoEditTriggers)
+        self.list_view.setSelectionMode(QListView.ExtendedSelection)
+        self.list_view.setFont(QFont("Consolas", 9))
+        layout.addWidget(self.list_view)
+
+        self._follow = True
+        self.model.rowsAboutToBeInserted.connect(self._remember_position)
+        self.model.flushed.connect(self._scroll_if_following)
+        self.model.paper_added.connect(lambda paper: self.paper_combo.addItem(paper, paper))
+        self.level_combo.currentIndexChanged.connect(
+            lambda _: self.proxy.set_min_level(self.level_combo.currentData())
+        )
+        self.paper_combo.currentIndexChanged.connect(
+            lambda _: self.proxy.set_paper(self.paper_combo.currentData())
+        )
+        self.clear_btn.clicked.connect(self.model.clear)
+
+    def append(self, line: str, level: Optional[str] = None):
+        self.model.append(line, level)
+
+    def text(self) -> str:
+        self.model.flush()
+        return self.model.text()
+
+    def _remember_position(self, *args):
+        scroll_bar = self.list_view.verticalScrollBar()
+        self._follow = scroll_bar.value() >= scroll_bar.maximum()
+
+    def _scroll_if_following(self):
+        if self._follow:
+            self.list_view.scrollToBottom()
@@ -5,33 +5,49 @@
 import sys
 import os
 import json
-from datetime import datetime, timedelta
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QComboBox, QDateEdit, QPushButton, QTextEdit, QProgressBar,
-    QFileDialog, QGroupBox, QMessageBox, QSpinBox
+    QFileDialog, QGroupBox, QMessageBox, QSpinBox, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QHeaderView
 )
 from PySide6.QtCore import Qt, QDate, Signal, Slot, QSettings, QTimer
-from PySide6.QtGui import QFont, QIcon, QTextCharFormat, QColor
+from PySide6.QtGui import QIcon, QTextCharFormat, QColor, QPixmap
 
 from ..config import config
-from ..downloaders import check_available_dates
+from ..pipeline import build_thumbnail_cache, get_newspaper_name
+from ..utils import StorageManager, AvailabilityStore
+from .availability import AvailabilityRefresher
 from .controller import DownloadController
+from .log_view import LogView
+from .jobs import STATE_LABELS, QUEUED, RUNNING, PAUSED
+
+JOB_COLUMNS = ["报纸", "日期", "优先级", "状态", "进度", "速度"]
+
+PROFILE_LABELS = {
+    "archive": "存档 (原图)",
+    "screen": "屏幕阅读",
+    "mobile": "移动设备",
+}
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.settings = QSettings("NewspaperDownloader", "Settings")
         self.controller = DownloadController()
+        self.refresher = AvailabilityRefresher(self)
+        self._refresh_found = {}
         self._init_ui()
         self._load_settings()
         self._connect_signals()
+        self._update_preview()
     
     def _init_ui(self):
         self.setWindowTitle(f"{config.app_name} v{config.version}")
-        self.setMinimumSize(700, 600)
-        self.resize(750, 650)
+        self.setMinimumSize(700, 700)
+        self.resize(750, 800)
         
         icon_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'icon.ico')
         if os.path.exists(icon_path):
@@ -68,7 +84,7 @@ class MainWindow(QMainWindow):
         
         self.refresh_date_btn = QPushButton("刷新日期")
         self.refresh_date_btn.setFixedWidth(80)
-        self.refresh_date_btn.clicked.connect(self._on_refresh_dates)
+        self.refresh_date_btn.setToolTip("在后台检查所有报纸的更新日期，再次点击停止")
         
         self.refresh_days_spin = QSpinBox()
         self.refresh_days_spin.setRange(1, 60)
@@ -100,7 +116,27 @@ class MainWindow(QMainWindow):
         output_layout.addWidget(self.browse_btn)
         config_layout.addLayout(output_layout)
         
-        layout.addWidget(config_group)
+        profile_layout = QHBoxLayout()
+        profile_label = QLabel("图片质量:")
+        profile_label.setFixedWidth(80)
+        self.profile_combo = QComboBox()
+        for name in config.image_profile_names:
+            self.profile_combo.addItem(PROFILE_LABELS.get(name, name), name)
+        self.profile_combo.setToolTip("光明日报等图片版报纸的输出质量，非存档质量另存为带后缀的文件")
+        profile_layout.addWidget(profile_label)
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addStretch()
+        config_layout.addLayout(profile_layout)
+        
+        self.preview_label = QLabel("无预览")
+        self.preview_label.setFixedSize(150, 210)
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setStyleSheet("QLabel { border: 1px solid #ccc; color: #888; }")
+        
+        settings_layout = QHBoxLayout()
+        settings_layout.addWidget(config_group, 1)
+        settings_layout.addWidget(self.preview_label)
+        layout.addLayout(settings_layout)
         
         batch_group = QGroupBox("批量下载")
         batch_layout = QHBoxLayout(batch_group)
@@ -133,7 +169,7 @@ class MainWindow(QMainWindow):
         
         self.progress_bar = QProgressBar()
         self.progress_bar.setTextVisible(True)
-        self.progress_bar.setFormat("%p% - %v / %m KB")
+        self.progress_bar.setFormat("%p% - %v/%m 期")
         progress_layout.addWidget(self.progress_bar)
         
         self.status_label = QLabel("就绪")
@@ -141,13 +177,44 @@ class MainWindow(QMainWindow):
         
         layout.addWidget(progress_group)
         
+        jobs_group = QGroupBox("任务列表")
+        jobs_layout = QVBoxLayout(jobs_group)
+        
+        self.job_table = QTableWidget(0, len(JOB_COLUMNS))
+        self.job_table.setHorizontalHeaderLabels(JOB_COLUMNS)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.job_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.job_table.horizontalHeader().setStretchLastSection(True)
+        self.job_table.setMinimumHeight(120)
+        jobs_layout.addWidget(self.job_table)
+        
+        job_btn_layout = QHBoxLayout()
+        self.pause_job_btn = QPushButton("暂停/继续")
+        self.cancel_job_btn = QPushButton("取消任务")
+        self.priority_job_btn = QPushButton("优先下载")
+        self.priority_job_btn.setToolTip("把选中的任务移到队列最前")
+        self.clear_jobs_btn = QPushButton("清除已结束")
+        job_btn_layout.addWidget(self.pause_job_btn)
+        job_btn_layout.addWidget(self.cancel_job_btn)
+        job_btn_layout.addWidget(self.priority_job_btn)
+        job_btn_layout.addStretch()
+        job_btn_layout.addWidget(self.clear_jobs_btn)
+        jobs_layout.addLayout(job_btn_layout)
+        
+        layout.addWidget(jobs_group)
+        
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(1000)
+        self.job_timer.timeout.connect(self._refresh_jobs)
+        
         log_group = QGroupBox("日志")
         log_layout = QVBoxLayout(log_group)
         
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setFont(QFont("Consolas", 9))
-        log_layout.addWidget(self.log_text)
+        self.log_view = LogView()
+        log_layout.addWidget(self.log_view)
         
         layout.addWidget(log_group)
         
@@ -158,8 +225,8 @@ class MainWindow(QMainWindow):
         self.download_btn.setFixedWidth(100)
         self.download_btn.setMinimumHeight(35)
         
-        self.cancel_btn = QPushButton("取消")
-        self.cancel_btn.setFixedWidth(70)
+        self.cancel_btn = QPushButton("全部取消")
+        self.cancel_btn.setFixedWidth(80)
         self.cancel_btn.setEnabled(False)
         self.cancel_btn.setMinimumHeight(35)
         
@@ -187,6 +254,12 @@ class MainWindow(QMainWindow):
         if newspaper_index < self.newspaper_combo.count():
             self.newspaper_combo.setCurrentIndex(newspaper_index)
         
+        profile_index = self.profile_combo.findData(
+            self.settings.value("image_profile", config.image_profile)
+        )
+        if profile_index >= 0:
+            self.profile_combo.setCurrentIndex(profile_index)
+        
         window_geometry = self.settings.value("geometry")
         if window_geometry:
             self.restoreGeometry(window_geometry)
@@ -194,6 +267,7 @@ class MainWindow(QMainWindow):
     def _save_settings(self):
         self.settings.setValue("output_dir", self.output_edit.toPlainText())
         self.settings.setValue("newspaper_index", self.newspaper_combo.currentIndex())
+        self.settings.setValue("image_profile", self.profile_combo.currentData())
         self.settings.setValue("geometry", self.saveGeometry())
     
     def _connect_signals(self):
@@ -203,63 +277,116 @@ class MainWindow(QMainWindow):
         self.browse_btn.clicked.connect(self._on_browse)
         self.newspaper_combo.currentIndexChanged.connect(self._on_newspaper_changed)
         self.date_edit.dateChanged.connect(self._on_date_changed)
+        self.profile_combo.currentIndexChanged.connect(lambda _: self._update_preview())
         self.refresh_date_btn.clicked.connect(self._on_refresh_dates)
+        self.pause_job_btn.clicked.connect(self._on_pause_job)
+        self.cancel_job_btn.clicked.connect(self._on_cancel_job)
+        self.priority_job_btn.clicked.connect(self._on_prioritize_job)
+        self.clear_jobs_btn.clicked.connect(self._on_clear_jobs)
+        self.controller.jobs.job_added.connect(self._on_job_added)
+        self.controller.jobs.job_changed.connect(self._update_job_row)
+        self.controller.jobs.idle.connect(self._refresh_jobs)
+        self.refresher.date_found.connect(self._on_date_found)
+        self.refresher.platform_finished.connect(self._on_platform_refreshed)
+        self.refresher.finished.connect(self._on_refresh_finished)
     
     def _on_newspaper_changed(self, index):
         self._load_cached_dates()
+        self._update_preview()
     
     def _on_date_changed(self, date):
-        pass
+        self._update_preview()
+    
+    def _update_preview(self):
+        """显示已下载报纸的头版预览 (只读取缩略图缓存，不打开 PDF)"""
+        platform_id = self.newspaper_combo.currentData()
+        output_dir = self.output_edit.toPlainText().strip()
+        if not platform_id or not output_dir:
+            self.preview_label.setText("无预览")
+            return
+        
+        storage = StorageManager(output_dir)
+        cache = build_thumbnail_cache(storage)
+        name = get_newspaper_name(platform_id)
+        date = self.date_edit.date().toString("yyyy-MM-dd")
+        suffixes = [""]
+        profile = self.profile_combo.currentData()
+        if profile and profile != "archive":
+            suffixes.insert(0, f"_{profile}")
+        
+        for suffix in suffixes:
+            thumbnails = cache.get(storage.edition_path(name, date, suffix))
+            if thumbnails and thumbnails.preview:
+                pixmap = QPixmap(thumbnails.preview)
+                self.preview_label.setPixmap(pixmap.scaled(
+                    self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+                ))
+                return
+        self.preview_label.setText("无预览")
     
     def _load_cached_dates(self):
         platform_id = self.newspaper_combo.currentData()
         if not platform_id:
             return
         
-        cached_dates = config.get_cached_dates(platform_id)
+        today = QDate.currentDate()
+        cached_dates = AvailabilityStore.for_config(config).published(
+            platform_id,
+            today.addDays(1 - self.refresh_days_spin.maximum()).toString("yyyy-MM-dd"),
+            today.toString("yyyy-MM-dd")
+        )
+        found = self._refresh_found.get(platform_id, set()) if self.refresher.is_running() else set()
+        if cached_dates or found:
+            self._update_date_calendar(sorted(set(cached_dates) | found, reverse=True))
         if cached_dates:
-            self._update_date_calendar(cached_dates)
-            self._log(f"已加载缓存: {len(cached_dates)} 个更新日期")
+            self._log(f"已加载记录: {len(cached_dates)} 个更新日期")
     
     def _on_refresh_dates(self):
-        platform_id = self.newspaper_combo.currentData()
-        if not platform_id:
+        if self.refresher.is_running():
+            self.refresher.cancel()
+            self.refresh_date_btn.setEnabled(False)
+            self.refresh_date_btn.setText("停止中...")
             return
         
-        self.refresh_date_btn.setEnabled(False)
-        self.refresh_date_btn.setText("刷新中...")
-        self._log("正在刷新更新日期...")
-        
-        QTimer.singleShot(100, lambda: self._do_refresh_dates(platform_id))
-    
-    def _do_refresh_dates(self, platform_id: str):
-        try:
-            days = self.refresh_days_spin.value()
-            available_dates = check_available_dates(platform_id, config, days=days)
-            config.set_cached_dates(platform_id, available_dates)
-            self._update_date_calendar(available_dates)
-            
-            if available_dates:
-                self._log(f"检测到 {len(available_dates)} 个更新日期 (近{days}天)")
-            else:
-                self._log(f"未检测到更新日期 (近{days}天)")
-        except Exception as e:
-            self._log(f"刷新失败: {e}")
-        finally:
-            self.refresh_date_btn.setEnabled(True)
-            self.refresh_date_btn.setText("刷新日期")
-    
-    def _check_available_dates(self):
-        platform_id = self.newspaper_combo.currentData()
-        if not platform_id:
+        platform_ids = list(config.get_enabled_newspapers())
+        days = self.refresh_days_spin.value()
+        self._refresh_found = {platform_id: set() for platform_id in platform_ids}
+        if self.refresher.start(platform_ids, days):
+            self.refresh_date_btn.setText("停止刷新")
+            self._log(f"正在后台刷新 {len(platform_ids)} 份报纸的更新日期 (近{days}天)...")
+    
+    @Slot(str, str)
+    def _on_date_found(self, platform_id: str, date: str):
+        self._refresh_found.setdefault(platform_id, set()).add(date)
+        if platform_id == self.newspaper_combo.currentData():
+            self._mark_available_date(date)
+    
+    @Slot(str, list, bool)
+    def _on_platform_refreshed(self, platform_id: str, dates: list, complete: bool):
+        if not complete:
             return
-        
-        try:
-            available_dates = check_available_dates(platform_id, config, days=7)
-            config.set_cached_dates(platform_id, available_dates)
-            self._update_date_calendar(available_dates)
-        except Exception:
-            pass
+        name = get_newspaper_name(platform_id)
+        days = self.refresh_days_spin.value()
+        if dates:
+            self._log(f"{name}: 检测到 {len(dates)} 个更新日期 (近{days}天)")
+        else:
+            self._log(f"{name}: 未检测到更新日期 (近{days}天)")
+        if platform_id == self.newspaper_combo.currentData():
+            self._update_date_calendar(dates)
+    
+    @Slot(bool)
+    def _on_refresh_finished(self, cancelled: bool):
+        self.refresh_date_btn.setEnabled(True)
+        self.refresh_date_btn.setText("刷新日期")
+        self._log("已停止刷新更新日期" if cancelled else "更新日期刷新完成")
+    
+    def _mark_available_date(self, date_str: str):
+        calendar = self.date_edit.calendarWidget()
+        date = QDate.fromString(date_str, "yyyy-MM-dd")
+        if calendar and date.isValid():
+            red_format = QTextCharFormat()
+            red_format.setBackground(QColor(255, 200, 200))
+            calendar.setDateTextFormat(date, red_format)
     
     def _update_date_calendar(self, available_dates: list):
         calendar = self.date_edit.calendarWidget()
@@ -288,6 +415,10 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         self._save_settings()
+        self.refresher.cancel()
+        if self.controller.is_downloading():
+            self.controller.cancel()
+            self.controller.jobs.wait(10000)
         event.accept()
     
     def _on_browse(self):
@@ -301,22 +432,6 @@ class MainWindow(QMainWindow):
         if output_dir and os.path.exists(output_dir):
             os.startfile(output_dir)
     
-    def _set_downloading_state(self, downloading: bool):
-        self.download_btn.setEnabled(not downloading)
-        self.cancel_btn.setEnabled(downloading)
-        self.newspaper_combo.setEnabled(not downloading)
-        self.date_edit.setEnabled(not downloading)
-        self.browse_btn.setEnabled(not downloading)
-        self.btn_latest.setEnabled(not downloading)
-        self.btn_week.setEnabled(not downloading)
-        self.btn_month.setEnabled(not downloading)
-        self.btn_half_year.setEnabled(not downloading)
-        
-        if downloading:
-            self.download_btn.setText("下载中...")
-        else:
-            self.download_btn.setText("开始下载")
-    
     def _on_download(self):
         platform_id = self.newspaper_combo.currentData()
         date = self.date_edit.date().toString("yyyy-MM-dd")
@@ -326,17 +441,13 @@ class MainWindow(QMainWindow):
             return
         
         self._save_settings()
-        self._set_downloading_state(True)
-        self.log_text.clear()
-        self.progress_bar.setValue(0)
-        
         self.controller.start_download(
             platform_id=platform_id,
             date=date,
             output_dir=output_dir,
-            on_progress=self._on_progress,
             on_log=self._on_log,
-            on_complete=self._on_complete
+            on_complete=self._on_complete,
+            image_profile=self.profile_combo.currentData()
         )
     
     def _on_batch_download(self, days: int):
@@ -347,39 +458,117 @@ class MainWindow(QMainWindow):
             return
         
         self._save_settings()
-        self._set_downloading_state(True)
-        self.log_text.clear()
-        self.progress_bar.setValue(0)
-        
         dates = self.controller.get_dates_for_range(platform_id, days)
-        
         self.controller.start_batch_download(
             platform_id=platform_id,
             dates=dates,
             output_dir=output_dir,
-            on_progress=self._on_progress,
             on_log=self._on_log,
             on_complete=self._on_batch_complete,
-            on_date_progress=self._on_date_progress
+            image_profile=self.profile_combo.currentData()
         )
     
     def _on_cancel(self):
         self.controller.cancel()
-        self._log("正在取消...")
-    
-    @Slot(str, int, int)
-    def _on_progress(self, filename: str, current: int, total: int):
-        if total > 0:
-            self.progress_bar.setMaximum(total // 1024)
-            self.progress_bar.setValue(current // 1024)
-            self.status_label.setText(f"下载中: {filename}")
-    
-    @Slot(int, int, str)
-    def _on_date_progress(self, current: int, total: int, date: str):
-        self.progress_bar.setMaximum(total)
-        self.progress_bar.setValue(current)
-        self.progress_bar.setFormat(f"%p% - %v/%m 期")
-        self.status_label.setText(f"正在下载 {date} ({current}/{total})")
+        self._log("正在取消全部任务...")
+    
+    def _selected_job_id(self):
+        rows = self.job_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.job_table.item(rows[0].row(), 0).data(Qt.UserRole)
+    
+    def _on_pause_job(self):
+        job = self.controller.jobs.job(self._selected_job_id() or 0)
+        if not job:
+            return
+        if job.state in (QUEUED, RUNNING):
+            self.controller.jobs.pause(job.id)
+        elif job.state == PAUSED:
+            self.controller.jobs.resume(job.id)
+    
+    def _on_cancel_job(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self.controller.cancel(job_id)
+    
+    def _on_prioritize_job(self):
+        job_id = self._selected_job_id()
+        if job_id is None:
+            return
+        # 只调整排队顺序，不改变任务的流量类别
+        top = max(job.priority for job in self.controller.jobs.jobs())
+        self.controller.jobs.set_priority(job_id, top + 1)
+    
+    def _on_clear_jobs(self):
+        removed = set(self.controller.jobs.remove_finished())
+        for row in reversed(range(self.job_table.rowCount())):
+            if self.job_table.item(row, 0).data(Qt.UserRole) in removed:
+                self.job_table.removeRow(row)
+    
+    @Slot(int)
+    def _on_job_added(self, job_id: int):
+        row = self.job_table.rowCount()
+        self.job_table.insertRow(row)
+        for column in range(len(JOB_COLUMNS)):
+            self.job_table.setItem(row, column, QTableWidgetItem())
+        self.job_table.item(row, 0).setData(Qt.UserRole, job_id)
+        self._update_job_row(job_id)
+        if not self.job_timer.isActive():
+            self.job_timer.start()
+        self._refresh_jobs()
+    
+    def _job_row(self, job_id: int) -> int:
+        for row in range(self.job_table.rowCount()):
+            if self.job_table.item(row, 0).data(Qt.UserRole) == job_id:
+                return row
+        return -1
+    
+    @Slot(int)
+    def _update_job_row(self, job_id: int):
+        job = self.controller.jobs.job(job_id)
+        row = self._job_row(job_id)
+        if job is None or row < 0:
+            return
+        
+        state = STATE_LABELS[job.state]
+        if job.state == RUNNING and job.current_date:
+            state = f"{state} {job.current_date}"
+        progress = f"{job.succeeded + job.failed}/{job.total}"
+        if job.failed:
+            progress += f" (失败 {job.failed})"
+        speed = ""
+        if job.elapsed > 0:
+            speed = (f"{job.editions_per_minute:.1f} 期/分 · "
+                     f"{StorageManager.format_size(int(job.bytes_per_second))}/s")
+        
+        values = [job.newspaper_name, job.title, str(job.priority), state, progress, speed]
+        for column, value in enumerate(values):
+            item = self.job_table.item(row, column)
+            if item.text() != value:
+                item.setText(value)
+    
+    def _refresh_jobs(self):
+        """每秒刷新运行中任务的速度和总进度"""
+        jobs = self.controller.jobs.jobs()
+        for job in jobs:
+            if job.state == RUNNING:
+                self._update_job_row(job.id)
+        
+        active = [job for job in jobs if job.state in (QUEUED, RUNNING, PAUSED)]
+        running = sum(job.state == RUNNING for job in active)
+        queued = sum(job.state == QUEUED for job in active)
+        self.cancel_btn.setEnabled(any(job.state != PAUSED for job in active))
+        if not active:
+            self.job_timer.stop()
+            return
+        
+        total = sum(job.total for job in active)
+        done = sum(job.succeeded + job.failed for job in active)
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        rate = sum(job.editions_per_minute for job in active if job.state == RUNNING)
+        self.status_label.setText(f"运行 {running} 个任务，排队 {queued} 个，合计 {rate:.1f} 期/分钟")
     
     @Slot(str)
     def _on_log(self, message: str):
@@ -387,20 +576,18 @@ class MainWindow(QMainWindow):
     
     @Slot(bool, str)
     def _on_complete(self, success: bool, message: str):
-        self._set_downloading_state(False)
-        
         if success:
             self.status_label.setText("下载完成!")
             self._log(f"完成: {message}")
+            self._update_preview()
         else:
             self.status_label.setText("下载失败")
-            self._log(f"失败: {message}")
+            self._log(f"失败: {message}", "ERROR")
     
     @Slot(int, int)
     def _on_batch_complete(self, success_count: int, fail_count: int):
-        self._set_downloading_state(False)
         self.status_label.setText(f"批量下载完成: 成功 {success_count}，失败 {fail_count}")
+        self._update_preview()
     
-    def _log(self, message: str):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+    def _log(self, message: str, level: str = None):
+        self.log_view.append(message, level)
@@ -0,0 +1,501 @@
+# -*- coding: UTF-8 -*-
+"""
+单期报纸下载流程
+
+获取版面信息 → 下载各版面 → 合并 → 清理，GUI 工作线程和命令行共用。
+版面数据先保存在内存中，超过 merge.memory_limit_mb 后才写入临时目录。
+execution.mode 为 process 时页面解析和合并在共享进程池中进行，网络请求仍在
+下载线程中。
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from .config import config
+from .downloaders.tuning import TUNING_FILENAME, host_tuning
+from .utils import (
+    StorageManager, merge_pdfs_sorted, merge_images_to_pdf,
+    OptimizeResult, ImageProfile, linearize_pdf, VolumeBuilder, SearchIndex,
+    ThumbnailCache, ArchiveManifest,
+)
+from .utils.metrics import metrics
+from .utils.page_store import PageStore
+from .utils.profiling import tracer
+from .utils.pdf_tools import source_size
+from .utils.process_pool import run_in_process
+
+
+METRICS_DIRNAME = ".metrics"
+PROFILE_DIRNAME = ".profiles"
+
+# 版面数据开头的特征字节：PDF 允许文件头前有少量其他数据
+PDF_MAGIC = b"%PDF-"
+IMAGE_MAGICS = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"BM", b"RIFF")
+
+_edition_locks: Dict[str, threading.Lock] = {}
+_edition_locks_guard = threading.Lock()
+
+
+def get_newspaper_name(platform_id: str) -> str:
+    newspaper_info = config.get_newspaper(platform_id)
+    return newspaper_info.get("name", platform_id) if newspaper_info else platform_id
+
+
+def get_dates_for_range(platform_id: str, days: int) -> List[str]:
+    """最近 days 天中报纸出版的日期 (按配置的 update_days 星期几过滤)，从今天往前"""
+    paper = config.get_newspaper(platform_id) or {}
+    update_days = paper.get("update_days", list(range(7)))
+    today = datetime.now()
+    dates = []
+    for i in range(days):
+        check_date = today - timedelta(days=i)
+        if check_date.weekday() in update_days:
+            dates.append(check_date.strftime('%Y-%m-%d'))
+    return dates
+
+
+def edition_lock(output_path: str) -> threading.Lock:
+    """同一输出文件共用的锁"""
+    key = os.path.abspath(output_path)
+    with _edition_locks_guard:
+        return _edition_locks.setdefault(key, threading.Lock())
+
+
+def looks_like_page(head: bytes, is_jpg: bool) -> bool:
+    """粗略校验版面数据类型，排除以 200 状态返回的错误页面等"""
+    if is_jpg:
+        return head.startswith(IMAGE_MAGICS)
+    return PDF_MAGIC in head
+
+
+def start_profiling():
+    """按配置开启剖析模式 (profiling.enabled)"""
+    if config.profiling_enabled and not tracer.enabled:
+        tracer.start(cprofile=config.profiling_cprofile, tracemalloc_enabled=config.profiling_tracemalloc)
+
+
+def finish_profiling(storage: StorageManager, log: Optional[Callable[[str, str], None]] = None):
+    """结束剖析并写出 trace 文件 (未开启时不做任何事)"""
+    if not tracer.enabled:
+        return
+    output_dir = config.profiling_output_dir or os.path.join(storage.base_path, PROFILE_DIRNAME)
+    filename = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    try:
+        paths = tracer.stop(os.path.join(output_dir, filename))
+        if log:
+            log("INFO", f"性能剖析已保存: {', '.join(paths)}")
+    except OSError as e:
+        if log:
+            log("WARNING", f"性能剖析保存失败: {e}")
+
+
+def build_image_profile(profile_name: Optional[str], platform_id: str) -> ImageProfile:
+    return ImageProfile(**config.get_image_profile(profile_name, platform_id))
+
+
+def output_suffix(profile: ImageProfile, is_jpg: bool) -> str:
+    """非存档质量的图片版报纸另存为带配置名后缀的文件，不覆盖存档版"""
+    if is_jpg and not profile.is_passthrough:
+        return f"_{profile.name}"
+    return ""
+
+
+def build_thumbnail_cache(storage: StorageManager) -> ThumbnailCache:
+    return ThumbnailCache.for_storage(
+        storage,
+        max_bytes=config.thumbnail_cache_mb * 1024 * 1024,
+        size=config.thumbnail_size,
+        preview_size=config.thumbnail_preview_size
+    )
+
+
+def export_run_metrics(storage: StorageManager, since: Optional[dict] = None, **extra):
+    """运行结束时导出 Prometheus textfile 和本次运行的 JSON 汇总
+
+    Args:
+        since: 运行开始时 metrics.checkpoint() 的返回值
+        extra: 写入 JSON 汇总的附加信息 (如成功/失败期数)
+    """
+    if not config.metrics_enabled:
+        return
+    metrics_dir = os.path.join(storage.base_path, METRICS_DIRNAME)
+    try:
+        metrics.write_textfile(config.metrics_textfile or os.path.join(metrics_dir, "newspaper_downloader.prom"))
+        metrics.write_summary(
+            config.metrics_summary or os.path.join(metrics_dir, "last_run.json"),
+            since,
+            **extra
+        )
+    except OSError:
+        pass
+
+
+def merge_edition(
+    pages: List[tuple],
+    output_path: str,
+    is_jpg: bool,
+    profile: Optional[ImageProfile] = None
+) -> OptimizeResult:
+    """按配置合并一期报纸的版面
+
+    execution.mode 为 process 时整个合并在共享进程池中进行 (合并本身就是
+    并行的单位，图片转换不再另开进程)，调用线程只等待结果。
+
+    Args:
+        pages: [(页码, 文件路径或内存数据), ...]
+
+    Returns:
+        OptimizeResult 版面数据总大小与合并后文件大小
+    """
+    in_process = config.execution_mode == "process"
+    args = (
+        pages, output_path, is_jpg, profile,
+        1 if in_process else config.image_workers,
+        config.max_image_side,
+        config.streaming_merge,
+        config.optimize_output,
+        config.linearize_output,
+    )
+    if in_process:
+        return run_in_process(_merge_pages, *args, workers=config.execution_workers)
+    return _merge_pages(*args)
+
+
+def _merge_pages(
+    pages: List[tuple],
+    output_path: str,
+    is_jpg: bool,
+    profile: Optional[ImageProfile],
+    image_workers: int,
+    max_side: int,
+    streaming: bool,
+    optimize: bool,
+    linearize: bool
+) -> OptimizeResult:
+    """合并版面 (模块级函数，参数都可以 pickle，可在子进程中执行)"""
+    bytes_before = sum(source_size(source) for _, source in pages)
+
+    if is_jpg:
+        merge_images_to_pdf(
+            pages,
+            output_path,
+            workers=image_workers,
+            max_side=max_side,
+            profile=profile
+        )
+    else:
+        merge_pdfs_sorted(
+            pages,
+            output_path,
+            streaming=streaming,
+            optimize=optimize
+        )
+
+    linearized = linearize and linearize_pdf(output_path)
+    return OptimizeResult(
+        bytes_before=bytes_before,
+        bytes_after=os.path.getsize(output_path),
+        linearized=linearized
+    )
+
+
+def format_optimize_result(result: OptimizeResult) -> str:
+    percent = result.bytes_saved * 100 / result.bytes_before if result.bytes_before else 0
+    message = (
+        f"版面合计 {StorageManager.format_size(result.bytes_before)}，"
+        f"输出 {StorageManager.format_size(result.bytes_after)}，"
+        f"节省 {StorageManager.format_size(max(result.bytes_saved, 0))} ({percent:.1f}%)"
+    )
+    if result.linearized:
+        message += "，已线性化"
+    return message
+
+
+class EditionPipeline:
+    """下载并合并一期报纸
+
+    Args:
+        platform_id: 报纸平台ID
+        storage: 存储管理器
+        profile: 图片版报纸的输出质量配置
+        log: 日志回调 log(level, message)
+        is_cancelled: 返回 True 时中止下载
+        verbose: 是否输出逐版的开始/失败日志 (单期下载时使用)
+        shared_archive: 存档目录由多台机器同时写入 (多机补全)。全文索引和合订本
+            只能由一个进程更新，此时不自动更新，由协调端在补全结束后统一更新
+    """
+
+    def __init__(
+        self,
+        platform_id: str,
+        storage: StorageManager,
+        profile: Optional[ImageProfile] = None,
+        log: Optional[Callable[[str, str], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        verbose: bool = True,
+        shared_archive: bool = False
+    ):
+        self.platform_id = platform_id
+        self.storage = storage
+        self.profile = profile or build_image_profile(None, platform_id)
+        self.newspaper_name = get_newspaper_name(platform_id)
+        self._log_callback = log
+        self._is_cancelled = is_cancelled or (lambda: False)
+        self.verbose = verbose
+        self.shared_archive = shared_archive
+
+    def run(self, downloader, date: Optional[str]) -> tuple:
+        """
+        Returns:
+            (是否成功, 输出文件路径或错误信息)
+        """
+        with tracer.span("edition", platform=self.platform_id, date=date or ""), \
+                tracer.sample(f"{self.platform_id} {date or 'latest'}"):
+            return self._run(downloader, date)
+
+    def _run(self, downloader, date: Optional[str]) -> tuple:
+        manifest = ArchiveManifest.for_storage(self.storage)
+        if date:
+            existing = self._find_in_manifest(manifest, date)
+            if existing:
+                self._log("INFO", f"文件已存在，跳过: {existing}")
+                metrics.inc("newspaper_editions_total", platform=self.platform_id, result="skipped")
+                return True, existing
+
+        if self.verbose:
+            self._log("INFO", f"开始获取 {self.newspaper_name} 的报纸信息...")
+
+        with tracer.span("discovery", platform=self.platform_id):
+            edition = downloader.fetch_edition(date)
+        if not edition or not edition.page_urls:
+            metrics.inc("newspaper_editions_total", platform=self.platform_id, result="not_found")
+            if self.verbose:
+                self._log("ERROR", "未找到报纸信息")
+            else:
+                self._log("WARNING", f"未找到 {date} 的报纸")
+            return False, "未找到报纸信息"
+
+        if self.verbose:
+            self._log("INFO", f"找到 {len(edition.page_urls)} 个版面")
+
+        if self._is_cancelled():
+            return False, "已取消"
+
+        first_url = edition.page_urls[0]
+        is_jpg = first_url.lower().endswith(('.jpg', '.jpeg'))
+
+        suffix = output_suffix(self.profile, is_jpg)
+        output_path = self.storage.edition_path(self.newspaper_name, edition.date, suffix)
+
+        # 多个任务同时下载同一期时依次进行，后面的任务在清单中找到记录后跳过
+        with edition_lock(output_path):
+            if self._already_downloaded(manifest, edition.date, suffix, is_jpg, output_path):
+                self._log("INFO", f"文件已存在，跳过: {output_path}")
+                metrics.inc("newspaper_editions_total", platform=self.platform_id, result="skipped")
+                return True, output_path
+            return self._fetch_edition(downloader, edition, is_jpg, output_path)
+
+    def _fetch_edition(self, downloader, edition, is_jpg: bool, output_path: str) -> tuple:
+        store = PageStore(
+            config.memory_limit_mb * 1024 * 1024,
+            lambda: self._spill_dir(edition.date)
+        )
+        try:
+            result = self._download_and_merge(downloader, edition, store, is_jpg, output_path)
+        finally:
+            with tracer.span("cleanup"):
+                store.cleanup()
+        metrics.inc(
+            "newspaper_editions_total",
+            platform=self.platform_id,
+            result="success" if result[0] else "failed"
+        )
+        return result
+
+    def _download_and_merge(self, downloader, edition, store: PageStore, is_jpg: bool, output_path: str) -> tuple:
+        ext = "jpg" if is_jpg else "pdf"
+        total = len(edition.page_urls)
+        pages = [store.new_page(i, ext) for i in range(1, total + 1)]
+        jobs = list(zip(pages, edition.page_urls))
+
+        # 按平台配置的并发数同时下载多个版面，同一站点的实际并发由 HostController 控制
+        profile = downloader.profile
+        host_tuning.attach(os.path.join(self.storage.base_path, TUNING_FILENAME))
+        workers = min(profile.workers, total)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{self.platform_id}-page") as pool:
+                results = list(pool.map(lambda job: self._fetch_page(downloader, *job, total, is_jpg), jobs))
+        else:
+            results = [self._fetch_page(downloader, page, url, total, is_jpg) for page, url in jobs]
+        if profile.auto_tune:
+            try:
+                host_tuning.save()
+            except OSError as e:
+                self._log("WARNING", f"并发调整结果保存失败: {e}")
+
+        for page, ok in zip(pages, results):
+            if not ok:
+                store.remove(page)
+
+        if self._is_cancelled():
+            return False, "已取消"
+
+        pages = store.pages()
+        if not pages:
+            file_type = "JPG" if is_jpg else "PDF"
+            self._log("ERROR" if self.verbose else "WARNING", f"没有下载到任何{file_type}文件")
+            return False, f"没有下载到任何{file_type}文件"
+
+        self._log("INFO", f"正在合并 {len(pages)} 个版面...")
+
+        try:
+            labels = {"platform": self.platform_id, "kind": "image" if is_jpg else "pdf"}
+            self.storage.ensure_output_dir(self.newspaper_name, edition.date)
+            with metrics.timer("newspaper_merge_seconds", **labels), tracer.span("merge", **labels):
+                result = merge_edition(pages, output_path, is_jpg, self.profile)
+            metrics.inc("newspaper_merge_input_bytes_total", result.bytes_before, **labels)
+            metrics.inc("newspaper_merge_output_bytes_total", result.bytes_after, **labels)
+            self._log("INFO", f"合并完成: {output_path}")
+            self._log("INFO", f"输出优化: {format_optimize_result(result)}")
+        except Exception as e:
+            self._log("ERROR", f"合并失败: {e}")
+            return False, f"合并失败: {e}"
+
+        try:
+            ArchiveManifest.for_storage(self.storage).record(
+                self.newspaper_name, edition.date, output_path, output_suffix(self.profile, is_jpg),
+                kind="image" if is_jpg else "pdf", page_count=len(pages)
+            )
+        except Exception as e:
+            self._log("WARNING", f"存档清单更新失败: {e}")
+
+        if self.verbose:
+            size_str = self.storage.format_size(self.storage.get_file_size(output_path))
+            self._log("INFO", f"下载完成! 文件大小: {size_str}")
+
+        if config.thumbnails_enabled:
+            with tracer.span("thumbnails"):
+                self._make_thumbnails(output_path, pages, is_jpg)
+
+        if not output_suffix(self.profile, is_jpg) and not self.shared_archive:
+            if config.search_auto_index and not is_jpg:
+                with tracer.span("index"):
+                    self._index_edition(edition.date, output_path)
+            if config.volume_auto_update:
+                with tracer.span("volume"):
+                    self._update_volume(edition.date)
+
+        return True, output_path
+
+    def _find_in_manifest(self, manifest: ArchiveManifest, date: str) -> Optional[str]:
+        """获取报纸信息之前查清单：已下载过与当前输出质量对应的版本时返回其路径
+
+        类型未知 (扫描得到) 的存档版只在输出质量为存档时才能确定，否则交给获取信息后的检查。
+        """
+        for entry in manifest.variants(self.newspaper_name, date):
+            if entry.kind is None:
+                if not entry.suffix and self.profile.is_passthrough:
+                    return entry.path
+            elif entry.suffix == output_suffix(self.profile, entry.kind == "image"):
+                return entry.path
+        return None
+
+    def _already_downloaded(self, manifest: ArchiveManifest, date: str, suffix: str, is_jpg: bool,
+                            output_path: str) -> bool:
+        """清单中有记录，或文件存在但尚未记入清单 (此时补记)"""
+        kind = "image" if is_jpg else "pdf"
+        entry = manifest.get(self.newspaper_name, date, suffix)
+        if entry is not None:
+            if entry.kind is None:
+                manifest.set_kind(self.newspaper_name, date, suffix, kind)
+            return True
+        if not os.path.exists(output_path):
+            return False
+        try:
+            manifest.record(self.newspaper_name, date, output_path, suffix, kind)
+        except Exception as e:
+            self._log("WARNING", f"存档清单更新失败: {e}")
+        return True
+
+    def _fetch_page(self, downloader, page, page_url: str, total: int, is_jpg: bool) -> bool:
+        """下载并校验一个版面
+
+        Returns:
+            是否为有效版面 (取消、失败或无效时为 False)
+        """
+        i = page.page_num
+        if self._is_cancelled():
+            return False
+
+        if self.verbose:
+            self._log("INFO", f"下载第 {i}/{total} 版...")
+
+        with tracer.span("fetch", page=i):
+            downloaded = downloader.download_to(page_url, page, f"page_{i:02d}.{page.ext}")
+        if not downloaded:
+            if self.verbose:
+                self._log("WARNING", f"第 {i} 版下载失败")
+            return False
+
+        with tracer.span("verify", page=i):
+            valid = looks_like_page(page.head(), is_jpg)
+        if valid:
+            self._log("INFO", f"第 {i} 版下载成功")
+        else:
+            self._log("WARNING", f"第 {i} 版数据无效，已跳过")
+        return valid
+
+    def _make_thumbnails(self, output_path: str, pages: List[tuple], is_jpg: bool):
+        """生成逐版缩略图和头版预览；图片版直接使用内存中的版面"""
+        try:
+            cache = build_thumbnail_cache(self.storage)
+            if is_jpg:
+                cache.generate_from_pages(output_path, pages)
+            else:
+                cache.generate(output_path)
+        except Exception as e:
+            self._log("WARNING", f"缩略图生成失败: {e}")
+
+    def _index_edition(self, date: str, output_path: str):
+        """把刚下载的一期加入全文检索索引 (图片版报纸没有文字层，不索引)"""
+        try:
+            index = SearchIndex.for_storage(self.storage)
+            try:
+                pages = index.add_edition(self.newspaper_name, date, output_path)
+            finally:
+                index.close()
+            if pages:
+                self._log("INFO", f"已加入全文索引: {pages} 个版面")
+        except Exception as e:
+            self._log("WARNING", f"全文索引失败: {e}")
+
+    def _update_volume(self, date: str):
+        """把刚下载的一期追加到所属的合订本，失败不影响本期下载结果"""
+        try:
+            builder = VolumeBuilder(self.storage, self.newspaper_name, config.volume_period)
+            result = builder.update(builder.period_key(date))
+            if result.added:
+                self._log("INFO", f"合订本已更新: {result.path} (共 {result.page_count} 版)")
+        except Exception as e:
+            self._log("WARNING", f"合订本更新失败: {e}")
+
+    def _spill_dir(self, date: str) -> str:
+        """版面超过内存上限时的临时目录，优先使用配置的 scratch_dir
+
+        每次运行单独建目录：同一期可能同时由多个任务处理 (不同输出配置、
+        租约过期后重新领取的集群节点)，清理时不能删掉别人的版面。
+        """
+        scratch_dir = config.scratch_dir
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+            prefix = f"{self.platform_id}_{date.replace('-', '')}_"
+            return tempfile.mkdtemp(prefix=prefix, dir=scratch_dir)
+        output_dir = self.storage.ensure_output_dir(self.newspaper_name, date)
+        return tempfile.mkdtemp(prefix="temp_", dir=output_dir)
+
+    def _log(self, level: str, message: str):
+        if self._log_callback:
+            self._log_callback(level, message)
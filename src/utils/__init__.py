@@ -1,7 +1,17 @@
 # -*- coding: UTF-8 -*-
 from .storage import StorageManager
 from .logger import Logger, logger, LogEntry, LogLevel
-from .pdf_tools import merge_pdfs, merge_pdfs_sorted, merge_images_to_pdf
+from .pdf_writer import ImageProfile
+from .volume import VolumeBuilder, VolumeUpdate
+from .search_index import SearchIndex, SearchHit
+from .thumbnails import ThumbnailCache, EditionThumbnails
+from .manifest import ArchiveManifest, ManifestEntry, ReconcileResult
+from .availability import AvailabilityStore
+from .work_queue import WorkQueue, WorkUnit
+from .pdf_tools import (
+    merge_pdfs, merge_pdfs_sorted, merge_images_to_pdf,
+    optimize_pdf, linearize_pdf, OptimizeResult,
+)
 
 __all__ = [
     "StorageManager",
@@ -12,4 +22,20 @@ __all__ = [
     "merge_pdfs",
     "merge_pdfs_sorted",
     "merge_images_to_pdf",
+    "optimize_pdf",
+    "linearize_pdf",
+    "OptimizeResult",
+    "ImageProfile",
+    "VolumeBuilder",
+    "VolumeUpdate",
+    "SearchIndex",
+    "SearchHit",
+    "ThumbnailCache",
+    "EditionThumbnails",
+    "ArchiveManifest",
+    "ManifestEntry",
+    "ReconcileResult",
+    "AvailabilityStore",
+    "WorkQueue",
+    "WorkUnit",
 ]
@@ -0,0 +1,138 @@
+# -*- coding: UTF-8 -*-
+"""
+报纸更新日期记录
+
+按 (平台, 日期) 记录是否出版以及检查时间，保存在 availability.db (SQLite)。
+在那一天结束之后确认出版的结果不会再变化，以后不再检查；确认没有出版的结果
+(网站可能暂时撤下或补发) 在 availability.unpublished_ttl 秒后过期；当天 (以及
+在当天检查、尚未复查的日期) 的结果在 availability.today_ttl 秒后过期。刷新时
+只检查没有记录或已过期的日期。
+
+检查出错 (网络错误等) 不记录，下次刷新重新检查。
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+AVAILABILITY_FILENAME = "availability.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS availability (
+    platform TEXT NOT NULL,
+    date TEXT NOT NULL,
+    published INTEGER NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (platform, date)
+) WITHOUT ROWID;
+"""
+
+
+def _day_end(date: str) -> float:
+    """date (YYYY-MM-DD) 当天结束 (次日零点) 的时间戳"""
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).timestamp()
+
+
+class AvailabilityStore:
+    """报纸更新日期记录
+
+    Args:
+        db_path: 数据库路径
+        today_ttl: 尚未定论的记录的有效期 (秒)
+        unpublished_ttl: 过去日期没有出版的记录的有效期 (秒)
+    """
+
+    _shared: Dict[str, "AvailabilityStore"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_path: str, today_ttl: float = 3600, unpublished_ttl: float = 7 * 86400):
+        self.db_path = db_path
+        self.today_ttl = today_ttl
+        self.unpublished_ttl = unpublished_ttl
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def for_config(cls, config) -> "AvailabilityStore":
+        """配置中的记录文件共用的实例"""
+        db_path = os.path.abspath(config.availability_db_path)
+        with cls._shared_lock:
+            store = cls._shared.get(db_path)
+            if store is None:
+                store = cls._shared[db_path] = cls(
+                    db_path, config.availability_today_ttl, config.availability_unpublished_ttl)
+            store.today_ttl = config.availability_today_ttl
+            store.unpublished_ttl = config.availability_unpublished_ttl
+            return store
+
+    def close(self):
+        with self._shared_lock:
+            if self._shared.get(os.path.abspath(self.db_path)) is self:
+                del self._shared[os.path.abspath(self.db_path)]
+        with self._lock:
+            self._conn.close()
+
+    def record(self, platform_id: str, date: str, published: bool, checked_at: Optional[float] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO availability (platform, date, published, checked_at) VALUES (?, ?, ?, ?)",
+                (platform_id, date, int(published), checked_at if checked_at is not None else time.time()),
+            )
+
+    def _rows(self, platform_id: str, dates: List[str]) -> Dict[str, tuple]:
+        if not dates:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, published, checked_at FROM availability "
+                "WHERE platform = ? AND date >= ? AND date <= ?",
+                (platform_id, min(dates), max(dates)),
+            ).fetchall()
+        return {row[0]: (bool(row[1]), row[2]) for row in rows}
+
+    def _is_fresh(self, date: str, published: bool, checked_at: float, now: float) -> bool:
+        if checked_at < _day_end(date):
+            return now - checked_at < self.today_ttl
+        return published or now - checked_at < self.unpublished_ttl
+
+    def lookup(self, platform_id: str, dates: Iterable[str]) -> Dict[str, bool]:
+        """dates 中仍然有效的记录 {日期: 是否出版}，没有记录或已过期的日期不在结果中"""
+        wanted = set(dates)
+        now = time.time()
+        return {
+            date: published
+            for date, (published, checked_at) in self._rows(platform_id, list(wanted)).items()
+            if date in wanted and self._is_fresh(date, published, checked_at, now)
+        }
+
+    def stale(self, platform_id: str, dates: Iterable[str]) -> List[str]:
+        """需要检查的日期 (没有记录或已过期，保持原顺序)"""
+        dates = list(dates)
+        known = self.lookup(platform_id, dates)
+        return [date for date in dates if date not in known]
+
+    def published(self, platform_id: str, date_from: str, date_to: str) -> List[str]:
+        """已确认出版的日期 (包括已过期的记录)，从新到旧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date FROM availability WHERE platform = ? AND published = 1 "
+                "AND date >= ? AND date <= ? ORDER BY date DESC",
+                (platform_id, date_from, date_to),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def unpublished(self, platform_id: str, dates: Iterable[str]) -> set:
+        """已确认没有出版的日期 (只算在当天结束后检查、尚未过期的记录)"""
+        wanted = set(dates)
+        now = time.time()
+        return {
+            date for date, (published, checked_at) in self._rows(platform_id, list(wanted)).items()
+            if date in wanted and not published and checked_at >= _day_end(date)
+            and now - checked_at < self.unpublished_ttl
+        }
@@ -0,0 +1,208 @@
+# -*- coding: UTF-8 -*-
+"""
+错误日志文件
+
+每条日志一行 JSON 追加写入 (JSONL)，由后台线程批量写盘，调用方只做
+一次入队。文件超过大小上限或使用时间超过轮换周期后改名为 .1、.2 …，
+最多保留 backup_count 个旧文件。read_recent_entries 从当前文件和旧文件
+中读出最近的若干条。
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 后台线程最多攒这么多条再写一次盘
+BATCH_SIZE = 256
+
+
+def _rotated_path(path: str, index: int) -> str:
+    return f"{path}.{index}"
+
+
+def _first_timestamp(path: str) -> Optional[float]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            first = f.readline()
+        return datetime.strptime(json.loads(first)["timestamp"], TIMESTAMP_FORMAT).timestamp()
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _read_lines(path: str) -> List[dict]:
+    entries = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 进程中断可能留下不完整的最后一行
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+def _dumps(record: dict) -> str:
+    """一条日志转成一行 JSON，不能序列化的值 (如异常对象) 写成字符串"""
+    try:
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    except ValueError:
+        # 循环引用等，整条记录退化为字符串
+        return json.dumps({"timestamp": record.get("timestamp"), "level": record.get("level"),
+                           "message": str(record.get("message")), "details": str(record.get("details"))},
+                          ensure_ascii=False, default=str) + "\n"
+
+
+def read_recent_entries(path: str, limit: int = 1000, backup_count: int = 3) -> List[dict]:
+    """读取最近 limit 条日志 (按时间先后排列)
+
+    先读当前文件，不够时依次读 .1、.2 … 旧文件。
+    """
+    entries: List[dict] = []
+    for index in range(backup_count + 1):
+        file_path = path if index == 0 else _rotated_path(path, index)
+        if not os.path.exists(file_path):
+            break
+        entries = _read_lines(file_path) + entries
+        if len(entries) >= limit:
+            break
+    return entries[-limit:] if limit else entries
+
+
+def migrate_legacy_log(legacy_path: str, path: str):
+    """把旧版整文件 JSON 数组格式的日志转成 JSONL，转换后删除旧文件"""
+    if not os.path.exists(legacy_path) or os.path.exists(path):
+        return
+    try:
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.remove(legacy_path)
+    except (OSError, ValueError, TypeError):
+        pass
+
+
+class JsonlLogSink:
+    """后台线程写入的追加式日志文件
+
+    Args:
+        path: 日志文件路径
+        max_bytes: 单个文件大小上限，超过后轮换 (0 表示不按大小轮换)
+        rotate_interval: 单个文件最长使用时间 (秒)，超过后轮换 (0 表示不按时间轮换)
+        backup_count: 保留的旧文件个数
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1024 * 1024,
+        rotate_interval: float = 7 * 24 * 3600,
+        backup_count: int = 3
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        """入队一条日志，不做磁盘 I/O"""
+        if not self._closed:
+            self._queue.put(record)
+
+    def flush(self):
+        """等待已入队的日志全部写盘"""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        file = None
+        size = 0
+        started = None
+        while True:
+            records = [self._queue.get()]
+            while len(records) < BATCH_SIZE:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in records
+            try:
+                lines = "".join(
+                    _dumps(record) for record in records if record is not None
+                )
+                if lines:
+                    if file is None:
+                        file, size, started = self._open()
+                    if self._should_rotate(size, started):
+                        file.close()
+                        # 重新打开失败时，下一批再打开文件
+                        file = None
+                        try:
+                            self._rotate()
+                        except OSError:
+                            # 轮转失败时继续写入当前文件，下一批再试
+                            pass
+                        file, size, started = self._open()
+                    file.write(lines)
+                    file.flush()
+                    size += len(lines.encode('utf-8'))
+            except Exception:
+                # 写盘失败只丢弃这一批，后台线程继续运行
+                pass
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+
+            if stop:
+                if file is not None:
+                    file.close()
+                return
+
+    def _open(self) -> tuple:
+        file = open(self.path, 'a', encoding='utf-8')
+        size = file.tell()
+        started = (_first_timestamp(self.path) if size else None) or time.time()
+        return file, size, started
+
+    def _should_rotate(self, size: int, started: Optional[float]) -> bool:
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.rotate_interval and started is not None:
+            return time.time() - started >= self.rotate_interval
+        return False
+
+    def _rotate(self):
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        oldest = _rotated_path(self.path, self.backup_count)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backup_count - 1, 0, -1):
+            source = _rotated_path(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, _rotated_path(self.path, index + 1))
+        os.replace(self.path, _rotated_path(self.path, 1))
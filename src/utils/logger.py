@@ -2,14 +2,25 @@
 """
 日志模块 - 只持久化错误和警告日志
 """
+import heapq
+import itertools
 import json
 import os
+import threading
+import time
+import warnings
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, Callable
-from dataclasses import dataclass, asdict
 from enum import Enum
 
-LOG_FILE = "error_log.json"
+from .log_sink import JsonlLogSink, read_recent_entries, migrate_legacy_log
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOG_FILE = "error_log.jsonl"
+LEGACY_LOG_FILE = "error_log.json"
+ERROR_LOG_LIMIT = 1000
 
 class LogLevel(Enum):
     DEBUG = "DEBUG"
@@ -17,7 +28,22 @@ class LogLevel(Enum):
     WARNING = "WARNING"
     ERROR = "ERROR"
 
-@dataclass
+LEVEL_ORDER = {
+    LogLevel.DEBUG: 10,
+    LogLevel.INFO: 20,
+    LogLevel.WARNING: 30,
+    LogLevel.ERROR: 40,
+}
+
+# 内存中每个级别保留的条数
+DEFAULT_CAPACITY = {
+    "DEBUG": 500,
+    "INFO": 2000,
+    "WARNING": 1000,
+    "ERROR": 1000,
+}
+
+@dataclass(slots=True)
 class LogEntry:
     timestamp: str
     level: str
@@ -27,68 +53,196 @@ class LogEntry:
     def __post_init__(self):
         if self.details is None:
             self.details = {}
+    
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "level": self.level,
+            "message": self.message,
+            "details": self.details,
+        }
+
+def _legacy_details(args: tuple, details: Optional[dict]) -> tuple:
+    """兼容旧版接口 logger.error(message, {...})：唯一的字典参数作为 details"""
+    if details is None and len(args) == 1 and isinstance(args[0], dict):
+        warnings.warn(
+            "以位置参数传入 details 已弃用，请使用 details= 关键字参数",
+            DeprecationWarning,
+            stacklevel=3,
+        )
+        return (), args[0]
+    return args, details
+
+class _Record:
+    """环形缓冲区中保存的一条日志
+
+    message 带参数时保存模板和参数，第一次读取时才格式化；
+    timestamp 同样在读取时才由时间戳格式化。
+    """
+    __slots__ = ("seq", "created", "level", "message", "args", "details")
+    
+    def __init__(self, seq: int, created: float, level: str, message: str, args: tuple = (), details: dict = None):
+        self.seq = seq
+        self.created = created
+        self.level = level
+        self.message = message
+        self.args = args
+        self.details = details
+    
+    def entry(self) -> LogEntry:
+        if self.args:
+            try:
+                self.message = self.message % self.args
+            except (TypeError, ValueError):
+                self.message = " ".join([self.message, *map(str, self.args)])
+            self.args = ()
+        return LogEntry(
+            timestamp=datetime.fromtimestamp(self.created).strftime('%Y-%m-%d %H:%M:%S'),
+            level=self.level,
+            message=self.message,
+            details=self.details,
+        )
+
+class LogStore:
+    """按级别分别限容的环形缓冲区，超出容量时丢弃该级别最旧的条目"""
+    
+    def __init__(self, capacities: Optional[dict] = None):
+        self._buffers: dict = {}
+        self.set_capacities(capacities or DEFAULT_CAPACITY)
+    
+    def set_capacities(self, capacities: dict):
+        merged = dict(DEFAULT_CAPACITY)
+        # 未知的级别忽略
+        merged.update((level, capacity) for level, capacity in capacities.items() if level in DEFAULT_CAPACITY)
+        self._buffers = {
+            level: deque(self._buffers.get(level, ()), maxlen=capacity)
+            for level, capacity in merged.items()
+        }
+    
+    def append(self, record: _Record):
+        self._buffers[record.level].append(record)
+    
+    def entries(self, min_level: Optional[LogLevel] = None) -> list:
+        """按记录顺序返回所有 (或不低于 min_level 的) 记录"""
+        threshold = LEVEL_ORDER[min_level] if min_level else 0
+        buffers = [
+            list(buffer) for level, buffer in self._buffers.items()
+            if LEVEL_ORDER[LogLevel(level)] >= threshold
+        ]
+        return list(heapq.merge(*buffers, key=lambda record: record.seq))
+    
+    def __len__(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+    
+    def clear(self):
+        for buffer in self._buffers.values():
+            buffer.clear()
 
 class Logger:
-    def __init__(self, name: str = "NewspaperDownloader"):
+    def __init__(self, name: str = "NewspaperDownloader", level: LogLevel = LogLevel.INFO, capacities: dict = None):
         self.name = name
-        self._entries: list[LogEntry] = []
+        self._store = LogStore(capacities)
+        self._threshold = LEVEL_ORDER[level]
+        self._seq = itertools.count()
         self._callbacks: list[Callable[[LogEntry], None]] = []
         self._json_export_path: Optional[str] = None
+        self._error_log_path: Optional[str] = None
+        self._error_sink: Optional[JsonlLogSink] = None
+        self._sink_lock = threading.Lock()
+    
+    @property
+    def level(self) -> LogLevel:
+        return next(level for level, order in LEVEL_ORDER.items() if order == self._threshold)
+    
+    def set_level(self, level):
+        """设置记录的最低级别，低于该级别的调用直接返回"""
+        if isinstance(level, str):
+            level = LogLevel(level.upper())
+        self._threshold = LEVEL_ORDER[level]
+    
+    def is_enabled_for(self, level: LogLevel) -> bool:
+        return LEVEL_ORDER[level] >= self._threshold
+    
+    def set_capacities(self, capacities: dict):
+        """设置各级别在内存中保留的条数，如 {"DEBUG": 100}"""
+        self._store.set_capacities(capacities)
     
     def add_callback(self, callback: Callable[[LogEntry], None]):
         self._callbacks.append(callback)
     
-    def _log(self, level: LogLevel, message: str, details: dict = None):
-        entry = LogEntry(
-            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            level=level.value,
-            message=message,
-            details=details
-        )
-        self._entries.append(entry)
+    def _log(self, level: LogLevel, message: str, args: tuple = (), details: dict = None):
+        record = _Record(next(self._seq), time.time(), level.value, message, args, details)
+        self._store.append(record)
         
-        for callback in self._callbacks:
-            try:
-                callback(entry)
-            except Exception:
-                pass
+        if self._callbacks:
+            entry = record.entry()
+            for callback in self._callbacks:
+                try:
+                    callback(entry)
+                except Exception:
+                    pass
         
         if level in (LogLevel.ERROR, LogLevel.WARNING):
-            self._persist_error_log(entry)
+            self._persist_error_log(record.entry())
     
     def _persist_error_log(self, entry: LogEntry):
         try:
-            log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), LOG_FILE)
-            
-            existing_logs = []
-            if os.path.exists(log_path):
-                try:
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        existing_logs = json.load(f)
-                except:
-                    pass
-            
-            existing_logs.append(asdict(entry))
-            
-            if len(existing_logs) > 1000:
-                existing_logs = existing_logs[-1000:]
-            
-            with open(log_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_logs, f, ensure_ascii=False, indent=2)
+            if self._error_sink is None:
+                with self._sink_lock:
+                    if self._error_sink is None:
+                        self._error_sink = self._open_error_sink()
+            self._error_sink.write(entry.to_dict())
         except Exception:
             pass
     
-    def debug(self, message: str, details: dict = None):
-        self._log(LogLevel.DEBUG, message, details)
+    def _error_log_file(self) -> str:
+        return self._error_log_path or os.path.join(BASE_DIR, LOG_FILE)
+    
+    def _open_error_sink(self) -> JsonlLogSink:
+        if self._error_log_path is None:
+            migrate_legacy_log(os.path.join(BASE_DIR, LEGACY_LOG_FILE), self._error_log_file())
+        return JsonlLogSink(self._error_log_file())
+    
+    def set_error_log_path(self, path: str):
+        """更改错误日志文件位置 (已打开的文件先写完再关闭)"""
+        with self._sink_lock:
+            if self._error_sink is not None:
+                self._error_sink.close()
+                self._error_sink = None
+            self._error_log_path = path
+    
+    def get_error_log(self, limit: int = ERROR_LOG_LIMIT) -> list[dict]:
+        """最近 limit 条错误和警告日志"""
+        if self._error_sink is not None:
+            self._error_sink.flush()
+        return read_recent_entries(self._error_log_file(), limit)
+    
+    def debug(self, message: str, *args, details: dict = None):
+        """message 可以是 % 格式模板，参数在真正读取日志时才格式化
+
+        只有一个字典参数时按旧版接口当作 details (不支持按字典格式化的模板)。
+        """
+        if self._threshold <= LEVEL_ORDER[LogLevel.DEBUG]:
+            args, details = _legacy_details(args, details)
+            self._log(LogLevel.DEBUG, message, args, details)
     
-    def info(self, message: str, details: dict = None):
-        self._log(LogLevel.INFO, message, details)
+    def info(self, message: str, *args, details: dict = None):
+        if self._threshold <= LEVEL_ORDER[LogLevel.INFO]:
+            args, details = _legacy_details(args, details)
+            self._log(LogLevel.INFO, message, args, details)
     
-    def warning(self, message: str, details: dict = None):
-        self._log(LogLevel.WARNING, message, details)
+    def warning(self, message: str, *args, details: dict = None):
+        """警告总是写入错误日志；低于当前级别时不进入内存和回调"""
+        args, details = _legacy_details(args, details)
+        if self._threshold <= LEVEL_ORDER[LogLevel.WARNING]:
+            self._log(LogLevel.WARNING, message, args, details)
+        else:
+            record = _Record(next(self._seq), time.time(), LogLevel.WARNING.value, message, args, details)
+            self._persist_error_log(record.entry())
     
-    def error(self, message: str, details: dict = None):
-        self._log(LogLevel.ERROR, message, details)
+    def error(self, message: str, *args, details: dict = None):
+        args, details = _legacy_details(args, details)
+        self._log(LogLevel.ERROR, message, args, details)
     
     def export_json(self, filepath: str = None) -> str:
         path = filepath or self._json_export_path
@@ -98,7 +252,7 @@ class Logger:
         data = {
             "app": self.name,
             "export_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "entries": [asdict(e) for e in self._entries]
+            "entries": [record.entry().to_dict() for record in self._store.entries()]
         }
         
         with open(path, 'w', encoding='utf-8') as f:
@@ -106,10 +260,10 @@ class Logger:
         
         return path
     
-    def get_entries(self) -> list[LogEntry]:
-        return self._entries.copy()
+    def get_entries(self, min_level: LogLevel = None) -> list[LogEntry]:
+        return [record.entry() for record in self._store.entries(min_level)]
     
     def clear(self):
-        self._entries.clear()
+        self._store.clear()
 
 logger = Logger()
@@ -0,0 +1,323 @@
+# -*- coding: UTF-8 -*-
+"""
+存档清单
+
+每下载完成一期报纸，就把它的路径、大小、版面数和 SHA-256 记入存档目录下
+的 manifest.db (SQLite)。"是否已下载"和"某段日期下载了哪些"都只查清单，
+不需要逐个 stat 或遍历网络存储上的目录。
+
+清单只在下载完成时更新；手工删除或复制进来的文件用 reconcile() 扫描存档
+目录重建。
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from pypdf import PdfReader
+
+from .storage import StorageManager
+
+MANIFEST_FILENAME = "manifest.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS editions (
+    newspaper TEXT NOT NULL,
+    date TEXT NOT NULL,
+    suffix TEXT NOT NULL DEFAULT '',
+    kind TEXT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    page_count INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (newspaper, date, suffix)
+) WITHOUT ROWID;
+"""
+
+HASH_CHUNK = 1024 * 1024
+
+_DATE_DIR = re.compile(r"\d{8}")
+
+
+@dataclass
+class ManifestEntry:
+    newspaper: str
+    date: str
+    suffix: str
+    kind: Optional[str]
+    path: str
+    size: int
+    page_count: int
+    sha256: str
+
+
+@dataclass
+class ReconcileResult:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def count_pages(path: str) -> int:
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+def _normalize_date(date: str) -> str:
+    return date.replace("-", "")
+
+
+class ArchiveManifest:
+    """存档清单
+
+    Args:
+        db_path: 清单数据库路径
+        base_path: 存档目录，清单中的路径相对于此目录保存
+        journal_mode: SQLite 日志模式。存档目录可能在共享文件系统上，默认用 DELETE
+            (WAL 依赖共享内存，只能在一台机器上使用)；确定只在本机访问时可用 WAL
+    """
+
+    _shared: Dict[str, "ArchiveManifest"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_path: str, base_path: str, journal_mode: str = "DELETE"):
+        self.db_path = db_path
+        self.base_path = os.path.abspath(base_path)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def for_storage(cls, storage: StorageManager, journal_mode: str = "DELETE") -> "ArchiveManifest":
+        """存档目录共用的清单 (同一目录只打开一次，journal_mode 只在第一次打开时生效)"""
+        db_path = os.path.join(storage.base_path, MANIFEST_FILENAME)
+        with cls._shared_lock:
+            manifest = cls._shared.get(db_path)
+            if manifest is None:
+                manifest = cls._shared[db_path] = cls(db_path, storage.base_path, journal_mode)
+            return manifest
+
+    def close(self):
+        with self._shared_lock:
+            if self._shared.get(self.db_path) is self:
+                del self._shared[self.db_path]
+        with self._lock:
+            self._conn.close()
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.base_path)
+
+    def _entry(self, row) -> ManifestEntry:
+        return ManifestEntry(
+            newspaper=row[0], date=row[1], suffix=row[2], kind=row[3],
+            path=os.path.join(self.base_path, row[4]), size=row[5], page_count=row[6], sha256=row[7],
+        )
+
+    def record(
+        self,
+        newspaper: str,
+        date: str,
+        path: str,
+        suffix: str = "",
+        kind: Optional[str] = None,
+        page_count: Optional[int] = None,
+        sha256: Optional[str] = None
+    ) -> ManifestEntry:
+        """记录一期已完成的报纸 (覆盖同一报纸、日期和后缀的旧记录)
+
+        Args:
+            kind: pdf 或 image (图片版)，未知时为 None
+            page_count: 版面数，不提供时读取 PDF 统计
+            sha256: 文件哈希，不提供时计算
+        """
+        stat = os.stat(path)
+        if page_count is None:
+            page_count = count_pages(path)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+        date = _normalize_date(date)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO editions "
+                "(newspaper, date, suffix, kind, path, size, mtime, page_count, sha256, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (newspaper, date, suffix, kind, self._relative(path), stat.st_size, stat.st_mtime,
+                 page_count, sha256, time.time()),
+            )
+        return ManifestEntry(newspaper, date, suffix, kind, os.path.abspath(path), stat.st_size, page_count, sha256)
+
+    def set_kind(self, newspaper: str, date: str, suffix: str, kind: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE editions SET kind = ? WHERE newspaper = ? AND date = ? AND suffix = ?",
+                (kind, newspaper, _normalize_date(date), suffix),
+            )
+
+    def remove(self, newspaper: str, date: str, suffix: str = ""):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM editions WHERE newspaper = ? AND date = ? AND suffix = ?",
+                (newspaper, _normalize_date(date), suffix),
+            )
+
+    def get(self, newspaper: str, date: str, suffix: str = "") -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT newspaper, date, suffix, kind, path, size, page_count, sha256 FROM editions "
+                "WHERE newspaper = ? AND date = ? AND suffix = ?",
+                (newspaper, _normalize_date(date), suffix),
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def has(self, newspaper: str, date: str, suffix: str = "") -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM editions WHERE newspaper = ? AND date = ? AND suffix = ?",
+                (newspaper, _normalize_date(date), suffix),
+            ).fetchone()
+        return row is not None
+
+    def variants(self, newspaper: str, date: str) -> List[ManifestEntry]:
+        """一期报纸已下载的各个版本 (存档版和不同质量配置的图片版)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT newspaper, date, suffix, kind, path, size, page_count, sha256 FROM editions "
+                "WHERE newspaper = ? AND date = ?",
+                (newspaper, _normalize_date(date)),
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def dates(
+        self,
+        newspaper: str,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        suffix: Optional[str] = ""
+    ) -> List[str]:
+        """已下载的日期 (yyyymmdd，升序)
+
+        Args:
+            date_from: 起始日期 (含)，YYYY-MM-DD 或 yyyymmdd
+            date_to: 结束日期 (含)
+            suffix: 只统计该版本，None 表示任一版本
+        """
+        sql = "SELECT DISTINCT date FROM editions WHERE newspaper = ?"
+        params = [newspaper]
+        if suffix is not None:
+            sql += " AND suffix = ?"
+            params.append(suffix)
+        if date_from:
+            sql += " AND date >= ?"
+            params.append(_normalize_date(date_from))
+        if date_to:
+            sql += " AND date <= ?"
+            params.append(_normalize_date(date_to))
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY date", params).fetchall()
+        return [row[0] for row in rows]
+
+    def missing(self, newspaper: str, dates: Iterable[str], suffix: Optional[str] = "") -> List[str]:
+        """dates 中还没有下载的日期 (保持原格式和顺序)"""
+        dates = list(dates)
+        if not dates:
+            return []
+        normalized = [_normalize_date(date) for date in dates]
+        present = set(self.dates(newspaper, min(normalized), max(normalized), suffix))
+        return [date for date, key in zip(dates, normalized) if key not in present]
+
+    def newspapers(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT newspaper FROM editions ORDER BY newspaper").fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            editions, size, pages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(page_count), 0) FROM editions"
+            ).fetchone()
+        return {"editions": editions, "bytes": size, "pages": pages}
+
+    def reconcile(self, newspaper: Optional[str] = None) -> ReconcileResult:
+        """扫描存档目录重建清单
+
+        新文件加入清单，大小或修改时间变化的重新统计，文件已不存在的记录删除。
+        """
+        result = ReconcileResult()
+        if newspaper:
+            newspapers = [newspaper]
+        elif os.path.isdir(self.base_path):
+            newspapers = sorted(
+                name for name in os.listdir(self.base_path)
+                if not name.startswith(".") and os.path.isdir(os.path.join(self.base_path, name))
+            )
+        else:
+            newspapers = []
+
+        with self._lock:
+            query = "SELECT newspaper, date, suffix, path, size, mtime, kind FROM editions"
+            params = []
+            if newspaper:
+                query += " WHERE newspaper = ?"
+                params.append(newspaper)
+            known = {(row[0], row[1], row[2]): row[3:] for row in self._conn.execute(query, params)}
+
+        found = set()
+        for name in newspapers:
+            pattern = re.compile(rf"{re.escape(name)}_(\d{{8}})((?:_[^.]+)?)\.pdf")
+            paper_dir = os.path.join(self.base_path, name)
+            if not os.path.isdir(paper_dir):
+                # 指定的报纸没有存档目录：清单中该报纸的记录全部删除
+                continue
+            for day in sorted(os.listdir(paper_dir)):
+                day_dir = os.path.join(paper_dir, day)
+                if not _DATE_DIR.fullmatch(day) or not os.path.isdir(day_dir):
+                    continue
+                for entry in os.scandir(day_dir):
+                    match = pattern.fullmatch(entry.name)
+                    if not match or match.group(1) != day or not entry.is_file():
+                        continue
+                    key = (name, day, match.group(2))
+                    found.add(key)
+                    stat = entry.stat()
+                    previous = known.get(key)
+                    if previous and previous[1] == stat.st_size and previous[2] == stat.st_mtime:
+                        result.unchanged += 1
+                        continue
+                    kind = previous[3] if previous else ("image" if match.group(2) else None)
+                    try:
+                        self.record(name, day, entry.path, match.group(2), kind)
+                    except Exception:
+                        # 损坏或正在写入的文件跳过，下次再处理
+                        found.discard(key)
+                        continue
+                    if previous:
+                        result.updated += 1
+                    else:
+                        result.added += 1
+
+        stale = [key for key in known if key not in found]
+        if stale:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "DELETE FROM editions WHERE newspaper = ? AND date = ? AND suffix = ?", stale
+                )
+        result.removed = len(stale)
+        return result
@@ -0,0 +1,237 @@
+# -*- coding: UTF-8 -*-
+"""
+性能指标
+
+计数器和耗时直方图按 platform / host 等标签分别累计，可导出为
+Prometheus textfile (供 node_exporter 的 textfile collector 采集) 和
+JSON 汇总。指标在进程内一直累计；checkpoint() 记下当前状态后，
+summary(since=...) 只统计这之后 (本次运行) 的增量。
+"""
+import copy
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# 耗时直方图的桶上限 (秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_HELP = {
+    "newspaper_discovery_seconds": "获取报纸版面信息的耗时",
+    "newspaper_discovery_failures_total": "获取报纸版面信息失败次数",
+    "newspaper_fetch_seconds": "单个版面下载耗时",
+    "newspaper_fetch_bytes_total": "下载的字节数",
+    "newspaper_fetch_retries_total": "版面下载重试次数",
+    "newspaper_fetch_errors_total": "版面下载失败次数",
+    "newspaper_bandwidth_wait_seconds_total": "全局限速下下载等待的时间",
+    "newspaper_merge_seconds": "合并一期报纸的耗时",
+    "newspaper_merge_input_bytes_total": "参与合并的版面数据字节数",
+    "newspaper_merge_output_bytes_total": "合并输出的字节数",
+    "newspaper_storage_seconds": "存储操作耗时",
+    "newspaper_editions_total": "处理的报纸期数",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def url_host(url: str) -> str:
+    return urlparse(url).hostname or ""
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """线程安全的计数器和直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # 直方图: 名称 -> 标签 -> [各桶计数..., 总数, 总和]
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += 1
+            data[-1] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """记录代码块耗时 (异常时同样记录)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """记录函数耗时的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def checkpoint(self) -> dict:
+        """当前状态的副本，用作 summary(since=...) 的起点"""
+        with self._lock:
+            return {
+                "counters": copy.deepcopy(self._counters),
+                "histograms": copy.deepcopy(self._histograms),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        state = self.checkpoint()
+        lines = []
+        for name in sorted(state["counters"]):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(state["counters"][name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for name in sorted(state["histograms"]):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, data in sorted(state["histograms"][name].items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, data):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {data[-2]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(data[-1])}")
+                lines.append(f"{name}_count{_format_labels(key)} {data[-2]}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, since: Optional[dict] = None) -> dict:
+        """JSON 汇总：计数器取值，直方图给出次数、总和、平均值和估算的 p50/p95
+
+        Args:
+            since: checkpoint() 的返回值，只统计之后的增量
+        """
+        state = self.checkpoint()
+        base_counters = since["counters"] if since else {}
+        base_histograms = since["histograms"] if since else {}
+
+        counters = {}
+        for name, series in state["counters"].items():
+            for key, value in series.items():
+                delta = value - base_counters.get(name, {}).get(key, 0)
+                if delta:
+                    counters.setdefault(name, []).append({"labels": dict(key), "value": delta})
+
+        histograms = {}
+        for name, series in state["histograms"].items():
+            for key, data in series.items():
+                base = base_histograms.get(name, {}).get(key)
+                if base:
+                    data = [a - b for a, b in zip(data, base)]
+                if not data[-2]:
+                    continue
+                histograms.setdefault(name, []).append({
+                    "labels": dict(key),
+                    "count": data[-2],
+                    "sum": round(data[-1], 6),
+                    "avg": round(data[-1] / data[-2], 6),
+                    "p50": self._quantile(data, 0.5),
+                    "p95": self._quantile(data, 0.95),
+                })
+
+        return {
+            "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "counters": counters,
+            "histograms": histograms,
+            "throughput": self._throughput(counters, histograms),
+        }
+
+    def _quantile(self, data: list, q: float) -> Optional[float]:
+        """按桶估算分位数 (返回所在桶的上限)"""
+        target = q * data[-2]
+        cumulative = 0
+        for bound, count in zip(self.buckets, data):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return None
+
+    @staticmethod
+    def _throughput(counters: dict, histograms: dict) -> list:
+        """按平台和站点计算下载吞吐量 (字节 / 下载耗时)"""
+        seconds = {
+            (item["labels"].get("platform"), item["labels"].get("host")): item["sum"]
+            for item in histograms.get("newspaper_fetch_seconds", [])
+        }
+        result = []
+        for item in counters.get("newspaper_fetch_bytes_total", []):
+            key = (item["labels"].get("platform"), item["labels"].get("host"))
+            if seconds.get(key):
+                result.append({
+                    "labels": item["labels"],
+                    "bytes_per_second": round(item["value"] / seconds[key], 1),
+                })
+        return result
+
+    def write_textfile(self, path: str):
+        """原子写入 Prometheus textfile，避免采集到写了一半的文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_summary(self, path: str, since: Optional[dict] = None, **extra):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        summary = self.summary(since)
+        summary.update(extra)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,171 @@
+# -*- coding: UTF-8 -*-
+"""
+版面缓存
+
+一期报纸的版面默认保存在内存中，直接从内存合并；所有版面合计超过
+内存上限后，后续数据才写入临时目录。多个版面可以在不同线程中同时写入。
+"""
+import io
+import os
+import shutil
+import threading
+from typing import Callable, List, Optional, Tuple, Union
+
+
+class PageBuffer:
+    """单个版面的写入缓冲，由 PageStore 决定在内存中还是溢出到磁盘"""
+
+    def __init__(self, store: "PageStore", page_num: int, ext: str):
+        self._store = store
+        self.page_num = page_num
+        self.ext = ext
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._data: Optional[bytes] = None
+        self._file = None
+        self.path: Optional[str] = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    def write(self, data: bytes) -> int:
+        if self._memory is not None:
+            if self._store.reserve_memory(len(data)):
+                return self._memory.write(data)
+            self._spill()
+        return self._file.write(data)
+
+    def reset(self):
+        """丢弃已写入的内容 (下载重试时使用)"""
+        if self._memory is not None:
+            self._store.release_memory(self._memory.tell())
+            self._memory = io.BytesIO()
+        else:
+            self._file.seek(0)
+            self._file.truncate()
+
+    def _spill(self):
+        self.path = os.path.join(self._store.spill_dir(), f"page_{self.page_num:02d}.{self.ext}")
+        self._file = open(self.path, "wb")
+        data = self._memory.getvalue()
+        self._file.write(data)
+        self._store.release_memory(len(data))
+        self._memory = None
+
+    def close(self):
+        """结束写入；内存中的数据转为 bytes，释放缓冲区"""
+        if self._file is not None:
+            self._file.close()
+        elif self._memory is not None:
+            self._data = self._memory.getvalue()
+            self._memory = None
+
+    def source(self) -> Union[bytes, str]:
+        """合并用的数据：内存中的字节或溢出文件路径"""
+        if self.path is not None:
+            return self.path
+        if self._memory is not None:
+            self.close()
+        return self._data
+
+    def head(self, size: int = 1024) -> bytes:
+        """已写入数据的开头部分 (用于校验文件类型)"""
+        if self.path is not None:
+            if not self._file.closed:
+                self._file.flush()
+            with open(self.path, "rb") as f:
+                return f.read(size)
+        if self._memory is not None:
+            return self._memory.getbuffer()[:size].tobytes()
+        return self._data[:size]
+
+    def size(self) -> int:
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        if self._memory is not None:
+            return self._memory.tell()
+        return len(self._data)
+
+    def discard(self):
+        if self.path is None:
+            self._store.release_memory(self.size())
+            self._memory = io.BytesIO()
+            self._data = None
+        else:
+            self.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class PageStore:
+    """一期报纸的版面缓存
+
+    Args:
+        memory_limit: 内存中保存的版面数据上限 (字节)，0 表示全部写入磁盘
+        spill_dir_factory: 首次溢出时调用，返回临时目录路径
+    """
+
+    def __init__(self, memory_limit: int, spill_dir_factory: Callable[[], str]):
+        self.memory_limit = memory_limit
+        self._spill_dir_factory = spill_dir_factory
+        self._spill_dir: Optional[str] = None
+        self._memory_used = 0
+        self._pages: List[PageBuffer] = []
+        self._lock = threading.Lock()
+
+    @property
+    def memory_used(self) -> int:
+        return self._memory_used
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill_dir is not None
+
+    def reserve_memory(self, size: int) -> bool:
+        with self._lock:
+            if self._memory_used + size > self.memory_limit:
+                return False
+            self._memory_used += size
+            return True
+
+    def release_memory(self, size: int):
+        with self._lock:
+            self._memory_used -= size
+
+    def spill_dir(self) -> str:
+        with self._lock:
+            if self._spill_dir is None:
+                self._spill_dir = self._spill_dir_factory()
+                os.makedirs(self._spill_dir, exist_ok=True)
+            return self._spill_dir
+
+    def new_page(self, page_num: int, ext: str) -> PageBuffer:
+        page = PageBuffer(self, page_num, ext)
+        with self._lock:
+            self._pages.append(page)
+        return page
+
+    def remove(self, page: PageBuffer):
+        page.discard()
+        with self._lock:
+            self._pages.remove(page)
+
+    def pages(self) -> List[Tuple[int, Union[bytes, str]]]:
+        """[(页码, 数据或文件路径), ...]"""
+        for page in self._pages:
+            page.close()
+        return [(page.page_num, page.source()) for page in self._pages]
+
+    def total_size(self) -> int:
+        return sum(page.size() for page in self._pages)
+
+    def cleanup(self):
+        for page in self._pages:
+            page.close()
+        self._pages.clear()
+        self._memory_used = 0
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
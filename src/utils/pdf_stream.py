@@ -0,0 +1,377 @@
+# -*- coding: UTF-8 -*-
+"""
+流式 PDF 合并
+
+逐页把源 PDF 的对象复制到输出文件，写出后即释放，只保留交叉引用表
+偏移和当前源文件的对象编号映射，内存占用不随合并总页数增长。
+各源文件的书签依次接在输出文件的书签之后。
+"""
+import gc
+import hashlib
+import io
+import os
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    ByteStringObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+    TextStringObject,
+)
+
+from .pdf_writer import PdfObjectWriter
+
+# 页面可从父节点继承的属性
+INHERITABLE_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# 复制页面时丢弃的键：父节点由输出文件重建，文章线程不跨文件保留
+SKIPPED_PAGE_KEYS = ("/Parent", "/B")
+
+# 书签之间的链接，复制时按输出文件中的位置重建
+OUTLINE_LINK_KEYS = ("/Parent", "/Prev", "/Next", "/First", "/Last")
+
+
+def _serialize(obj) -> bytes:
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+@dataclass
+class MergeStats:
+    duplicates: int = 0
+    duplicate_bytes: int = 0
+    recompressed_bytes: int = 0
+
+
+class PdfPageCopier:
+    """把源 PDF 的页面及其引用的对象复制到 PdfObjectWriter
+
+    按后序复制 (先写子对象再写父对象)，写出后即释放。dedup 为 True 时
+    按内容摘要合并重复的对象和流 (如每页都嵌入的同一份字体)；
+    recompress 为 True 时重新压缩流数据。
+    """
+
+    def __init__(self, writer: PdfObjectWriter, dedup: bool = False, recompress: bool = False):
+        self._writer = writer
+        self.dedup = dedup
+        self.recompress = recompress
+        self.stats = MergeStats()
+        # 去重时内容摘要 -> 输出对象号，跨文件保留
+        self._seen: Dict[bytes, int] = {}
+        # 当前源文件的 (对象号, 代号) -> 输出对象号，换文件时清空
+        self._id_map: Dict[tuple, int] = {}
+        self._in_progress: Dict[tuple, Optional[int]] = {}
+
+    def copy_pages(
+        self,
+        source: Union[str, BinaryIO],
+        parent_id: int,
+        outline: Optional[List[Tuple[int, DictionaryObject]]] = None
+    ) -> List[int]:
+        """复制一个 PDF 的全部页面
+
+        Args:
+            source: 文件路径或可读的二进制流
+            parent_id: 输出文件中页面父节点 (Pages) 的对象号
+            outline: 传入时同时复制书签：顶层书签追加到此列表，由调用方串联后
+                用 write_outline_level 写出，下级书签直接写出
+
+        Returns:
+            输出文件中的页面对象号列表
+        """
+        if isinstance(source, str):
+            # 传文件对象时 pypdf 按需读取，不会把整个文件读入内存
+            with open(source, "rb") as f:
+                return self.copy_pages(f, parent_id, outline)
+
+        reader = PdfReader(source)
+        try:
+            pages = list(reader.pages)
+            # 先为所有页面分配编号：链接注释的 /Dest 可能先于页面本身引用到它，
+            # 此时应指向复制后的页面，而不是把页面 (连同父节点) 当作普通对象复制
+            page_ids = []
+            for page in pages:
+                page_id = self._writer.reserve()
+                page_ref = page.indirect_reference
+                if page_ref is not None:
+                    self._id_map[(page_ref.idnum, page_ref.generation)] = page_id
+                page_ids.append(page_id)
+            for page, page_id in zip(pages, page_ids):
+                self._copy_page(page, page_id, parent_id)
+            if outline is not None:
+                outlines = reader.trailer["/Root"].get_object().get("/Outlines")
+                if outlines is not None:
+                    outline.extend(self._copy_outline_level(outlines.get_object(), reader, {}))
+            return page_ids
+        finally:
+            self._id_map.clear()
+            self._in_progress.clear()
+            # PdfReader 与其对象之间存在循环引用，及时回收才能限制内存峰值
+            del reader
+            gc.collect()
+
+    def _copy_page(self, page, page_id: int, parent_id: int):
+        copied = DictionaryObject()
+        for key, value in page.items():
+            if key in SKIPPED_PAGE_KEYS:
+                continue
+            copied[NameObject(key)] = self._remap(value)
+        for key in INHERITABLE_PAGE_KEYS:
+            if key not in copied:
+                inherited = self._find_inherited(page, key)
+                if inherited is not None:
+                    copied[NameObject(key)] = self._remap(inherited)
+        copied[NameObject("/Parent")] = IndirectObject(parent_id, 0, None)
+
+        self._writer.write_object(page_id, _serialize(copied))
+
+    def _copy_outline_level(self, node, reader, named: dict) -> List[Tuple[int, DictionaryObject]]:
+        """复制 node 的一级下级书签，更下级的书签直接写出
+
+        Returns:
+            [(输出对象号, 书签内容)]，/Parent /Prev /Next 尚未设置
+        """
+        items = []
+        seen = set()
+        ref = node.raw_get("/First") if "/First" in node else None
+        while isinstance(ref, IndirectObject) and (ref.idnum, ref.generation) not in seen:
+            seen.add((ref.idnum, ref.generation))
+            item = ref.get_object()
+            item_id = self._writer.reserve()
+            copied = DictionaryObject()
+            for key in item.keys():
+                if key in OUTLINE_LINK_KEYS:
+                    continue
+                value = item.raw_get(key)
+                if key == "/Dest":
+                    value = self._resolve_dest(value, reader, named)
+                    if value is None:
+                        continue
+                copied[NameObject(key)] = self._remap(value)
+            children = self._copy_outline_level(item, reader, named)
+            if children:
+                self.write_outline_level(children, item_id)
+                copied[NameObject("/First")] = IndirectObject(children[0][0], 0, None)
+                copied[NameObject("/Last")] = IndirectObject(children[-1][0], 0, None)
+            items.append((item_id, copied))
+            ref = item.raw_get("/Next") if "/Next" in item else None
+        return items
+
+    @staticmethod
+    def _resolve_dest(value, reader, named: dict):
+        """命名目标换成 [页面 类型 参数...]：输出文件不保留源文件的目标名称表"""
+        if isinstance(value, IndirectObject):
+            value = value.get_object()
+        if not isinstance(value, (NameObject, TextStringObject, ByteStringObject)):
+            return value
+        if "names" not in named:
+            try:
+                named["names"] = reader.named_destinations
+            except Exception:
+                named["names"] = {}
+        dest = named["names"].get(str(value)) or named["names"].get(str(value).lstrip("/"))
+        return dest.dest_array if dest is not None else None
+
+    def write_outline_level(self, items: List[Tuple[int, DictionaryObject]], parent_id: int):
+        """串联并写出同一级书签"""
+        for index, (item_id, copied) in enumerate(items):
+            copied[NameObject("/Parent")] = IndirectObject(parent_id, 0, None)
+            if index > 0:
+                copied[NameObject("/Prev")] = IndirectObject(items[index - 1][0], 0, None)
+            if index + 1 < len(items):
+                copied[NameObject("/Next")] = IndirectObject(items[index + 1][0], 0, None)
+            self._writer.write_object(item_id, _serialize(copied))
+
+    @staticmethod
+    def _find_inherited(page, key: str):
+        node = page.get("/Parent")
+        while node is not None:
+            node = node.get_object()
+            if key in node:
+                return node.raw_get(key)
+            node = node.get("/Parent")
+        return None
+
+    def _remap(self, value):
+        """复制一个直接对象，把其中的间接引用换成输出文件的对象号"""
+        if isinstance(value, IndirectObject):
+            return IndirectObject(self._copy_indirect(value), 0, None)
+        if isinstance(value, StreamObject):
+            raise ValueError("流对象必须是间接对象")
+        if isinstance(value, DictionaryObject):
+            copied = DictionaryObject()
+            for key, item in value.items():
+                copied[NameObject(key)] = self._remap(value.raw_get(key))
+            return copied
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._remap(item) for item in value)
+        return value
+
+    def _copy_indirect(self, ref: IndirectObject) -> int:
+        """按后序复制间接对象：先写子对象，再写自身"""
+        key = (ref.idnum, ref.generation)
+        obj_id = self._id_map.get(key)
+        if obj_id is not None:
+            return obj_id
+        if key in self._in_progress:
+            # 循环引用：提前分配编号
+            obj_id = self._in_progress[key]
+            if obj_id is None:
+                obj_id = self._writer.reserve()
+                self._in_progress[key] = obj_id
+            return obj_id
+
+        self._in_progress[key] = None
+        obj = ref.get_object()
+        if isinstance(obj, StreamObject):
+            entries = DictionaryObject()
+            for name in obj.keys():
+                if name != "/Length":
+                    entries[NameObject(name)] = self._remap(obj.raw_get(name))
+            body = _serialize(entries)
+            data = obj._data
+        else:
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Page":
+                # 不在页面树中、只被引用到的页面：不带上父节点，以免复制整个页面树
+                stripped = DictionaryObject()
+                for name in obj.keys():
+                    if name not in SKIPPED_PAGE_KEYS:
+                        stripped[NameObject(name)] = obj.raw_get(name)
+                obj = stripped
+            body = _serialize(self._remap(obj)) if obj is not None else b"null"
+            data = None
+
+        # 参与循环引用的对象已提前分配编号，不参与去重
+        obj_id = self._in_progress.pop(key)
+        digest = None
+        if self.dedup and obj_id is None:
+            hasher = hashlib.sha256(body)
+            if data is not None:
+                hasher.update(b"stream")
+                hasher.update(data)
+            digest = hasher.digest()
+            existing = self._seen.get(digest)
+            if existing is not None:
+                self.stats.duplicates += 1
+                self.stats.duplicate_bytes += len(body) + (len(data) if data is not None else 0)
+                self._id_map[key] = existing
+                return existing
+
+        if obj_id is None:
+            obj_id = self._writer.reserve()
+        if data is not None:
+            if self.recompress:
+                entries, data = self._recompress(entries, data)
+                body = _serialize(entries)
+            self._writer.write_stream(obj_id, body[2:-2].strip(), data)
+        else:
+            self._writer.write_object(obj_id, body)
+
+        if digest is not None:
+            self._seen[digest] = obj_id
+        self._id_map[key] = obj_id
+        return obj_id
+
+    def _recompress(self, entries: DictionaryObject, data: bytes) -> tuple:
+        """未压缩的流用 Flate 压缩，单层 Flate 流以最高级别重新压缩，只保留更小的结果"""
+        filters = entries.get("/Filter")
+        if isinstance(filters, ArrayObject) and len(filters) == 1:
+            filters = filters[0]
+        if filters is None:
+            raw = data
+        elif filters == "/FlateDecode" and "/DecodeParms" not in entries:
+            try:
+                raw = zlib.decompress(data)
+            except zlib.error:
+                return entries, data
+        else:
+            return entries, data
+
+        compressed = zlib.compress(raw, 9)
+        if len(compressed) >= len(data):
+            return entries, data
+        self.stats.recompressed_bytes += len(data) - len(compressed)
+        entries[NameObject("/Filter")] = NameObject("/FlateDecode")
+        return entries, compressed
+
+
+class StreamingPdfMerger:
+    """把多个 PDF 的页面依次追加写入输出文件
+
+    用法::
+
+        merger = StreamingPdfMerger(output_path)
+        for path in pdf_files:
+            merger.append(path)
+        merger.close()
+    """
+
+    def __init__(self, output_path: str, dedup: bool = False, recompress: bool = False):
+        self.output_path = output_path
+        self._part_path = output_path + ".part"
+        self._fp = open(self._part_path, "wb")
+        self._writer = PdfObjectWriter(self._fp)
+        self._writer.write_header(version="1.7")
+        self._catalog_id = self._writer.reserve()
+        self._pages_id = self._writer.reserve()
+        self._page_ids: List[int] = []
+        self._outline: List[Tuple[int, DictionaryObject]] = []
+        self._copier = PdfPageCopier(self._writer, dedup=dedup, recompress=recompress)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    @property
+    def stats(self) -> MergeStats:
+        return self._copier.stats
+
+    def append(self, source: Union[str, BinaryIO]):
+        """追加一个 PDF 的全部页面
+
+        Args:
+            source: 文件路径或可读的二进制流
+        """
+        self._page_ids.extend(self._copier.copy_pages(source, self._pages_id, self._outline))
+
+    def close(self):
+        writer = self._writer
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        writer.write_object(
+            self._pages_id,
+            b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self._page_ids),
+        )
+        outlines = b""
+        if self._outline:
+            outlines_id = writer.reserve()
+            self._copier.write_outline_level(self._outline, outlines_id)
+            writer.write_object(
+                outlines_id,
+                b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>"
+                % (self._outline[0][0], self._outline[-1][0], len(self._outline)),
+            )
+            outlines = b" /Outlines %d 0 R" % outlines_id
+        writer.write_object(
+            self._catalog_id,
+            b"<< /Type /Catalog /Pages %d 0 R" % self._pages_id + outlines + b" >>",
+        )
+        writer.write_trailer(self._catalog_id)
+        self._fp.close()
+        os.replace(self._part_path, self.output_path)
+
+    def abort(self):
+        try:
+            self._fp.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self._part_path)
+        except OSError:
+            pass
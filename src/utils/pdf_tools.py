@@ -2,12 +2,20 @@
 """
 PDF 合并工具
 """
+import io
 import os
-from typing import List, Tuple
-from PIL import Image
+import shutil
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from .pdf_writer import ImagePdfWriter, ImageProfile, probe_jpeg, convert_image
+from .profiling import tracer
+from .process_pool import get_process_pool, resolve_workers
 
 try:
     from pypdf import PdfWriter
+    from .pdf_stream import StreamingPdfMerger
     HAS_PYPDF = True
 except ImportError:
     HAS_PYPDF = False
@@ -23,15 +31,68 @@ except ImportError:
             self._merger.close()
 
 
-def merge_pdfs(pdf_files: List[str], output_path: str) -> bool:
+PageSource = Union[str, bytes]
+
+
+def _is_valid_source(source: PageSource) -> bool:
+    if isinstance(source, bytes):
+        return len(source) > 0
+    return bool(source and source.strip())
+
+
+def _as_readable(source: PageSource):
+    """内存中的版面数据包装为流，文件路径原样返回"""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def source_size(source: PageSource) -> int:
+    if isinstance(source, bytes):
+        return len(source)
+    return os.path.getsize(source)
+
+
+@dataclass
+class OptimizeResult:
+    bytes_before: int
+    bytes_after: int
+    duplicates: int = 0
+    linearized: bool = False
+    
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def merge_pdfs(
+    pdf_files: List[PageSource],
+    output_path: str,
+    streaming: bool = False,
+    optimize: bool = False
+) -> bool:
+    """合并多个PDF
+
+    Args:
+        pdf_files: PDF 文件路径或内存中的 PDF 数据列表
+        output_path: 输出PDF路径
+        streaming: 流式合并，逐页写入输出文件，内存占用不随总页数增长
+        optimize: 合并时去重相同的对象和流并重新压缩 (隐含流式合并)
+
+    Returns:
+        bool: 是否成功
+    """
     if not pdf_files:
         return False
     
+    if (streaming or optimize) and HAS_PYPDF:
+        return _merge_pdfs_streaming(pdf_files, output_path, optimize) is not None
+    
     merger = PdfWriter()
     try:
         for pdf_file in pdf_files:
-            if pdf_file and pdf_file.strip():
-                merger.append(pdf_file)
+            if _is_valid_source(pdf_file):
+                merger.append(_as_readable(pdf_file))
         merger.write(output_path)
         merger.close()
         return True
@@ -43,18 +104,109 @@ def merge_pdfs(pdf_files: List[str], output_path: str) -> bool:
         raise e
 
 
-def merge_pdfs_sorted(pdf_files: List[Tuple[int, str]], output_path: str) -> bool:
+def _merge_pdfs_streaming(pdf_files: List[PageSource], output_path: str, optimize: bool = False):
+    merger = StreamingPdfMerger(output_path, dedup=optimize, recompress=optimize)
+    try:
+        for pdf_file in pdf_files:
+            if _is_valid_source(pdf_file):
+                with tracer.span("pypdf.copy_pages", "pdf"):
+                    merger.append(_as_readable(pdf_file))
+        merger.close()
+        return merger.stats
+    except Exception as e:
+        merger.abort()
+        raise e
+
+
+def merge_pdfs_sorted(
+    pdf_files: List[Tuple[int, PageSource]],
+    output_path: str,
+    streaming: bool = False,
+    optimize: bool = False
+) -> bool:
     sorted_files = sorted(pdf_files, key=lambda x: x[0])
     file_paths = [f[1] for f in sorted_files]
-    return merge_pdfs(file_paths, output_path)
+    return merge_pdfs(file_paths, output_path, streaming=streaming, optimize=optimize)
+
+
+def linearize_pdf(pdf_path: str) -> bool:
+    """线性化 PDF (Fast Web View)，首页无需读完整个文件即可显示
+
+    依赖 qpdf 命令行工具，未安装时返回 False。
+    """
+    qpdf = shutil.which("qpdf")
+    if not qpdf:
+        return False
+    
+    part_path = pdf_path + ".part"
+    try:
+        result = subprocess.run(
+            [qpdf, "--linearize", pdf_path, part_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        # qpdf 返回 3 表示成功但有警告
+        if result.returncode in (0, 3) and os.path.exists(part_path):
+            os.replace(part_path, pdf_path)
+            return True
+    except OSError:
+        pass
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    return False
 
 
-def merge_images_to_pdf(image_files: List[Tuple[int, str]], output_path: str) -> bool:
+def optimize_pdf(input_path: str, output_path: str = None, linearize: bool = False) -> OptimizeResult:
+    """优化已有的 PDF：去重相同的对象和流、重新压缩，可选线性化
+
+    Args:
+        input_path: 输入PDF路径
+        output_path: 输出PDF路径，为空时原地替换
+        linearize: 是否线性化 (需要 qpdf)
+
+    Returns:
+        OptimizeResult 优化前后的大小
+    """
+    output_path = output_path or input_path
+    bytes_before = os.path.getsize(input_path)
+    if not HAS_PYPDF:
+        return OptimizeResult(bytes_before=bytes_before, bytes_after=bytes_before)
+    
+    temp_path = output_path + ".optimized"
+    stats = _merge_pdfs_streaming([input_path], temp_path, optimize=True)
+    os.replace(temp_path, output_path)
+    
+    linearized = linearize and linearize_pdf(output_path)
+    return OptimizeResult(
+        bytes_before=bytes_before,
+        bytes_after=os.path.getsize(output_path),
+        duplicates=stats.duplicates,
+        linearized=linearized
+    )
+
+
+def merge_images_to_pdf(
+    image_files: List[Tuple[int, PageSource]],
+    output_path: str,
+    workers: int = 1,
+    max_side: int = 0,
+    quality: int = 95,
+    profile: Optional[ImageProfile] = None
+) -> bool:
     """将JPG图片合并为PDF
+
+    RGB/灰度 JPEG 直接以原始字节嵌入 (DCTDecode)，不解码、不重新压缩，
+    也不生成中间 PDF 文件；其他格式或超过 max_side 的图片需要解码转换，
+    workers 大于 1 时这些图片在进程池中并行转换，按页码顺序写入。
     
     Args:
-        image_files: 图片文件列表 [(页码, 文件路径), ...]
+        image_files: 图片列表 [(页码, 文件路径或图片数据), ...]
         output_path: 输出PDF路径
+        workers: 转换进程数，1 为当前线程转换，0 为全部 CPU 核心
+        max_side: 最长边像素上限 (0 表示不限制)
+        quality: 转换时的 JPEG 质量
+        profile: 输出质量配置，页面宽度取其 page_width_mm；非存档配置时所有页面
+            按其 DPI 缩小并重新编码。未指定时页面大小按 100 DPI 由像素换算
         
     Returns:
         bool: 是否成功
@@ -63,48 +215,65 @@ def merge_images_to_pdf(image_files: List[Tuple[int, str]], output_path: str) ->
         return False
     
     sorted_files = sorted(image_files, key=lambda x: x[0])
+    sorted_files = [
+        (n, p) for n, p in sorted_files
+        if p and (isinstance(p, bytes) or os.path.exists(p))
+    ]
+    if not sorted_files:
+        return False
     
-    merger = PdfWriter()
-    temp_pdfs = []
+    max_width = 0
+    if profile and not profile.is_passthrough:
+        probes = [None] * len(sorted_files)
+        quality = profile.quality or quality
+        max_width = profile.max_width
+    else:
+        probes = [probe_jpeg(p, max_side) for _, p in sorted_files]
+    convert_indexes = [i for i, info in enumerate(probes) if info is None]
+    convert_args = (quality, max_side, max_width)
+    
+    pool = None
+    if len(convert_indexes) > 1 and workers != 1:
+        workers = resolve_workers(workers)
+        if workers > 1:
+            pool = get_process_pool(workers)
+    
+    # 同时在途的转换任务数有上限，限制已编码但尚未写出的数据量
+    window = resolve_workers(workers) * 2
+    pending = {}
+    next_submit = 0
+    
+    def submit_ahead():
+        nonlocal next_submit
+        while pool and next_submit < len(convert_indexes) and len(pending) < window:
+            index = convert_indexes[next_submit]
+            pending[index] = pool.submit(convert_image, sorted_files[index][1], *convert_args)
+            next_submit += 1
     
+    writer = ImagePdfWriter(output_path, page_width_mm=profile.page_width_mm if profile else 0)
     try:
-        for page_num, img_path in sorted_files:
-            if not img_path or not os.path.exists(img_path):
-                continue
-            
-            img = Image.open(img_path)
-            
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            pdf_path = img_path.replace('.jpg', '.pdf').replace('.jpeg', '.pdf')
-            img.save(pdf_path, 'PDF', resolution=100.0)
-            temp_pdfs.append(pdf_path)
-        
-        if not temp_pdfs:
-            return False
-        
-        for pdf_path in temp_pdfs:
-            merger.append(pdf_path)
-        
-        merger.write(output_path)
-        merger.close()
-        
-        for pdf_path in temp_pdfs:
-            try:
-                os.remove(pdf_path)
-            except:
-                pass
-        
+        for index, (page_num, img_path) in enumerate(sorted_files):
+            submit_ahead()
+            info = probes[index]
+            if info is not None:
+                with tracer.span("jpeg.embed", "pdf", page=page_num):
+                    if isinstance(img_path, bytes):
+                        writer.add_jpeg(img_path, *info)
+                    else:
+                        with open(img_path, 'rb') as f:
+                            writer.add_jpeg(f.read(), *info)
+            elif pool:
+                with tracer.span("pil.convert.wait", "pil", page=page_num):
+                    result = pending.pop(index).result()
+                writer.add_jpeg(*result)
+            else:
+                with tracer.span("pil.convert", "pil", page=page_num):
+                    result = convert_image(img_path, *convert_args)
+                writer.add_jpeg(*result)
+        writer.close()
         return True
     except Exception as e:
-        try:
-            merger.close()
-        except:
-            pass
-        for pdf_path in temp_pdfs:
-            try:
-                os.remove(pdf_path)
-            except:
-                pass
+        for future in pending.values():
+            future.cancel()
+        writer.abort()
         raise e
@@ -0,0 +1,326 @@
+# -*- coding: UTF-8 -*-
+"""
+底层 PDF 写出工具
+
+按顺序把对象直接写入输出文件，只在内存中保留交叉引用表偏移，
+用于图片直接嵌入 PDF 等不需要 pypdf 中间对象的场景。
+"""
+import io
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from PIL import Image
+
+# 可以不经解码直接以 DCTDecode 嵌入的 JPEG 色彩模式
+JPEG_PASSTHROUGH_MODES = {
+    "RGB": "DeviceRGB",
+    "L": "DeviceGray",
+}
+
+
+class PdfObjectWriter:
+    """顺序写出 PDF 间接对象并生成交叉引用表"""
+
+    def __init__(self, fp: BinaryIO, next_id: int = 1, offset: int = 0):
+        self._fp = fp
+        self._offset = offset
+        self._next_id = next_id
+        self._xref: Dict[int, int] = {}
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    def write_raw(self, data: bytes):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    def write_header(self, version: str = "1.4"):
+        self.write_raw(b"%PDF-" + version.encode("ascii") + b"\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def release(self, obj_id: int):
+        """归还最后分配且尚未写出的编号，交叉引用表中不留下没有对象的编号"""
+        if obj_id != self._next_id - 1 or obj_id in self._xref:
+            raise ValueError(f"只能归还最后分配且尚未写出的编号: {obj_id}")
+        self._next_id -= 1
+
+    def write_object(self, obj_id: int, body: bytes):
+        self._xref[obj_id] = self._offset
+        self.write_raw(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def write_stream(self, obj_id: int, entries: bytes, data: bytes):
+        """写出流对象
+
+        Args:
+            obj_id: 对象编号
+            entries: 字典内容 (不含 << >> 和 /Length)
+            data: 已编码的流数据
+        """
+        self._xref[obj_id] = self._offset
+        self.write_raw(
+            b"%d 0 obj\n<< " % obj_id + entries + b" /Length %d >>\nstream\n" % len(data)
+        )
+        self.write_raw(data)
+        self.write_raw(b"\nendstream\nendobj\n")
+
+    def write_trailer(self, root_id: int, prev: Optional[int] = None, file_id: Optional[str] = None) -> int:
+        """写出交叉引用表和尾部
+
+        Args:
+            root_id: 文档目录的对象号
+            prev: 增量更新时上一个交叉引用表的偏移
+            file_id: 文件标识 (十六进制)，写入 /ID
+
+        Returns:
+            交叉引用表的起始偏移
+        """
+        xref_offset = self._offset
+        lines = [b"xref\n"]
+        ids = sorted(self._xref)
+        if prev is None:
+            lines.append(b"0 1\n0000000000 65535 f \n")
+
+        # 按连续编号分段输出
+        start = 0
+        while start < len(ids):
+            end = start
+            while end + 1 < len(ids) and ids[end + 1] == ids[end] + 1:
+                end += 1
+            lines.append(b"%d %d\n" % (ids[start], end - start + 1))
+            for obj_id in ids[start:end + 1]:
+                lines.append(b"%010d 00000 n \n" % self._xref[obj_id])
+            start = end + 1
+
+        trailer = b"trailer\n<< /Size %d /Root %d 0 R" % (self._next_id, root_id)
+        if prev is not None:
+            trailer += b" /Prev %d" % prev
+        if file_id is not None:
+            trailer += b" /ID [<%s> <%s>]" % (file_id.encode("ascii"), file_id.encode("ascii"))
+        trailer += b" >>\nstartxref\n%d\n%%%%EOF\n" % xref_offset
+        lines.append(trailer)
+        self.write_raw(b"".join(lines))
+        return xref_offset
+
+
+def _format_number(value: float) -> bytes:
+    return (b"%.4f" % value).rstrip(b"0").rstrip(b".")
+
+
+def _open_image(source: Union[str, bytes]):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+@dataclass
+class ImageProfile:
+    """图片版面的输出质量配置
+
+    输出页面 (MediaBox) 宽 page_width_mm 毫米，高度按图片比例。dpi 和 quality
+    都为 0 时 (存档) 原样嵌入；否则按页面宽度和 dpi 换算出目标像素宽度，
+    缩小超出部分并以 quality 重新编码。
+    """
+    name: str = "archive"
+    dpi: int = 0
+    quality: int = 0
+    page_width_mm: float = 330.0
+
+    @property
+    def is_passthrough(self) -> bool:
+        return not self.dpi and not self.quality
+
+    @property
+    def max_width(self) -> int:
+        if not self.dpi:
+            return 0
+        return int(round(self.dpi * self.page_width_mm / 25.4))
+
+
+def probe_jpeg(source: Union[str, bytes], max_side: int = 0) -> Optional[tuple]:
+    """只读取 JPEG 文件头，判断能否直接嵌入
+
+    Args:
+        source: 图片数据或文件路径
+        max_side: 最长边像素上限，超过时需要缩放 (0 表示不限制)
+
+    Returns:
+        (宽, 高, 色彩空间) 或 None (需要解码转换)
+    """
+    try:
+        with _open_image(source) as img:
+            if img.format != "JPEG":
+                return None
+            color_space = JPEG_PASSTHROUGH_MODES.get(img.mode)
+            if color_space is None:
+                return None
+            width, height = img.size
+            if max_side and max(width, height) > max_side:
+                return None
+            return width, height, color_space
+    except Exception:
+        return None
+
+
+def convert_image(
+    source: Union[str, bytes],
+    quality: int = 95,
+    max_side: int = 0,
+    max_width: int = 0
+) -> tuple:
+    """解码图片并重新编码为 RGB JPEG
+
+    在进程池中执行时只传递路径或数据，返回编码后的结果，不共享状态。
+    需要缩小时先让 JPEG 解码器按 1/2、1/4、1/8 直接输出缩小的图像，
+    再用 Pillow 的 C 实现重采样到目标尺寸，不逐像素处理。
+
+    Args:
+        source: 图片数据或文件路径
+        quality: JPEG 质量
+        max_side: 最长边像素上限，超过时等比缩小 (0 表示不限制)
+        max_width: 宽度像素上限，超过时等比缩小 (0 表示不限制)
+
+    Returns:
+        (JPEG 数据, 宽, 高, 色彩空间, 原始尺寸)
+    """
+    with _open_image(source) as img:
+        source_size = img.size
+        width, height = img.size
+        scale = 1.0
+        if max_side and max(width, height) > max_side:
+            scale = min(scale, max_side / max(width, height))
+        if max_width and width > max_width:
+            scale = min(scale, max_width / width)
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        if scale < 1.0:
+            img.draft("RGB", target)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != target and scale < 1.0:
+            img = img.resize(target, Image.LANCZOS, reducing_gap=2.0)
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=quality, optimize=True)
+        width, height = img.size
+    return buffer.getvalue(), width, height, "DeviceRGB", source_size
+
+
+class ImagePdfWriter:
+    """把 JPEG 数据直接作为 DCTDecode 图像写成 PDF，每张图片一页
+
+    先写入 ``<output>.part``，关闭时再替换为目标文件，避免中断后留下
+    不完整的 PDF 被当作已下载。
+    """
+
+    def __init__(self, output_path: str, resolution: float = 100.0, page_width_mm: float = 0):
+        """
+        Args:
+            resolution: 按像素换算页面大小时的 DPI
+            page_width_mm: 页面宽度 (毫米)，高度按图片比例；0 时按 resolution 换算
+        """
+        self.output_path = output_path
+        self.resolution = resolution
+        self.page_width_mm = page_width_mm
+        self._part_path = output_path + ".part"
+        self._fp = open(self._part_path, "wb")
+        self._writer = PdfObjectWriter(self._fp)
+        self._writer.write_header()
+        self._catalog_id = self._writer.reserve()
+        self._pages_id = self._writer.reserve()
+        self._page_ids: List[int] = []
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def add_jpeg(
+        self,
+        data: bytes,
+        width: int,
+        height: int,
+        color_space: str = "DeviceRGB",
+        source_size: Optional[tuple] = None
+    ):
+        """添加一页 JPEG
+
+        Args:
+            source_size: 缩放前的像素尺寸，页面大小按它计算，
+                使不同质量配置的输出页面尺寸一致
+        """
+        writer = self._writer
+        image_id = writer.reserve()
+        content_id = writer.reserve()
+        page_id = writer.reserve()
+
+        writer.write_stream(
+            image_id,
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /%s /BitsPerComponent 8 /Filter /DCTDecode"
+            % (width, height, color_space.encode("ascii")),
+            data,
+        )
+
+        source_width, source_height = source_size or (width, height)
+        if self.page_width_mm:
+            width_pt = self.page_width_mm * 72.0 / 25.4
+            height_pt = width_pt * source_height / source_width
+        else:
+            width_pt = source_width * 72.0 / self.resolution
+            height_pt = source_height * 72.0 / self.resolution
+        page_width = _format_number(width_pt)
+        page_height = _format_number(height_pt)
+        writer.write_stream(
+            content_id,
+            b"",
+            b"q " + page_width + b" 0 0 " + page_height + b" 0 0 cm /Im0 Do Q",
+        )
+        writer.write_object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 " % self._pages_id
+            + page_width + b" " + page_height
+            + b"] /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (image_id, content_id),
+        )
+        self._page_ids.append(page_id)
+
+    def add_image(self, data: bytes):
+        """添加一张图片，能直接嵌入的 JPEG 不做解码"""
+        info = probe_jpeg(data)
+        if info is None:
+            self.add_jpeg(*convert_image(data))
+        else:
+            self.add_jpeg(data, *info)
+
+    def close(self):
+        writer = self._writer
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        writer.write_object(
+            self._pages_id,
+            b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self._page_ids),
+        )
+        writer.write_object(
+            self._catalog_id,
+            b"<< /Type /Catalog /Pages %d 0 R >>" % self._pages_id,
+        )
+        writer.write_trailer(self._catalog_id)
+        self._fp.close()
+        os.replace(self._part_path, self.output_path)
+
+    def abort(self):
+        try:
+            self._fp.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self._part_path)
+        except OSError:
+            pass
@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+"""
+共享进程池
+
+CPU 密集的阶段 (图片解码/编码、HTML 解析、合并等) 共用一个惰性创建的
+进程池，避免每次合并都重新启动子进程。
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+# 按进程数各保留一个进程池：其他线程可能正在向旧的池提交任务，
+# 进程数变化时不能关闭它，只在退出时统一关闭
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def resolve_workers(workers: int) -> int:
+    """0 或负数表示使用全部 CPU 核心"""
+    if workers and workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def get_process_pool(workers: int = 0) -> ProcessPoolExecutor:
+    """获取指定进程数的共享进程池"""
+    workers = resolve_workers(workers)
+    with _lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+
+def run_in_process(fn: Callable[..., T], *args, workers: int = 0) -> T:
+    """在共享进程池中执行 fn(*args) 并等待结果
+
+    调用线程在等待时释放 GIL，其他线程的网络 I/O 不受影响。fn 和参数都必须
+    可以 pickle (模块级函数)。
+    """
+    return get_process_pool(workers).submit(fn, *args).result()
+
+
+def shutdown_process_pool():
+    """关闭全部进程池，只应在没有任务运行时调用 (退出、基准测试之间)"""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+atexit.register(shutdown_process_pool)
@@ -0,0 +1,183 @@
+# -*- coding: UTF-8 -*-
+"""
+性能剖析模式
+
+开启后按期、按版记录耗时区间 (获取信息 → 下载 → 校验 → 合并) 和每个
+HTTP 请求，结束时写出 Chrome trace 格式的 JSON，可在 chrome://tracing
+或 https://ui.perfetto.dev 中打开。还可以对抽样的一期报纸收集 cProfile
+和 tracemalloc 数据，分别写入同名的 .pstats 和 trace 文件的 metadata。
+
+未开启时 span() 返回共享的空上下文，开销只有一次属性判断。
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+# tracemalloc 汇总中保留的分配位置条数
+TRACEMALLOC_TOP = 25
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_cat", "_args", "_start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._tracer.add_event(self._name, self._cat, self._start, time.perf_counter() - self._start, self._args)
+        return False
+
+
+class Tracer:
+    """记录耗时区间并导出为 Chrome trace"""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._events = []
+        self._origin = time.perf_counter()
+        self._metadata = {}
+        self._sample_pending = False
+        self._collect_cprofile = False
+        self._collect_tracemalloc = False
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self, cprofile: bool = False, tracemalloc_enabled: bool = False):
+        """开始记录
+
+        Args:
+            cprofile: 对抽样的一期收集 cProfile 数据
+            tracemalloc_enabled: 对抽样的一期收集内存分配快照
+        """
+        with self._lock:
+            self._events = []
+            self._metadata = {"started_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            self._origin = time.perf_counter()
+            self._profile = None
+        self._collect_cprofile = cprofile
+        self._collect_tracemalloc = tracemalloc_enabled
+        self._sample_pending = cprofile or tracemalloc_enabled
+        self.enabled = True
+
+    def span(self, name: str, cat: str = "pipeline", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def add_event(self, name: str, cat: str, start: float, duration: float, args: Optional[dict] = None):
+        """添加一个已结束的区间
+
+        Args:
+            start: time.perf_counter() 时间
+            duration: 持续秒数
+        """
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def sample(self, label: str):
+        """对开启后的第一期报纸收集 cProfile / tracemalloc 数据，其余直接执行"""
+        with self._lock:
+            take = self.enabled and self._sample_pending
+            self._sample_pending = False
+        if not take:
+            yield
+            return
+
+        profile = cProfile.Profile() if self._collect_cprofile else None
+        started_tracemalloc = self._collect_tracemalloc and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            sample = {"label": label}
+            if self._collect_tracemalloc and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                sample["tracemalloc"] = {
+                    "current_bytes": current,
+                    "peak_bytes": peak,
+                    "top": [
+                        {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+                        for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+                    ],
+                }
+                if started_tracemalloc:
+                    tracemalloc.stop()
+            with self._lock:
+                self._metadata["sample"] = sample
+                self._profile = profile
+
+    def stop(self, output_path: str) -> list:
+        """停止记录并写出 trace 文件
+
+        Returns:
+            写出的文件路径列表 (trace JSON，有抽样时还有 .pstats)
+        """
+        self.enabled = False
+        self._sample_pending = False
+        with self._lock:
+            events, metadata, profile = self._events, dict(self._metadata), self._profile
+            self._events, self._profile = [], None
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        paths = [output_path]
+        if profile is not None:
+            pstats_path = os.path.splitext(output_path)[0] + ".pstats"
+            profile.dump_stats(pstats_path)
+            metadata["pstats"] = os.path.basename(pstats_path)
+            paths.append(pstats_path)
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms", "metadata": metadata},
+                f, ensure_ascii=False
+            )
+        return paths
+
+
+tracer = Tracer()
@@ -0,0 +1,340 @@
+# -*- coding: UTF-8 -*-
+"""
+全文检索索引
+
+从合并后的每期报纸中提取文字层，按报纸/日期/版面存入 SQLite FTS5 索引
+(trigram 分词，中文无需分词即可检索)。trigram 只能匹配不少于 3 个字符的词，
+每个版面另外把其中出现过的单字和相邻两字存入 grams 表，1~2 个字的词
+(经济、两会) 也走索引。没有 trigram 分词器的旧版 SQLite 中所有词都先按
+grams 表筛选候选版面，再对候选版面做子串校验。
+
+已索引且文件未变化的报纸跳过，可以在每次下载后增量加入。索引文件默认保存在
+存档目录下的 search_index.db。
+"""
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from pypdf import PdfReader
+
+from .storage import StorageManager
+
+INDEX_FILENAME = "search_index.db"
+
+# trigram 分词只能用索引匹配不少于 3 个字符的词，更短的词由 grams 表匹配
+MIN_MATCH_LENGTH = 3
+
+# grams 表中的词：连续的字母、数字和汉字 (unicode61 分词把其余字符当作分隔符)
+_WORD = re.compile(r"[^\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS editions (
+    id INTEGER PRIMARY KEY,
+    newspaper TEXT NOT NULL,
+    date TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    page_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS editions_paper_date ON editions (newspaper, date);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    text,
+    newspaper UNINDEXED,
+    date UNINDEXED,
+    page UNINDEXED,
+    edition_id UNINDEXED,
+    tokenize = '{tokenizer}'
+)
+"""
+
+# rowid 与 pages 相同；text 是该版面出现过的单字和相邻两字，空格分隔
+GRAMS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS grams USING fts5(
+    text,
+    tokenize = 'unicode61'
+)
+"""
+
+
+@dataclass
+class SearchHit:
+    newspaper: str
+    date: str
+    page: int
+    snippet: str
+    path: str
+
+
+def extract_page_texts(pdf_path: str) -> List[str]:
+    """提取每一版的文字层 (图片版报纸没有文字层，返回空字符串)"""
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        texts = []
+        for page in reader.pages:
+            try:
+                texts.append(page.extract_text() or "")
+            except Exception:
+                texts.append("")
+        return texts
+
+
+def _match_expression(terms: Iterable[str]) -> str:
+    """每个词作为短语，多个词之间为 AND"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def page_grams(text: str) -> str:
+    """版面中出现过的单字和相邻两字 (去重，空格分隔)，存入 grams 表"""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(sorted(grams))
+
+
+def _term_grams(term: str) -> List[str]:
+    """检索词在 grams 表中需要同时出现的单字/两字"""
+    grams = []
+    for word in _WORD.findall(term.lower()):
+        grams.extend(word if len(word) == 1 else (word[i:i + 2] for i in range(len(word) - 1)))
+    return grams
+
+
+def _make_snippet(text: str, term: str, width: int = 16) -> str:
+    """grams 表不能生成摘要，在版面文字中找到第一个词并标出"""
+    pos = text.lower().find(term.lower())
+    if pos < 0:
+        return text[:width * 4]
+    start = max(0, pos - width)
+    end = pos + len(term) + width
+    return (
+        ("…" if start else "") + text[start:pos] + "[" + text[pos:pos + len(term)] + "]"
+        + text[pos + len(term):end] + ("…" if end < len(text) else "")
+    )
+
+
+class SearchIndex:
+    """报纸全文检索索引
+
+    Args:
+        db_path: 索引数据库路径
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.execute(FTS_SCHEMA.format(tokenizer="trigram"))
+        except sqlite3.OperationalError:
+            # SQLite 3.34 之前没有 trigram 分词器
+            self._conn.execute(FTS_SCHEMA.format(tokenizer="unicode61"))
+        # 以已有的表为准 (旧版 SQLite 建立的索引在新版中打开时仍是 unicode61)
+        sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'pages'").fetchone()[0]
+        self._trigram = "trigram" in sql
+        has_grams = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'grams'"
+        ).fetchone() is not None
+        self._conn.execute(GRAMS_SCHEMA)
+        if not has_grams:
+            # 旧版索引没有 grams 表，由已索引的文字补建
+            self._conn.executemany(
+                "INSERT INTO grams (rowid, text) VALUES (?, ?)",
+                ((rowid, page_grams(text)) for rowid, text in
+                 self._conn.execute("SELECT rowid, text FROM pages").fetchall())
+            )
+        self._conn.commit()
+
+    @classmethod
+    def for_storage(cls, storage: StorageManager) -> "SearchIndex":
+        return cls(os.path.join(storage.base_path, INDEX_FILENAME))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_edition(self, newspaper: str, date: str, pdf_path: str) -> int:
+        """把一期报纸加入索引
+
+        文件大小和修改时间与已索引的记录一致时跳过，否则替换旧记录。
+
+        Returns:
+            新索引的版面数，跳过时为 0
+        """
+        pdf_path = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        date = date.replace('-', '')
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, size, mtime FROM editions WHERE path = ?", (pdf_path,)
+            ).fetchone()
+            if row and row[1] == stat.st_size and row[2] == stat.st_mtime:
+                return 0
+
+        texts = extract_page_texts(pdf_path)
+
+        with self._lock, self._conn:
+            if row:
+                self._delete_editions([(row[0],)])
+            cursor = self._conn.execute(
+                "INSERT INTO editions (newspaper, date, path, size, mtime, page_count) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (newspaper, date, pdf_path, stat.st_size, stat.st_mtime, len(texts)),
+            )
+            edition_id = cursor.lastrowid
+            for page_num, text in enumerate(texts, 1):
+                if not text.strip():
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO pages (text, newspaper, date, page, edition_id) VALUES (?, ?, ?, ?, ?)",
+                    (text, newspaper, date, page_num, edition_id),
+                )
+                self._conn.execute(
+                    "INSERT INTO grams (rowid, text) VALUES (?, ?)", (cursor.lastrowid, page_grams(text))
+                )
+        return len(texts)
+
+    def _delete_editions(self, edition_ids: List[tuple]):
+        """删除报纸期的全部记录 (调用方持有锁并在事务中)"""
+        self._conn.executemany(
+            "DELETE FROM grams WHERE rowid IN (SELECT rowid FROM pages WHERE edition_id = ?)", edition_ids
+        )
+        self._conn.executemany("DELETE FROM pages WHERE edition_id = ?", edition_ids)
+        self._conn.executemany("DELETE FROM editions WHERE id = ?", edition_ids)
+
+    def index_archive(self, storage: StorageManager, newspaper: Optional[str] = None) -> int:
+        """索引存档目录中所有 (或指定报纸) 尚未索引的存档版
+
+        Returns:
+            新索引的报纸期数
+        """
+        if newspaper:
+            newspapers = [newspaper]
+        elif os.path.isdir(storage.base_path):
+            newspapers = sorted(
+                name for name in os.listdir(storage.base_path)
+                if os.path.isdir(os.path.join(storage.base_path, name))
+            )
+        else:
+            newspapers = []
+
+        count = 0
+        for name in newspapers:
+            for date, path in storage.list_editions(name):
+                if self.add_edition(name, date, path):
+                    count += 1
+        return count
+
+    def remove_missing(self) -> int:
+        """删除文件已不存在的索引记录
+
+        Returns:
+            删除的报纸期数
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id, path FROM editions").fetchall()
+        missing = [(edition_id,) for edition_id, path in rows if not os.path.exists(path)]
+        if missing:
+            with self._lock, self._conn:
+                self._delete_editions(missing)
+        return len(missing)
+
+    def search(
+        self,
+        query: str,
+        newspaper: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: int = 50
+    ) -> List[SearchHit]:
+        """检索包含全部关键词 (空格分隔) 的版面，按相关度排序
+
+        Args:
+            query: 关键词
+            newspaper: 只检索指定报纸
+            date_from: 起始日期 (YYYY-MM-DD 或 yyyymmdd，含)
+            date_to: 结束日期 (含)
+            limit: 最多返回条数
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        # trigram 匹配的词、grams 表中需要同时出现的单字/两字、需要逐个版面校验的子串
+        match_terms = []
+        grams = set()
+        substrings = []
+        for term in terms:
+            if self._trigram and len(term) >= MIN_MATCH_LENGTH:
+                match_terms.append(term)
+                continue
+            grams.update(_term_grams(term))
+            if len(term) > 2 or not _WORD.fullmatch(term):
+                # 单字/两字只能筛选候选版面，更长或含分隔符的词还要确认整体出现
+                substrings.append(term)
+
+        conditions = []
+        params = []
+        if match_terms:
+            conditions.append("pages MATCH ?")
+            params.append(_match_expression(match_terms))
+        if grams:
+            conditions.append("pages.rowid IN (SELECT rowid FROM grams WHERE grams MATCH ?)")
+            params.append(_match_expression(sorted(grams)))
+        for term in substrings:
+            conditions.append("pages.text LIKE ? ESCAPE '\\'")
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if newspaper:
+            conditions.append("editions.newspaper = ?")
+            params.append(newspaper)
+        if date_from:
+            conditions.append("editions.date >= ?")
+            params.append(date_from.replace('-', ''))
+        if date_to:
+            conditions.append("editions.date <= ?")
+            params.append(date_to.replace('-', ''))
+
+        if match_terms:
+            snippet = "snippet(pages, 0, '[', ']', '…', 16)"
+            order = "ORDER BY rank"
+        else:
+            snippet = "pages.text"
+            order = "ORDER BY editions.date DESC, pages.page"
+
+        sql = (
+            f"SELECT editions.newspaper, editions.date, pages.page, {snippet}, editions.path "
+            f"FROM pages JOIN editions ON editions.id = pages.edition_id "
+            f"WHERE {' AND '.join(conditions)} {order} LIMIT ?"
+        )
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            SearchHit(
+                newspaper=row[0], date=row[1], page=int(row[2]),
+                snippet=row[3] if match_terms else _make_snippet(row[3], terms[0]),
+                path=row[4]
+            )
+            for row in rows
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            editions, pages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(page_count), 0) FROM editions"
+            ).fetchone()
+        return {"editions": editions, "pages": pages}
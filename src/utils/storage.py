@@ -4,30 +4,40 @@
 """
 import os
 import shutil
-from typing import Optional
+from typing import List, Optional, Tuple
+
+from .metrics import metrics
 
 class StorageManager:
     def __init__(self, base_path: str):
         self.base_path = os.path.abspath(base_path)
     
+    @metrics.timed("newspaper_storage_seconds", op="ensure_output_dir")
     def ensure_output_dir(self, newspaper: str, date: str) -> str:
         date_str = date.replace('-', '')
         output_dir = os.path.join(self.base_path, newspaper, date_str)
         os.makedirs(output_dir, exist_ok=True)
         return output_dir
     
-    def build_output_path(self, newspaper: str, date: str) -> str:
-        output_dir = self.ensure_output_dir(newspaper, date)
+    def edition_path(self, newspaper: str, date: str, suffix: str = "") -> str:
+        """一期报纸的存档路径 (不创建目录)"""
         date_str = date.replace('-', '')
-        filename = f"{newspaper}_{date_str}.pdf"
-        return os.path.join(output_dir, filename)
+        filename = f"{newspaper}_{date_str}{suffix}.pdf"
+        return os.path.join(self.base_path, newspaper, date_str, filename)
     
+    def build_output_path(self, newspaper: str, date: str, suffix: str = "") -> str:
+        """一期报纸的存档路径，并创建所在目录 (写入前使用)"""
+        self.ensure_output_dir(newspaper, date)
+        return self.edition_path(newspaper, date, suffix)
+    
+    @metrics.timed("newspaper_storage_seconds", op="get_temp_dir")
     def get_temp_dir(self, newspaper: str, date: str) -> str:
         output_dir = self.ensure_output_dir(newspaper, date)
         temp_dir = os.path.join(output_dir, 'temp')
         os.makedirs(temp_dir, exist_ok=True)
         return temp_dir
     
+    @metrics.timed("newspaper_storage_seconds", op="cleanup_temp_dir")
     def cleanup_temp_dir(self, newspaper: str, date: str):
         try:
             temp_dir = os.path.join(self.base_path, newspaper, date.replace('-', ''), 'temp')
@@ -36,16 +46,31 @@ class StorageManager:
         except Exception:
             pass
     
-    def file_exists(self, newspaper: str, date: str) -> bool:
-        output_path = self.build_output_path(newspaper, date)
-        return os.path.exists(output_path)
+    def file_exists(self, newspaper: str, date: str, suffix: str = "") -> bool:
+        return os.path.exists(self.edition_path(newspaper, date, suffix))
+    
+    @metrics.timed("newspaper_storage_seconds", op="list_editions")
+    def list_editions(self, newspaper: str) -> List[Tuple[str, str]]:
+        """已下载的存档版报纸 [(yyyymmdd, 文件路径), ...]，按日期排序"""
+        paper_dir = os.path.join(self.base_path, newspaper)
+        if not os.path.isdir(paper_dir):
+            return []
+        editions = []
+        for name in sorted(os.listdir(paper_dir)):
+            if len(name) != 8 or not name.isdigit():
+                continue
+            path = os.path.join(paper_dir, name, f"{newspaper}_{name}.pdf")
+            if os.path.isfile(path):
+                editions.append((name, path))
+        return editions
     
     def get_file_size(self, filepath: str) -> int:
         if os.path.exists(filepath):
             return os.path.getsize(filepath)
         return 0
     
-    def format_size(self, size_bytes: int) -> str:
+    @staticmethod
+    def format_size(size_bytes: int) -> str:
         for unit in ['B', 'KB', 'MB', 'GB']:
             if size_bytes < 1024:
                 return f"{size_bytes:.2f} {unit}"
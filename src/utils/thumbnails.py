@@ -0,0 +1,262 @@
+# -*- coding: UTF-8 -*-
+"""
+缩略图缓存
+
+每期报纸生成逐版缩略图和一张头版预览图，保存在存档目录下的
+.thumbnails/<报纸>_<yyyymmdd>/ 中，浏览存档时无需打开 PDF。
+缓存总大小超过上限时按最近访问时间淘汰。
+
+有 PyMuPDF 时渲染整个页面；否则取页面中最大的嵌入图片
+(图片版报纸即版面本身)，没有图片的版面不生成缩略图。
+"""
+import io
+import json
+import os
+import shutil
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple, Union
+
+from PIL import Image
+from pypdf import PdfReader
+
+from .process_pool import get_process_pool, resolve_workers
+from .storage import StorageManager
+
+try:
+    import fitz
+    HAS_FITZ = True
+except ImportError:
+    HAS_FITZ = False
+
+THUMBNAIL_DIRNAME = ".thumbnails"
+META_FILENAME = "meta.json"
+PREVIEW_FILENAME = "preview.jpg"
+THUMBNAIL_QUALITY = 75
+
+
+@dataclass
+class EditionThumbnails:
+    preview: Optional[str] = None
+    pages: List[Optional[str]] = field(default_factory=list)
+
+
+def _downscale(image: Image.Image, max_side: int) -> Image.Image:
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=2.0)
+    return image
+
+
+def _render_with_fitz(pdf_path: str, max_side: int) -> Iterator[Optional[Image.Image]]:
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            scale = max_side / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            yield Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def _largest_embedded_images(pdf_path: str) -> Iterator[Optional[Image.Image]]:
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        for page in reader.pages:
+            best = None
+            try:
+                for image_file in page.images:
+                    image = image_file.image
+                    if best is None or image.width * image.height > best.width * best.height:
+                        best = image
+            except Exception:
+                best = None
+            yield best
+
+
+def render_pages(pdf_path: str, max_side: int) -> Iterator[Optional[Image.Image]]:
+    """逐版生成不超过 max_side 的图片，无法渲染的版面为 None"""
+    images = _render_with_fitz(pdf_path, max_side) if HAS_FITZ else _largest_embedded_images(pdf_path)
+    for image in images:
+        yield _downscale(image, max_side) if image is not None else None
+
+
+def _open_page_image(source: Union[str, bytes], max_side: int) -> Optional[Image.Image]:
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        # JPEG 按目标尺寸解码，避免完整解码大幅版面
+        image.draft("RGB", (max_side, max_side))
+        return _downscale(image, max_side)
+    except Exception:
+        return None
+
+
+class ThumbnailCache:
+    """按期保存缩略图的 LRU 缓存
+
+    Args:
+        cache_dir: 缓存目录
+        max_bytes: 缓存总大小上限，0 表示不限制
+        size: 逐版缩略图最长边像素
+        preview_size: 头版预览图最长边像素
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 0, size: int = 200, preview_size: int = 800):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.preview_size = preview_size
+
+    @classmethod
+    def for_storage(cls, storage: StorageManager, **kwargs) -> "ThumbnailCache":
+        return cls(os.path.join(storage.base_path, THUMBNAIL_DIRNAME), **kwargs)
+
+    def edition_dir(self, pdf_path: str) -> str:
+        key = os.path.splitext(os.path.basename(pdf_path))[0]
+        return os.path.join(self.cache_dir, key)
+
+    def has(self, pdf_path: str) -> bool:
+        return self._load_meta(pdf_path) is not None
+
+    def get(self, pdf_path: str) -> Optional[EditionThumbnails]:
+        """读取一期的缩略图路径并记录访问时间"""
+        meta = self._load_meta(pdf_path)
+        if meta is None:
+            return None
+        edition_dir = self.edition_dir(pdf_path)
+        try:
+            os.utime(edition_dir)
+        except OSError:
+            pass
+
+        def _path(name):
+            return os.path.join(edition_dir, name) if name else None
+
+        return EditionThumbnails(
+            preview=_path(meta.get("preview")),
+            pages=[_path(name) for name in meta.get("pages", [])],
+        )
+
+    def generate(self, pdf_path: str) -> EditionThumbnails:
+        """从合并后的 PDF 生成缩略图"""
+        self._write(pdf_path, render_pages(pdf_path, self.preview_size))
+        self.evict(keep=self.edition_dir(pdf_path))
+        return self.get(pdf_path)
+
+    def generate_from_pages(self, pdf_path: str, pages: List[Tuple[int, Union[str, bytes]]]) -> EditionThumbnails:
+        """图片版报纸直接用下载的版面图片生成缩略图，不需要再读取 PDF
+
+        Args:
+            pdf_path: 合并后的 PDF 路径
+            pages: [(页码, 文件路径或内存数据), ...]
+        """
+        images = (_open_page_image(source, self.preview_size) for _, source in sorted(pages, key=lambda p: p[0]))
+        self._write(pdf_path, images)
+        self.evict(keep=self.edition_dir(pdf_path))
+        return self.get(pdf_path)
+
+    def _write(self, pdf_path: str, images):
+        edition_dir = self.edition_dir(pdf_path)
+        shutil.rmtree(edition_dir, ignore_errors=True)
+        os.makedirs(edition_dir, exist_ok=True)
+
+        meta = {"source_size": os.path.getsize(pdf_path), "preview": None, "pages": []}
+        for page_num, image in enumerate(images, 1):
+            if image is None:
+                meta["pages"].append(None)
+                continue
+            if meta["preview"] is None:
+                image.save(os.path.join(edition_dir, PREVIEW_FILENAME), "JPEG", quality=THUMBNAIL_QUALITY)
+                meta["preview"] = PREVIEW_FILENAME
+            name = f"page_{page_num:02d}.jpg"
+            _downscale(image, self.size).save(os.path.join(edition_dir, name), "JPEG", quality=THUMBNAIL_QUALITY)
+            meta["pages"].append(name)
+
+        # meta.json 最后写入，作为缩略图完整的标记
+        with open(os.path.join(edition_dir, META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def _load_meta(self, pdf_path: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.edition_dir(pdf_path), META_FILENAME), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 报纸重新下载后缩略图失效
+        if os.path.exists(pdf_path) and os.path.getsize(pdf_path) != meta.get("source_size"):
+            return None
+        return meta
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """按最近访问时间淘汰，直到缓存不超过上限
+
+        Returns:
+            淘汰的期数
+        """
+        if not self.max_bytes or not os.path.isdir(self.cache_dir):
+            return 0
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            entries.append((os.path.getmtime(path), path, size))
+            total += size
+
+        removed = 0
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def missing(self, storage: StorageManager) -> List[str]:
+        """存档中还没有缩略图的报纸路径"""
+        paths = []
+        if not os.path.isdir(storage.base_path):
+            return paths
+        for name in sorted(os.listdir(storage.base_path)):
+            if name.startswith(".") or not os.path.isdir(os.path.join(storage.base_path, name)):
+                continue
+            paths.extend(path for _, path in storage.list_editions(name) if not self.has(path))
+        return paths
+
+    def backfill(self, storage: StorageManager, workers: int = 0) -> int:
+        """为存档中缺少缩略图的报纸并行生成缩略图
+
+        Returns:
+            生成的期数
+        """
+        paths = self.missing(storage)
+        if not paths:
+            return 0
+
+        count = 0
+        if resolve_workers(workers) == 1 or len(paths) == 1:
+            for path in paths:
+                try:
+                    self._write(path, render_pages(path, self.preview_size))
+                    count += 1
+                except Exception:
+                    pass
+        else:
+            pool = get_process_pool(workers)
+            futures = [
+                pool.submit(_generate_in_worker, self.cache_dir, self.size, self.preview_size, path)
+                for path in paths
+            ]
+            for future in as_completed(futures):
+                # 损坏的文件跳过，不影响其他报纸
+                if future.exception() is None:
+                    count += 1
+        self.evict()
+        return count
+
+
+def _generate_in_worker(cache_dir: str, size: int, preview_size: int, pdf_path: str):
+    cache = ThumbnailCache(cache_dir, size=size, preview_size=preview_size)
+    cache._write(pdf_path, render_pages(pdf_path, preview_size))
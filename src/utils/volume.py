@@ -0,0 +1,298 @@
+# -*- coding: UTF-8 -*-
+"""
+合订本
+
+把 <报纸>/<yyyymmdd>/ 下的每日存档版按月或按年合成一个 PDF，每天一个
+书签。已有合订本时只把新的日期以 PDF 增量更新的方式追加到文件末尾，
+不重新读取已收录的日报。收录情况记录在合订本旁的同名 .json 文件中，
+其中的文件标识 (写入每次更新的 /ID) 和文件末尾位置用于确认合订本就是
+记录中的那一版。
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from pypdf.generic import TextStringObject
+
+from .pdf_stream import PdfPageCopier, _serialize
+from .pdf_writer import PdfObjectWriter
+from .storage import StorageManager
+
+STATE_VERSION = 2
+
+# 校验合订本末尾时读取的字节数 (足够容纳最后的 trailer)
+TRAILER_TAIL_BYTES = 512
+
+# 合订本周期 -> 日期 (yyyymmdd) 中作为合订本编号的前缀长度
+PERIOD_KEY_LENGTH = {
+    "month": 6,
+    "year": 4,
+}
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _volume_lock(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _format_day(day: str) -> str:
+    return f"{day[:4]}-{day[4:6]}-{day[6:]}"
+
+
+@dataclass
+class VolumeUpdate:
+    """一次合订本更新的结果"""
+    path: str
+    added: List[str] = field(default_factory=list)
+    rebuilt: bool = False
+    page_count: int = 0
+
+
+class VolumeBuilder:
+    """按月/按年生成并增量更新合订本
+
+    Args:
+        storage: 存储管理器
+        newspaper: 报纸名称 (与存储目录名一致)
+        period: "month" 或 "year"
+    """
+
+    def __init__(self, storage: StorageManager, newspaper: str, period: str = "month"):
+        if period not in PERIOD_KEY_LENGTH:
+            raise ValueError(f"不支持的合订本周期: {period}")
+        self.storage = storage
+        self.newspaper = newspaper
+        self.period = period
+
+    def period_key(self, date: str) -> str:
+        """日期 (YYYY-MM-DD 或 yyyymmdd) 所属的合订本编号，如 202609"""
+        return date.replace('-', '')[:PERIOD_KEY_LENGTH[self.period]]
+
+    @property
+    def volume_dir(self) -> str:
+        return os.path.join(self.storage.base_path, self.newspaper, "volumes")
+
+    def volume_path(self, key: str) -> str:
+        return os.path.join(self.volume_dir, f"{self.newspaper}_{key}.pdf")
+
+    def state_path(self, key: str) -> str:
+        return os.path.join(self.volume_dir, f"{self.newspaper}_{key}.json")
+
+    def included_days(self, key: str) -> List[str]:
+        """合订本已收录的日期 (yyyymmdd)"""
+        state = self._load_state(key)
+        return [day["date"] for day in state["days"]] if state else []
+
+    def pending(self) -> Dict[str, List[str]]:
+        """各合订本尚未收录的日期 {合订本编号: [yyyymmdd, ...]}"""
+        result: Dict[str, List[str]] = {}
+        included: Dict[str, set] = {}
+        for day, _ in self.storage.list_editions(self.newspaper):
+            key = self.period_key(day)
+            if key not in included:
+                included[key] = set(self.included_days(key))
+            if day not in included[key]:
+                result.setdefault(key, []).append(day)
+        return result
+
+    def update_all(self) -> List[VolumeUpdate]:
+        """更新所有有新日报的合订本"""
+        return [self.update(key) for key in self.pending()]
+
+    def update(self, key: str) -> VolumeUpdate:
+        """把 key 对应周期内新下载的日报追加到合订本
+
+        合订本或记录文件缺失、已收录的日报文件有变化时整本重建；
+        上次追加中断留下的多余数据会先截掉。
+        """
+        path = self.volume_path(key)
+        with _volume_lock(path):
+            editions = {
+                day: source for day, source in self.storage.list_editions(self.newspaper)
+                if self.period_key(day) == key
+            }
+            state = self._load_state(key)
+            if state is not None and not self._can_append(path, state, editions):
+                state = None
+
+            if state is None:
+                if not editions:
+                    return VolumeUpdate(path=path)
+                days = sorted(editions)
+                state = self._rebuild(key, [(day, editions[day]) for day in days])
+                self._save_state(key, state)
+                return VolumeUpdate(path=path, added=days, rebuilt=True, page_count=self._page_count(state))
+
+            included = {day["date"] for day in state["days"]}
+            days = sorted(day for day in editions if day not in included)
+            if days:
+                self._append(path, state, [(day, editions[day]) for day in days])
+                self._save_state(key, state)
+            return VolumeUpdate(path=path, added=days, page_count=self._page_count(state))
+
+    @staticmethod
+    def _page_count(state: dict) -> int:
+        return sum(day["page_count"] for day in state["days"])
+
+    def _can_append(self, path: str, state: dict, editions: Dict[str, str]) -> bool:
+        if not os.path.exists(path):
+            return False
+        for day in state["days"]:
+            source = editions.get(day["date"])
+            if source is None or os.path.getsize(source) != day["source_size"]:
+                return False
+
+        size = os.path.getsize(path)
+        if size < state["file_size"]:
+            return False
+        with open(path, "r+b") as f:
+            # 整本重建后、保存记录前中断时，记录仍是旧文件的：不能按它截断新文件
+            if not self._matches_state(f, state):
+                return False
+            if size > state["file_size"]:
+                # 上次追加未完成 (记录文件未更新)，回退到最后一次完整的版本
+                f.truncate(state["file_size"])
+        return True
+
+    @staticmethod
+    def _matches_state(f, state: dict) -> bool:
+        """记录中的文件末尾位置是否正是带有该文件标识的 trailer 结尾"""
+        tail_size = min(state["file_size"], TRAILER_TAIL_BYTES)
+        f.seek(state["file_size"] - tail_size)
+        tail = f.read(tail_size)
+        file_id = state["file_id"].encode("ascii")
+        return (
+            tail.endswith(b"startxref\n%d\n%%%%EOF\n" % state["startxref"])
+            and b"/ID [<" + file_id + b">" in tail
+        )
+
+    def _rebuild(self, key: str, editions: List[tuple]) -> dict:
+        path = self.volume_path(key)
+        os.makedirs(self.volume_dir, exist_ok=True)
+        part_path = path + ".part"
+        try:
+            with open(part_path, "wb") as fp:
+                writer = PdfObjectWriter(fp)
+                writer.write_header(version="1.7")
+                state = {
+                    "version": STATE_VERSION,
+                    "catalog_id": writer.reserve(),
+                    "pages_id": writer.reserve(),
+                    "outlines_id": writer.reserve(),
+                    "file_id": os.urandom(16).hex(),
+                    "days": [],
+                }
+                self._write_days(writer, state, editions)
+                writer.write_object(
+                    state["catalog_id"],
+                    b"<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R /PageMode /UseOutlines >>"
+                    % (state["pages_id"], state["outlines_id"]),
+                )
+                state["startxref"] = writer.write_trailer(state["catalog_id"], file_id=state["file_id"])
+                state["next_id"] = writer.next_id
+                state["file_size"] = writer.offset
+            os.replace(part_path, path)
+        except Exception:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+        return state
+
+    def _append(self, path: str, state: dict, editions: List[tuple]):
+        """以增量更新的方式追加：新对象和交叉引用表写在文件末尾，/Prev 指向上一版"""
+        with open(path, "r+b") as fp:
+            fp.seek(state["file_size"])
+            writer = PdfObjectWriter(fp, next_id=state["next_id"], offset=state["file_size"])
+            try:
+                self._write_days(writer, state, editions)
+                state["startxref"] = writer.write_trailer(
+                    state["catalog_id"], prev=state["startxref"], file_id=state["file_id"])
+            except Exception:
+                fp.truncate(state["file_size"])
+                raise
+        state["next_id"] = writer.next_id
+        state["file_size"] = writer.offset
+
+    def _write_days(self, writer: PdfObjectWriter, state: dict, editions: List[tuple]):
+        """写入新日期的页面，并重写页面树根节点和书签"""
+        copier = PdfPageCopier(writer, dedup=True)
+        days = list(state["days"])
+        for day, source in editions:
+            node_id = writer.reserve()
+            page_ids = copier.copy_pages(source, node_id)
+            if not page_ids:
+                # 没有页面时不会分配其他编号，归还页面树节点的编号
+                writer.release(node_id)
+                continue
+            kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+            writer.write_object(
+                node_id,
+                b"<< /Type /Pages /Parent %d 0 R /Kids [" % state["pages_id"] + kids
+                + b"] /Count %d >>" % len(page_ids),
+            )
+            days.append({
+                "date": day,
+                "pages_id": node_id,
+                "outline_id": writer.reserve(),
+                "first_page_id": page_ids[0],
+                "page_count": len(page_ids),
+                "source_size": os.path.getsize(source),
+            })
+
+        # 补下载的早期日期按日期插入，页面树和书签始终按日期排列
+        days.sort(key=lambda item: item["date"])
+        state["days"] = days
+
+        kids = b" ".join(b"%d 0 R" % day["pages_id"] for day in days)
+        writer.write_object(
+            state["pages_id"],
+            b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % self._page_count(state),
+        )
+        self._write_outlines(writer, state)
+
+    @staticmethod
+    def _write_outlines(writer: PdfObjectWriter, state: dict):
+        days = state["days"]
+        outlines_id = state["outlines_id"]
+        for i, day in enumerate(days):
+            title = _serialize(TextStringObject(_format_day(day["date"])))
+            body = b"<< /Title " + title + b" /Parent %d 0 R /Dest [%d 0 R /Fit]" % (
+                outlines_id, day["first_page_id"]
+            )
+            if i > 0:
+                body += b" /Prev %d 0 R" % days[i - 1]["outline_id"]
+            if i + 1 < len(days):
+                body += b" /Next %d 0 R" % days[i + 1]["outline_id"]
+            writer.write_object(day["outline_id"], body + b" >>")
+
+        if days:
+            body = b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>" % (
+                days[0]["outline_id"], days[-1]["outline_id"], len(days)
+            )
+        else:
+            body = b"<< /Type /Outlines /Count 0 >>"
+        writer.write_object(outlines_id, body)
+
+    def _load_state(self, key: str) -> Optional[dict]:
+        try:
+            with open(self.state_path(key), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("version") != STATE_VERSION:
+            return None
+        return state
+
+    def _save_state(self, key: str, state: dict):
+        path = self.state_path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,259 @@
+# -*- coding: UTF-8 -*-
+"""
+多机补全的任务队列
+
+队列是共享文件系统上的一个 SQLite 文件 (默认是存档目录下的 queue.db)，每个
+(平台, 日期) 是一个任务。各台机器上的工作进程在同一个事务 (BEGIN IMMEDIATE)
+中取出任务并写入租约，同一时间一个任务只属于一个工作进程：
+
+- 工作进程定期心跳延长自己所有任务的租约；
+- 租约过期 (工作进程崩溃、断网) 的任务可以被其他工作进程重新领取，原来的
+  工作进程之后提交的结果不再被接受；
+- 失败的任务重新排队，领取 max_attempts 次仍未完成则标记为失败。
+
+领取时同时按平台限速：同一平台两次领取至少间隔 interval 秒，所有机器合计。
+WAL 依赖共享内存，不能跨机器使用，所以队列使用默认的 DELETE 日志模式。
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+QUEUE_FILENAME = "queue.db"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    platform TEXT NOT NULL,
+    date TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (platform, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS units_claim ON units (state, rank);
+CREATE TABLE IF NOT EXISTS throttle (
+    platform TEXT PRIMARY KEY,
+    next_start REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    platform_id: str
+    date: str
+
+
+@dataclass
+class WorkerInfo:
+    worker: str
+    host: str
+    pid: int
+    last_seen: float
+    running: int
+
+
+class WorkQueue:
+    """共享文件系统上的任务队列
+
+    Args:
+        db_path: 队列文件路径
+        lease_seconds: 领取任务和每次心跳后租约的有效期
+        max_attempts: 每个任务最多领取的次数
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 120, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # 自动提交模式，需要原子性的操作显式 BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def for_storage(cls, storage, config) -> "WorkQueue":
+        """配置中的队列文件，未配置时使用存档目录下的 queue.db"""
+        db_path = config.cluster_queue_path or os.path.join(storage.base_path, QUEUE_FILENAME)
+        return cls(db_path, config.cluster_lease_seconds, config.cluster_max_attempts)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE 事务：开始时即取得写锁，其他机器的领取在此等待"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, units: Iterable[Tuple[str, str]]) -> int:
+        """按给定顺序 (即领取顺序) 加入任务，返回新加入或重新排队的个数
+
+        已在队列中的任务保持不变，失败的任务重新排队并清零领取次数。
+        """
+        now = time.time()
+        added = 0
+        with self._transaction() as conn:
+            rank = conn.execute("SELECT COALESCE(MAX(rank), -1) FROM units").fetchone()[0]
+            for platform_id, date in units:
+                rank += 1
+                cursor = conn.execute(
+                    "INSERT INTO units (platform, date, rank, state, attempts, updated_at) "
+                    "VALUES (?, ?, ?, ?, 0, ?) "
+                    "ON CONFLICT (platform, date) DO UPDATE SET "
+                    "state = excluded.state, rank = excluded.rank, attempts = 0, worker = NULL, "
+                    "lease_until = NULL, message = '', updated_at = excluded.updated_at "
+                    "WHERE units.state = ?",
+                    (platform_id, date, rank, PENDING, now, FAILED),
+                )
+                added += cursor.rowcount
+        return added
+
+    def register(self, worker: str, host: str, pid: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workers (worker, host, pid, started_at, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (worker, host, pid, now, now),
+            )
+
+    def claim(self, worker: str, interval: float = 0.0) -> Optional[WorkUnit]:
+        """领取排在最前、所属平台不在限速间隔内的任务，没有可领取的任务时返回 None
+
+        租约过期的任务和排队的任务一样可以领取；已经领取了 max_attempts 次的
+        过期任务标记为失败。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = ?, worker = NULL, lease_until = NULL, "
+                "message = '租约过期次数过多', updated_at = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT u.platform, u.date FROM units u LEFT JOIN throttle t ON t.platform = u.platform "
+                "WHERE (u.state = ? OR (u.state = ? AND u.lease_until < ?)) "
+                "AND COALESCE(t.next_start, 0) <= ? "
+                "ORDER BY u.rank LIMIT 1",
+                (PENDING, RUNNING, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE units SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE platform = ? AND date = ?",
+                (RUNNING, worker, now + self.lease_seconds, now, row[0], row[1]),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO throttle (platform, next_start) VALUES (?, ?)",
+                (row[0], now + interval),
+            )
+        return WorkUnit(row[0], row[1])
+
+    def heartbeat(self, worker: str) -> List[WorkUnit]:
+        """延长 worker 所有任务的租约，返回仍属于它的任务"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE workers SET last_seen = ? WHERE worker = ?", (now, worker))
+            conn.execute(
+                "UPDATE units SET lease_until = ? WHERE worker = ? AND state = ?",
+                (now + self.lease_seconds, worker, RUNNING),
+            )
+            rows = conn.execute(
+                "SELECT platform, date FROM units WHERE worker = ? AND state = ?", (worker, RUNNING)
+            ).fetchall()
+        return [WorkUnit(*row) for row in rows]
+
+    def complete(self, worker: str, unit: WorkUnit, success: bool, message: str = "") -> bool:
+        """提交结果，任务已不属于 worker (租约过期被重新领取) 时返回 False
+
+        失败的任务在领取次数未达上限时重新排队。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE units SET state = CASE WHEN ? THEN ? WHEN attempts >= ? THEN ? ELSE ? END, "
+                "worker = NULL, lease_until = NULL, message = ?, updated_at = ? "
+                "WHERE platform = ? AND date = ? AND worker = ? AND state = ?",
+                (int(success), DONE, self.max_attempts, FAILED, PENDING, message[:200], now,
+                 unit.platform_id, unit.date, worker, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, worker: str, unit: Optional[WorkUnit] = None) -> int:
+        """放回 worker 的任务 (被取消时)，这次领取不计入次数"""
+        now = time.time()
+        sql = ("UPDATE units SET state = ?, worker = NULL, lease_until = NULL, "
+               "attempts = MAX(attempts - 1, 0), updated_at = ? WHERE worker = ? AND state = ?")
+        params = [PENDING, now, worker, RUNNING]
+        if unit is not None:
+            sql += " AND platform = ? AND date = ?"
+            params += [unit.platform_id, unit.date]
+        with self._transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def remaining(self) -> int:
+        """还没有结束 (排队或正在下载) 的任务数"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM units WHERE state IN (?, ?)", (PENDING, RUNNING)
+            ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall()
+        counts = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def units(self, state: Optional[str] = None) -> List[Tuple[WorkUnit, str, int, str]]:
+        """任务列表 (任务, 状态, 领取次数, 最后的消息)，按领取顺序"""
+        sql = "SELECT platform, date, state, attempts, message FROM units"
+        params: list = []
+        if state:
+            sql += " WHERE state = ?"
+            params.append(state)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY rank", params).fetchall()
+        return [(WorkUnit(row[0], row[1]), row[2], row[3], row[4]) for row in rows]
+
+    def workers(self) -> List[WorkerInfo]:
+        """登记过的工作进程，按最后心跳时间从新到旧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT w.worker, w.host, w.pid, w.last_seen, "
+                "(SELECT COUNT(*) FROM units u WHERE u.worker = w.worker AND u.state = ?) "
+                "FROM workers w ORDER BY w.last_seen DESC",
+                (RUNNING,),
+            ).fetchall()
+        return [WorkerInfo(*row) for row in rows]
+
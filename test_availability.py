@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试后台刷新更新日期 (离线，使用本地假报纸服务器)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtCore import QCoreApplication
+
+from benchmarks.fake_server import FakeNewspaperServer, redirect_hosts
+from src.config import config
+from src.downloaders import check_available_dates
+from src.gui.availability import AvailabilityRefresher
+from src.utils import AvailabilityStore
+
+app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+@contextmanager
+def temp_availability():
+    """在临时目录中使用更新日期记录，结束后恢复配置"""
+    settings = config._config.setdefault("availability", {})
+    saved = dict(settings)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings["path"] = os.path.join(tmp, "availability.db")
+        store = AvailabilityStore.for_config(config)
+        try:
+            yield store
+        finally:
+            settings.clear()
+            settings.update(saved)
+            store.close()
+
+
+def _collect(refresher: AvailabilityRefresher) -> dict:
+    events = {"dates": [], "platforms": {}, "finished": []}
+
+    def on_date(platform_id: str, date: str):
+        events["dates"].append((platform_id, date))
+
+    def on_platform(platform_id: str, dates: list, complete: bool):
+        events["platforms"][platform_id] = (dates, complete)
+
+    def on_finished(cancelled: bool):
+        events["finished"].append(cancelled)
+
+    refresher.date_found.connect(on_date)
+    refresher.platform_finished.connect(on_platform)
+    refresher.finished.connect(on_finished)
+    return events
+
+
+def _wait(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_refresh_streams_all_papers():
+    """多份报纸同时刷新，每个日期确认后立即通知"""
+    with temp_availability(), FakeNewspaperServer(pages=1, latency=0.05):
+        refresher = AvailabilityRefresher()
+        events = _collect(refresher)
+        start = time.monotonic()
+        assert refresher.start(["rmrb", "guangming", "xinhua_daily"], days=3)
+        assert not refresher.start(["rmrb"], days=3)
+
+        _wait(lambda: events["dates"])
+        first_date_after = time.monotonic() - start
+        _wait(lambda: events["finished"])
+        elapsed = time.monotonic() - start
+
+    assert events["finished"] == [False]
+    for platform_id in ("rmrb", "guangming", "xinhua_daily"):
+        dates, complete = events["platforms"][platform_id]
+        assert complete and len(dates) == 3
+        assert [date for pid, date in events["dates"] if pid == platform_id] == dates
+    # 第一个日期在全部检查完之前就已报告
+    assert first_date_after < elapsed
+    print("[OK] 并行刷新并逐个报告日期")
+
+
+def test_refresh_cancel():
+    """取消后尽快结束，已确认的日期标记为不完整"""
+    with temp_availability(), FakeNewspaperServer(pages=1, latency=0.1):
+        refresher = AvailabilityRefresher()
+        events = _collect(refresher)
+        refresher.start(["rmrb"], days=30)
+        _wait(lambda: events["dates"])
+        refresher.cancel()
+        _wait(lambda: events["finished"])
+
+    assert events["finished"] == [True]
+    dates, complete = events["platforms"]["rmrb"]
+    assert not complete and 1 <= len(dates) < 30
+    print("[OK] 取消刷新")
+
+
+def test_refresh_probes_only_unknown_or_stale():
+    """过去日期的结果不再检查，当天的结果过期后重新检查，检查失败不记录"""
+    today = datetime.now()
+    day = lambda offset: (today - timedelta(days=offset)).strftime("%Y-%m-%d")
+    with temp_availability() as store, FakeNewspaperServer(pages=1) as server:
+        # 昨天已确认没有出版；今天一小时前检查过，已过期
+        store.record("rmrb", day(1), False)
+        store.record("rmrb", day(0), True, checked_at=time.time() - store.today_ttl - 1)
+        assert check_available_dates("rmrb", config, days=3) == [day(0), day(2)]
+        requests = server.stats["requests"]
+        assert requests > 0
+
+        # 全部有记录：不再访问网站
+        assert check_available_dates("rmrb", config, days=3) == [day(0), day(2)]
+        assert server.stats["requests"] == requests
+
+        # 服务器不可用：检查失败的日期不记录，仍然按没有记录处理
+        store.record("rmrb", day(0), True, checked_at=time.time() - store.today_ttl - 1)
+        port = server.port
+        server.stop()
+        redirect_hosts(port)  # 换用新的连接池，不再复用已建立的连接
+        assert check_available_dates("rmrb", config, days=3) == [day(2)]
+        assert store.stale("rmrb", [day(0), day(1), day(2)]) == [day(0)]
+    print("[OK] 只检查没有记录或已过期的日期")
+
+
+def test_unpublished_records_expire():
+    """过去日期没有出版的记录过期后重新检查，补全缺期时不再跳过；出版的记录一直有效"""
+    with temp_availability() as store:
+        store.unpublished_ttl = 86400
+        store.record("rmrb", "2026-09-01", False, checked_at=time.time() - 3600)
+        store.record("rmrb", "2026-08-31", False, checked_at=time.time() - 2 * 86400)
+        store.record("rmrb", "2026-08-30", True, checked_at=time.time() - 30 * 86400)
+        dates = ["2026-09-01", "2026-08-31", "2026-08-30"]
+        assert store.stale("rmrb", dates) == ["2026-08-31"]
+        assert store.unpublished("rmrb", dates) == {"2026-09-01"}
+    print("[OK] 没有出版的记录会过期")
+
+
+if __name__ == "__main__":
+    test_refresh_streams_all_papers()
+    test_refresh_cancel()
+    test_refresh_probes_only_unknown_or_stale()
+    test_unpublished_records_expire()
+    print("\n全部测试通过")
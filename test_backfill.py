@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试缺期检查与补全
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.fake_server import FakeNewspaperServer
+from test_availability import temp_availability
+from src import backfill
+from src.backfill import Gap, expected_dates, find_gaps, run_backfill
+from src.config import config
+from src.utils import ArchiveManifest, AvailabilityStore, StorageManager
+
+
+def _timestamp(text: str) -> float:
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").timestamp()
+
+
+def test_find_gaps():
+    """按出版日计算应有的各期，排除已下载和确认没有出版的日期，近的日期优先、平台交替"""
+    # 2026-09-07 是星期一，学习时报只在一、三、五出版
+    assert expected_dates("xuexishibao", "2026-09-07", "2026-09-13") == ["2026-09-11", "2026-09-09", "2026-09-07"]
+
+    settings = config._config.setdefault("availability", {})
+    saved = dict(settings)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        path = storage.build_output_path("人民日报", "2026-09-12")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4\n")
+        manifest = ArchiveManifest.for_storage(storage)
+        manifest.record("人民日报", "2026-09-12", path, page_count=1, sha256="0")
+        settings["path"] = os.path.join(tmp, "availability.db")
+        store = AvailabilityStore.for_config(config)
+        try:
+            # 09-10 在当天结束后确认没有出版；09-08 只在当天检查过，还不能确定
+            store.record("rmrb", "2026-09-10", False, checked_at=time.time())
+            store.record("rmrb", "2026-09-08", False, checked_at=_timestamp("2026-09-08 20:00"))
+            gaps = find_gaps(storage, ["rmrb", "xuexishibao"], "2026-09-07", "2026-09-13")
+        finally:
+            settings.clear()
+            settings.update(saved)
+            store.close()
+            manifest.close()
+
+    assert gaps == [
+        Gap("rmrb", "2026-09-13"), Gap("xuexishibao", "2026-09-11"),
+        Gap("rmrb", "2026-09-11"), Gap("xuexishibao", "2026-09-09"),
+        Gap("rmrb", "2026-09-09"), Gap("xuexishibao", "2026-09-07"),
+        Gap("rmrb", "2026-09-08"),
+        Gap("rmrb", "2026-09-07"),
+    ]
+    print("[OK] 缺期检查")
+
+
+def test_backfill_downloads_only_gaps():
+    """补全只下载缺少的日期，完成后不再有缺期"""
+    with tempfile.TemporaryDirectory() as tmp, temp_availability(), \
+            FakeNewspaperServer(pages=2, image_size=(200, 280)):
+        storage = StorageManager(tmp)
+        gaps = find_gaps(storage, ["rmrb", "guangming"], "2026-09-01", "2026-09-02")
+        assert len(gaps) == 4
+
+        logs = []
+        result = run_backfill(storage, gaps, editions_per_minute=0, log=lambda level, msg: logs.append(msg))
+        assert sorted(result.succeeded, key=lambda g: (g.platform_id, g.date)) == sorted(
+            gaps, key=lambda g: (g.platform_id, g.date))
+        assert not result.failed and not result.cancelled, logs
+        assert os.path.exists(storage.edition_path("光明日报", "2026-09-01"))
+        assert find_gaps(storage, ["rmrb", "guangming"], "2026-09-01", "2026-09-02") == []
+        ArchiveManifest.for_storage(storage).close()
+    print("[OK] 补全缺期")
+
+
+def test_backfill_reports_setup_errors():
+    """开始下载前出错的平台，其日期全部记为失败"""
+    def broken_profile(profile_name, platform_id):
+        raise ValueError("图片配置有误")
+
+    original = backfill.build_image_profile
+    backfill.build_image_profile = broken_profile
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            gaps = [Gap("rmrb", "2026-09-02"), Gap("rmrb", "2026-09-01")]
+            logs = []
+            result = run_backfill(StorageManager(tmp), gaps, editions_per_minute=600,
+                                  log=lambda level, msg: logs.append(msg))
+            assert set(result.failed) == set(gaps) and not result.succeeded
+            assert any("图片配置有误" in msg for msg in logs)
+    finally:
+        backfill.build_image_profile = original
+    print("[OK] 补全出错")
+
+
+if __name__ == "__main__":
+    test_find_gaps()
+    test_backfill_downloads_only_gaps()
+    test_backfill_reports_setup_errors()
+    print("\n全部测试通过")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试全局带宽限制与流量优先级 (离线，使用本地假报纸服务器)
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.fake_server import FakeNewspaperServer
+from src.config import config
+from src.downloaders import get_downloader
+from src.downloaders.bandwidth import BATCH, INTERACTIVE, BandwidthShaper, shaper
+from src.utils.metrics import metrics
+
+
+def test_download_respects_global_cap():
+    """download_to 的总速率不超过 bandwidth.max_kb_per_second"""
+    settings = config._config.setdefault("bandwidth", {})
+    saved = dict(settings)
+    with FakeNewspaperServer(pages=1, page_kb=384):
+        downloader = get_downloader("rmrb", config)
+        try:
+            url = downloader.fetch_edition("2026-09-01").page_urls[0]
+            settings["max_kb_per_second"] = 256
+            since = metrics.checkpoint()
+            buffer = io.BytesIO()
+            start = time.monotonic()
+            assert downloader.download_to(url, buffer)
+            elapsed = time.monotonic() - start
+        finally:
+            settings.clear()
+            settings.update(saved)
+            shaper.set_rate(config.bandwidth_limit)
+            downloader.close()
+
+    size = len(buffer.getvalue())
+    assert size > 384 * 1024
+    # 令牌桶最多一次放行 0.25 秒的流量
+    assert elapsed >= (size - 0.25 * 256 * 1024) / (256 * 1024) * 0.9, elapsed
+    waits = metrics.summary(since)["counters"]["newspaper_bandwidth_wait_seconds_total"]
+    assert waits[0]["labels"]["traffic"] == BATCH and waits[0]["value"] > 0
+    print("[OK] 全局限速")
+
+
+def test_interactive_preempts_batch():
+    """interactive 下载进行时独占带宽，结束后 batch 继续使用全部带宽"""
+    rate = 200_000
+    limiter = BandwidthShaper(rate)
+    stop = threading.Event()
+    batch_bytes = [0]
+    lock = threading.Lock()
+
+    def batch():
+        with limiter.stream(BATCH):
+            while not stop.is_set():
+                limiter.consume(8192, BATCH)
+                with lock:
+                    batch_bytes[0] += 8192
+
+    threads = [threading.Thread(target=batch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+
+    with lock:
+        before = batch_bytes[0]
+    start = time.monotonic()
+    with limiter.stream(INTERACTIVE):
+        for _ in range(13):
+            limiter.consume(8192, INTERACTIVE)
+    interactive_time = time.monotonic() - start
+    with lock:
+        during = batch_bytes[0] - before
+
+    time.sleep(0.5)
+    with lock:
+        after = batch_bytes[0] - before - during
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # 平分带宽时需要 4 倍左右的时间
+    assert interactive_time < 0.9, interactive_time
+    assert during < 13 * 8192 * 0.3, during
+    assert after > rate * 0.5 * 0.6, after
+    print("[OK] interactive 优先")
+
+
+if __name__ == "__main__":
+    test_download_respects_global_cap()
+    test_interactive_preempts_batch()
+    print("\n全部测试通过")
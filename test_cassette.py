@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试 HTTP 录制与回放 (离线，录制本地假报纸服务器)
+"""
+
+import io
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.fake_server import FakeNewspaperServer, HostRewriteAdapter
+from src.config import config
+from src.downloaders import get_downloader
+from src.downloaders.cassette import Cassette, start_recording, start_replay, stop_cassette
+
+
+def _download_edition(platform_id: str, date: str) -> list:
+    downloader = get_downloader(platform_id, config)
+    try:
+        edition = downloader.fetch_edition(date)
+        bodies = []
+        for url in edition.page_urls:
+            buffer = io.BytesIO()
+            bodies.append(buffer.getvalue() if downloader.download_to(url, buffer) else None)
+        return bodies
+    finally:
+        downloader.close()
+
+
+def test_record_and_replay():
+    """回放得到与录制时相同的内容，相同的响应内容只保存一份，服务器停止后仍可回放"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = FakeNewspaperServer(pages=3, image_size=(200, 280)).start()
+        try:
+            start_recording(tmp, inner=HostRewriteAdapter(server.port))
+            recorded = [_download_edition("guangming", date) for date in ("2026-09-01", "2026-09-02")]
+        finally:
+            stop_cassette()
+            server.stop()
+
+        stats = Cassette.load(tmp).stats()
+        # 两期的版面图片相同，只保存一份
+        assert stats["response_bytes"] > stats["body_bytes"]
+        assert stats["bodies"] < stats["interactions"]
+
+        cassette = start_replay(tmp)
+        try:
+            replayed = [_download_edition("guangming", date) for date in ("2026-09-01", "2026-09-02")]
+        finally:
+            stop_cassette()
+        assert replayed == recorded
+        assert cassette.misses == 0
+    print("[OK] 录制与回放")
+
+
+def test_replay_failures_in_order():
+    """录制的失败在回放时按原顺序重现"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = FakeNewspaperServer(pages=4, failure_rate=0.5, failure_mode="reset", seed=3).start()
+        try:
+            start_recording(tmp, inner=HostRewriteAdapter(server.port))
+            recorded = _download_edition("rmrb", "2026-09-01")
+        finally:
+            stop_cassette()
+            server.stop()
+
+        start_replay(tmp)
+        try:
+            replayed = _download_edition("rmrb", "2026-09-01")
+        finally:
+            stop_cassette()
+        assert [body is None for body in replayed] == [body is None for body in recorded]
+        assert replayed == recorded
+    print("[OK] 回放失败")
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
+    test_replay_failures_in_order()
+    print("\n全部测试通过")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试多机补全的任务队列和工作进程 (离线，使用本地假报纸服务器)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.fake_server import FakeNewspaperServer
+from src.backfill import find_gaps
+from src.cluster import enqueue_gaps, run_worker
+from src.utils import ArchiveManifest, StorageManager, WorkQueue, WorkUnit
+from test_availability import temp_availability
+
+
+def test_queue_leases_and_reassignment():
+    """领取互斥、按平台限速、租约过期后重新分配，旧工作进程的结果不再被接受"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "queue.db")
+        # 两个连接模拟两台机器
+        node_a = WorkQueue(path, lease_seconds=1.0, max_attempts=2)
+        node_b = WorkQueue(path, lease_seconds=1.0, max_attempts=2)
+        try:
+            units = [("rmrb", "2026-09-02"), ("rmrb", "2026-09-01"), ("guangming", "2026-09-02")]
+            assert node_a.enqueue(units) == 3
+            assert node_b.enqueue(units) == 0
+
+            assert node_a.claim("a", interval=0.3) == WorkUnit("rmrb", "2026-09-02")
+            # 人民日报在限速间隔内，先领取光明日报
+            assert node_b.claim("b", interval=0.3) == WorkUnit("guangming", "2026-09-02")
+            assert node_b.claim("b", interval=0.3) is None
+            time.sleep(0.35)
+            assert node_b.claim("b", interval=0.3) == WorkUnit("rmrb", "2026-09-01")
+
+            # a 不再心跳 (崩溃)，b 一直心跳；a 的租约过期后由 b 接手
+            deadline = time.monotonic() + 5
+            reassigned = None
+            while reassigned is None:
+                assert time.monotonic() < deadline, "租约没有过期"
+                assert len(node_b.heartbeat("b")) == 2
+                time.sleep(0.2)
+                reassigned = node_b.claim("b", interval=0.3)
+            assert reassigned == WorkUnit("rmrb", "2026-09-02")
+            assert not node_a.complete("a", reassigned, True)
+
+            assert node_b.complete("b", WorkUnit("guangming", "2026-09-02"), True)
+            # 已领取 2 次仍失败：标记为失败
+            assert node_b.complete("b", reassigned, False, "网络错误")
+            assert node_b.release("b") == 1
+            assert node_b.counts() == {"pending": 1, "running": 0, "done": 1, "failed": 1}
+
+            # 重新加入时只有失败的任务重新排队
+            assert node_a.enqueue(units) == 1
+            assert node_a.counts()["pending"] == 2
+        finally:
+            node_a.close()
+            node_b.close()
+    print("[OK] 租约与重新分配")
+
+
+def test_workers_share_archive():
+    """两个工作进程下载到同一存档目录，崩溃工作进程的任务被接手，没有重复下载，不更新索引和合订本"""
+    with tempfile.TemporaryDirectory() as tmp, temp_availability(), \
+            FakeNewspaperServer(pages=2, image_size=(200, 280)):
+        storage = StorageManager(os.path.join(tmp, "archive"))
+        path = os.path.join(tmp, "queue.db")
+        coordinator = WorkQueue(path, lease_seconds=1.0)
+        gaps, added = enqueue_gaps(storage, coordinator, ["rmrb", "guangming"], "2026-09-01", "2026-09-03")
+        assert added == len(gaps) == 6
+        # 一个工作进程领取任务后崩溃，从不心跳
+        crashed = coordinator.claim("crashed")
+
+        results = {}
+
+        def node(name: str):
+            queue = WorkQueue(path, lease_seconds=1.0)
+            try:
+                results[name] = run_worker(
+                    storage, queue, worker_id=name, threads=2, editions_per_minute=0,
+                    heartbeat_seconds=0.2, poll_seconds=0.1
+                )
+            finally:
+                queue.close()
+
+        threads = [threading.Thread(target=node, args=(name,)) for name in ("node-1", "node-2")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+
+        try:
+            done = [gap for result in results.values() for gap in result.succeeded]
+            assert sorted(done, key=lambda g: (g.platform_id, g.date)) == sorted(
+                gaps, key=lambda g: (g.platform_id, g.date))
+            assert not any(result.failed or result.cancelled for result in results.values())
+            assert coordinator.counts() == {"pending": 0, "running": 0, "done": 6, "failed": 0}
+            attempts = {unit: count for unit, _, count, _ in coordinator.units()}
+            assert attempts.pop(crashed) == 2 and set(attempts.values()) == {1}
+            assert {worker.worker for worker in coordinator.workers()} == {"node-1", "node-2"}
+            assert find_gaps(storage, ["rmrb", "guangming"], "2026-09-01", "2026-09-03") == []
+            # 全文索引和合订本不由工作进程更新
+            assert not os.path.exists(os.path.join(storage.base_path, "search_index.db"))
+            assert not any(os.path.isdir(os.path.join(storage.base_path, name, "volumes"))
+                           for name in os.listdir(storage.base_path))
+        finally:
+            coordinator.close()
+            ArchiveManifest.for_storage(storage).close()
+    print("[OK] 多个工作进程共用存档目录")
+
+
+if __name__ == "__main__":
+    test_queue_leases_and_reassignment()
+    test_workers_share_archive()
+    print("\n全部测试通过")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+离线测试各下载器 (使用本地假报纸服务器，不访问真实网站)
+"""
+
+import io
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from benchmarks.fake_server import FakeNewspaperServer
+from src.config import config
+from src.downloaders import get_available_platforms, get_downloader
+from src.downloaders.base import mount_session_adapter, unmount_session_adapter
+
+
+def test_all_platforms_parse_fake_sites():
+    """每个平台都能从模拟网站解析出全部版面并下载第一版"""
+    with FakeNewspaperServer(pages=3, image_size=(200, 280)):
+        for platform_id in get_available_platforms():
+            downloader = get_downloader(platform_id, config)
+            try:
+                edition = downloader.fetch_edition("2026-09-01")
+                assert edition and len(edition.page_urls) == 3, platform_id
+                assert all(isinstance(url, str) for url in edition.page_urls), platform_id
+
+                buffer = io.BytesIO()
+                assert downloader.download_to(edition.page_urls[0], buffer), platform_id
+                assert buffer.getvalue().startswith((b"%PDF-", b"\xff\xd8\xff")), platform_id
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "page_01")
+                    assert downloader.download_file(edition.page_urls[0], path), platform_id
+                    assert os.listdir(tmp) == ["page_01"], platform_id
+            finally:
+                downloader.close()
+    print("[OK] 所有平台解析模拟网站")
+
+
+def test_failure_injection():
+    """注入的失败按重试次数消耗，全部失败时返回 False，download_file 不留下文件"""
+    with FakeNewspaperServer(pages=1, failure_rate=1.0) as server, tempfile.TemporaryDirectory() as tmp:
+        downloader = get_downloader("rmrb", config)
+        edition = downloader.fetch_edition("2026-09-01")
+        assert not downloader.download_to(edition.page_urls[0], io.BytesIO())
+        assert server.stats["failures"] == downloader.profile.max_retries
+        assert not downloader.download_file(edition.page_urls[0], os.path.join(tmp, "page_01.pdf"))
+        assert os.listdir(tmp) == []
+        downloader.close()
+    print("[OK] 失败注入")
+
+
+class _StatusAdapter(BaseAdapter):
+    """所有请求都返回指定状态码的空页面"""
+
+    def __init__(self, status: int):
+        super().__init__()
+        self.status = status
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.status_code = self.status
+        response.url = request.url
+        response.request = request
+        response.raw = io.BytesIO(b"<html></html>")
+        return response
+
+    def close(self):
+        pass
+
+
+def test_probe_treats_refusals_as_errors():
+    """只有 404 算没有出版，403 等拒绝访问的响应算检查失败"""
+    for status, expected in ((404, False), (403, None), (401, None), (503, None)):
+        prefix = "https://paper.people.com.cn"
+        mount_session_adapter(prefix, _StatusAdapter(status))
+        downloader = get_downloader("rmrb", config)
+        try:
+            assert downloader.probe_edition("2026-09-01") is expected, status
+        finally:
+            downloader.close()
+            unmount_session_adapter(prefix)
+    print("[OK] 拒绝访问不算没有出版")
+
+
+if __name__ == "__main__":
+    test_all_platforms_parse_fake_sites()
+    test_failure_injection()
+    test_probe_treats_refusals_as_errors()
+    print("\n全部测试通过")
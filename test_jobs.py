@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试下载任务队列 (离线，使用本地假报纸服务器)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtCore import QCoreApplication
+
+from benchmarks.fake_server import FakeNewspaperServer
+from src.downloaders.bandwidth import BATCH, INTERACTIVE
+from src.gui import jobs
+from src.gui.jobs import Job, JobManager, INTERACTIVE_PRIORITY, CANCELLED, DONE, FAILED, PAUSED, QUEUED, RUNNING
+from src.utils import ArchiveManifest, StorageManager
+
+app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+def _wait(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_priority_and_concurrency():
+    """按优先级启动，同时运行的任务数不超过上限，完成后报告结果和速度"""
+    with tempfile.TemporaryDirectory() as tmp, FakeNewspaperServer(pages=2, latency=0.02):
+        manager = JobManager(max_concurrent=1)
+        started = []
+
+        def on_changed(job_id: int):
+            if manager.job(job_id).state == RUNNING and job_id not in started:
+                started.append(job_id)
+
+        manager.job_changed.connect(on_changed)
+        results = {}
+
+        first = manager.submit(Job("rmrb", ["2026-09-01", "2026-09-02"], tmp))
+        batch = Job("xuexishibao", ["2026-09-02"], tmp)
+        batch.signals.batch_complete_signal.connect(lambda ok, failed: results.update(batch=(ok, failed)))
+        manager.submit(batch)
+        single = Job("rmrb", ["2026-09-03"], tmp, priority=INTERACTIVE_PRIORITY, batch=False)
+        single.signals.complete_signal.connect(lambda ok, message: results.update(single=(ok, message)))
+        manager.submit(single)
+        assert [job.id for job in manager.queued()] == [single.id, batch.id]
+        # 流量类别由任务类型决定，调整排队优先级不改变
+        assert single.traffic_class == INTERACTIVE and batch.traffic_class == BATCH
+        manager.set_priority(batch.id, INTERACTIVE_PRIORITY + 1)
+        assert batch.traffic_class == BATCH
+        manager.set_priority(batch.id, 0)
+
+        _wait(lambda: not manager.has_active())
+        assert started == [first.id, single.id, batch.id]
+        assert all(job.state == DONE for job in manager.jobs())
+        assert results["batch"] == (1, 0)
+        assert results["single"][0] and results["single"][1].endswith("人民日报_20260903.pdf")
+        assert first.editions_per_minute > 0 and first.bytes_downloaded > 0
+        ArchiveManifest.for_storage(StorageManager(tmp)).close()
+    print("[OK] 优先级与并发")
+
+
+def test_pause_resume_cancel():
+    """暂停的任务让出线程，继续后从未完成的日期接着下载；取消排队中的任务立即结束"""
+    with tempfile.TemporaryDirectory() as tmp, FakeNewspaperServer(pages=2, latency=0.05):
+        manager = JobManager(max_concurrent=1)
+        dates = ["2026-09-01", "2026-09-02", "2026-09-03", "2026-09-04"]
+        paused = manager.submit(Job("rmrb", dates, tmp))
+        waiting = manager.submit(Job("guangming", ["2026-09-01"], tmp))
+        cancelled = manager.submit(Job("xuexishibao", ["2026-09-01"], tmp))
+
+        manager.cancel(cancelled.id)
+        assert cancelled.state == CANCELLED
+
+        _wait(lambda: paused.succeeded >= 1)
+        manager.pause(paused.id)
+        _wait(lambda: paused.state == PAUSED)
+        done_before = paused.next_index
+        assert done_before < len(dates)
+
+        _wait(lambda: waiting.state == DONE)
+        assert paused.state == PAUSED and paused.next_index == done_before
+
+        manager.resume(paused.id)
+        assert paused.state in (QUEUED, RUNNING)
+        _wait(lambda: not manager.has_active())
+        assert paused.state == DONE and paused.succeeded == len(dates)
+        ArchiveManifest.for_storage(StorageManager(tmp)).close()
+    print("[OK] 暂停、继续与取消")
+
+
+def test_setup_error_fails_job():
+    """开始下载前出错的任务记为失败，不会反复重新排队"""
+    def broken_profile(profile_name, platform_id):
+        raise ValueError("图片配置有误")
+
+    original = jobs.build_image_profile
+    jobs.build_image_profile = broken_profile
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = JobManager(max_concurrent=1)
+            starts = []
+            manager.job_changed.connect(
+                lambda job_id: starts.append(job_id) if manager.job(job_id).state == RUNNING else None
+            )
+            results = {}
+            job = Job("rmrb", ["2026-09-01", "2026-09-02"], tmp)
+            job.signals.batch_complete_signal.connect(lambda ok, failed: results.update(batch=(ok, failed)))
+            manager.submit(job)
+            _wait(lambda: not manager.has_active())
+            assert job.state == FAILED and job.failed == 2 and job.succeeded == 0
+            assert results["batch"] == (0, 2)
+            assert starts == [job.id]
+            assert "图片配置有误" in job.message
+    finally:
+        jobs.build_image_profile = original
+    print("[OK] 开始前出错的任务")
+
+
+def test_concurrent_jobs_export_metrics_once():
+    """同时运行的任务结束后只导出一次指标，汇总包含全部任务"""
+    exports = []
+    original = jobs.export_run_metrics
+
+    def counting_export(storage, since=None, **extra):
+        exports.append(extra)
+        original(storage, since, **extra)
+
+    jobs.export_run_metrics = counting_export
+    try:
+        with tempfile.TemporaryDirectory() as tmp, FakeNewspaperServer(pages=2, latency=0.02):
+            manager = JobManager(max_concurrent=2)
+            manager.submit(Job("rmrb", ["2026-09-01", "2026-09-02"], tmp))
+            manager.submit(Job("guangming", ["2026-09-01"], tmp))
+            _wait(lambda: not manager.has_active())
+            ArchiveManifest.for_storage(StorageManager(tmp)).close()
+
+            assert exports == [{"platform": "guangming,rmrb", "success_count": 3, "fail_count": 0}]
+            with open(os.path.join(tmp, ".metrics", "last_run.json"), encoding="utf-8") as f:
+                summary = json.load(f)
+            editions = summary["counters"]["newspaper_editions_total"]
+            assert sum(item["value"] for item in editions) == 3
+            assert {item["labels"]["platform"] for item in editions} == {"rmrb", "guangming"}
+    finally:
+        jobs.export_run_metrics = original
+    print("[OK] 并发任务只导出一次指标")
+
+
+if __name__ == "__main__":
+    test_priority_and_concurrency()
+    test_pause_resume_cancel()
+    test_setup_error_fails_job()
+    test_concurrent_jobs_export_metrics_once()
+    print("\n全部测试通过")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试 GUI 日志模型：批量刷新、行数上限、按级别和报纸筛选
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PySide6.QtCore import QCoreApplication
+
+from src.gui.log_view import LogFilterProxy, LogModel, parse_log_line
+
+app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+def test_parse_log_line():
+    """解析工作线程日志中的级别和报纸"""
+    record = parse_log_line("[WARNING] [人民日报] 第 3 版数据无效，已跳过", timestamp="12:00:00")
+    assert (record.level, record.paper) == ("WARNING", "人民日报")
+    assert record.text == "[12:00:00] [WARNING] [人民日报] 第 3 版数据无效，已跳过"
+
+    record = parse_log_line("更新日期刷新完成", timestamp="12:00:00")
+    assert (record.level, record.paper, record.text) == ("INFO", "", "[12:00:00] 更新日期刷新完成")
+    assert parse_log_line("失败: 超时", level="ERROR").level == "ERROR"
+    print("[OK] 解析日志行")
+
+
+def test_batched_capped_and_filtered():
+    """日志在刷新时一次插入，超过上限删除最早的行；筛选不修改模型"""
+    model = LogModel(max_lines=100, flush_ms=0)
+    inserts = []
+    model.rowsInserted.connect(lambda parent, first, last: inserts.append(last - first + 1))
+
+    papers = ["人民日报", "光明日报"]
+    for i in range(250):
+        level = "ERROR" if i % 50 == 0 else "INFO"
+        model.append(f"[{level}] [{papers[i % 2]}] 第 {i} 行")
+    assert model.rowCount() == 0
+
+    model.flush()
+    assert inserts == [100]
+    assert model.rowCount() == 100
+    assert model.data(model.index(0)).endswith("第 150 行")
+
+    model.append("[INFO] [文摘报] 第 250 行")
+    model.flush()
+    assert model.rowCount() == 100 and inserts == [100, 1]
+    assert model.data(model.index(0)).endswith("第 151 行")
+    assert set(model.papers()) == {"人民日报", "光明日报", "文摘报"}
+
+    proxy = LogFilterProxy()
+    proxy.setSourceModel(model)
+    assert proxy.rowCount() == 100
+    proxy.set_min_level("ERROR")
+    assert [proxy.data(proxy.index(row, 0)).split()[-2] for row in range(proxy.rowCount())] == ["200"]
+    proxy.set_min_level("DEBUG")
+    proxy.set_paper("光明日报")
+    assert proxy.rowCount() == 50
+    print("[OK] 批量刷新、上限与筛选")
+
+
+if __name__ == "__main__":
+    test_parse_log_line()
+    test_batched_capped_and_filtered()
+    print("\n全部测试通过")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试日志模块 (离线)
+"""
+
+import dataclasses
+import json
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import config
+from src.utils.logger import Logger, LogEntry, LogLevel
+from src.utils.log_sink import JsonlLogSink, migrate_legacy_log, read_recent_entries
+
+
+def _entry(i: int) -> dict:
+    return {"timestamp": "2026-09-01 08:00:00", "level": "ERROR", "message": f"错误 {i}", "details": {}}
+
+
+def test_sink_rotates_and_reads_recent():
+    """按大小轮换，读取时跨文件取最近的条目"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "error_log.jsonl")
+        sink = JsonlLogSink(path, max_bytes=2000, rotate_interval=0, backup_count=2)
+        for i in range(100):
+            sink.write(_entry(i))
+            if i % 10 == 9:
+                sink.flush()
+        sink.close()
+
+        assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+        assert not os.path.exists(path + ".3")
+        recent = read_recent_entries(path, limit=20, backup_count=2)
+        assert [entry["message"] for entry in recent] == [f"错误 {i}" for i in range(80, 100)]
+    print("[OK] 日志轮换")
+
+
+def test_sink_survives_rotate_errors():
+    """轮转或重新打开文件失败后，后续日志照常写入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "error_log.jsonl")
+        sink = JsonlLogSink(path, max_bytes=200, rotate_interval=0, backup_count=1)
+        real_rotate, real_open = sink._rotate, sink._open
+        failures = {"rotate": 1, "open": 1}
+
+        def failing(name, real):
+            def call():
+                if failures[name]:
+                    failures[name] -= 1
+                    raise OSError(name)
+                return real()
+            return call
+
+        try:
+            sink.write(_entry(0))
+            sink.flush()
+            sink._rotate = failing("rotate", real_rotate)
+            sink._open = failing("open", real_open)
+            for i in range(1, 6):
+                sink.write(_entry(i))
+                sink.flush()
+        finally:
+            sink.close()
+
+        messages = [entry["message"] for entry in read_recent_entries(path, limit=10, backup_count=1)]
+        # 只丢弃重新打开失败的那一批
+        assert failures == {"rotate": 0, "open": 0}
+        assert len(messages) == 5 and messages[-1] == "错误 5", messages
+    print("[OK] 轮转失败后继续写入")
+
+
+def test_logger_appends_and_migrates_legacy_log():
+    """旧版 JSON 数组日志转为 JSONL，新日志追加在后"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "error_log.json")
+        path = os.path.join(tmp, "error_log.jsonl")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump([_entry(0), _entry(1)], f)
+        migrate_legacy_log(legacy, path)
+        assert not os.path.exists(legacy)
+
+        log = Logger()
+        log.set_error_log_path(path)
+        log.info("不写入文件")
+        log.warning("警告")
+        log.error("下载失败", details={"attempt": 3})
+
+        messages = [entry["message"] for entry in log.get_error_log()]
+        assert messages == ["错误 0", "错误 1", "警告", "下载失败"]
+        assert log.get_error_log(limit=1)[0]["details"] == {"attempt": 3}
+        # 不能序列化的 details 写成字符串，不影响后台线程
+        log.error("异常", details={"exc": ValueError("坏值")})
+        log.error("之后")
+        recent = log.get_error_log(limit=2)
+        assert recent[0]["details"] == {"exc": "坏值"}
+        assert recent[1]["message"] == "之后"
+        log.set_error_log_path(os.path.join(tmp, "other.jsonl"))
+    print("[OK] 追加写入")
+
+
+def test_ring_buffer_and_level_threshold():
+    """各级别分别限容；低于当前级别的调用不记录，参数在读取时才格式化"""
+    class Counting:
+        calls = 0
+
+        def __str__(self):
+            Counting.calls += 1
+            return "obj"
+
+    log = Logger(level=LogLevel.INFO, capacities={"INFO": 3, "ERROR": 2})
+    tmp = tempfile.mkdtemp()
+    log.set_error_log_path(os.path.join(tmp, "error_log.jsonl"))
+    log.debug("忽略 %s", Counting())
+    for i in range(5):
+        log.info("第 %d 版下载成功", i)
+    log.error("错误 %s", "a")
+    log.info("参数 %s", Counting())
+    log.error("错误 %s", "b")
+    log.error("错误 %s", "c")
+
+    assert Counting.calls == 0
+    assert [e.message for e in log.get_entries()] == [
+        "第 3 版下载成功", "第 4 版下载成功", "参数 obj", "错误 b", "错误 c"
+    ]
+    assert Counting.calls == 1
+    assert [e.message for e in log.get_entries(LogLevel.ERROR)] == ["错误 b", "错误 c"]
+    assert not hasattr(log.get_entries()[0], "__dict__")
+    entry = log.get_entries()[-1]
+    assert dataclasses.asdict(entry) == {
+        "timestamp": entry.timestamp, "level": "ERROR", "message": "错误 c", "details": {}
+    }
+    assert LogEntry(timestamp="2026-09-01 08:00:00", level="INFO", message="手工").details == {}
+
+    # 配置中未知的级别和无效的条数被忽略
+    settings = config._config.setdefault("logging", {})
+    saved = settings.get("capacity")
+    settings["capacity"] = {"warning": 1, "TRACE": 5, "INFO": "many"}
+    try:
+        assert config.log_capacity == {"WARNING": 1}
+        log.set_capacities(config.log_capacity)
+        log.warning("警告 1")
+        log.warning("警告 2")
+        assert [e.message for e in log.get_entries(LogLevel.WARNING)] == ["错误 b", "错误 c", "警告 2"]
+        log.set_capacities({"TRACE": 5})
+        assert len(log.get_entries()) == 6
+    finally:
+        if saved is None:
+            settings.pop("capacity", None)
+        else:
+            settings["capacity"] = saved
+
+    log.set_level("DEBUG")
+    log.debug("调试")
+    assert log.get_entries()[-1].message == "调试"
+
+    # 旧版接口：第二个位置参数是 details
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        log.error("旧接口 %s", {"url": "http://a"})
+    assert caught and caught[0].category is DeprecationWarning
+    assert caught[0].filename == os.path.abspath(__file__)
+    entry = log.get_entries()[-1]
+    assert (entry.message, entry.details) == ("旧接口 %s", {"url": "http://a"})
+
+    # 级别设为 ERROR 时警告不进入内存，但仍写入错误日志
+    log.set_level("ERROR")
+    log.warning("磁盘空间不足 %d%%", 95)
+    assert log.get_entries()[-1].message == "旧接口 %s"
+    assert log.get_error_log(limit=1)[0]["message"] == "磁盘空间不足 95%"
+    log.set_error_log_path(os.path.join(tmp, "other.jsonl"))
+    shutil.rmtree(tmp, ignore_errors=True)
+    print("[OK] 内存日志")
+
+
+if __name__ == "__main__":
+    test_sink_rotates_and_reads_recent()
+    test_sink_survives_rotate_errors()
+    test_logger_appends_and_migrates_legacy_log()
+    test_ring_buffer_and_level_threshold()
+    print("[SUCCESS] 日志测试完成!")
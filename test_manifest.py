@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试存档清单
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.pipeline import EditionPipeline
+from src.utils import ArchiveManifest, StorageManager
+from test_pipeline import _rmrb_downloader
+
+
+class _NoDiscovery:
+    """获取报纸信息时报错的下载器，用于确认已下载的日期不再访问网站"""
+
+    def get_latest_edition(self, date=None):
+        raise AssertionError("不应获取报纸信息")
+
+    def close(self):
+        pass
+
+
+def test_pipeline_records_and_skips():
+    """下载完成后记入清单，再次下载同一日期在获取报纸信息之前跳过"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        success, output_path = EditionPipeline("rmrb", storage).run(_rmrb_downloader(3), "2026-09-01")
+        assert success
+
+        manifest = ArchiveManifest.for_storage(storage)
+        entry = manifest.get("人民日报", "2026-09-01")
+        assert entry.path == output_path and entry.kind == "pdf" and entry.page_count == 3
+        assert entry.size == os.path.getsize(output_path)
+
+        success, skipped_path = EditionPipeline("rmrb", storage).run(_NoDiscovery(), "2026-09-01")
+        assert success and skipped_path == output_path
+
+        # 查询是否存在不创建日期目录
+        assert not storage.file_exists("人民日报", "2026-09-02")
+        assert not os.path.exists(os.path.join(tmp, "人民日报", "20260902"))
+        manifest.close()
+    print("[OK] 下载记录与跳过")
+
+
+def test_reconcile_and_range_queries():
+    """reconcile 加入手工复制的文件、删除已不存在的记录；按日期范围查询缺失的日期"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        success, first = EditionPipeline("rmrb", storage).run(_rmrb_downloader(2), "2026-09-01")
+        assert success
+
+        copied = storage.build_output_path("人民日报", "2026-09-03")
+        shutil.copyfile(first, copied)
+        os.makedirs(os.path.join(tmp, "人民日报", "notes"))
+
+        manifest = ArchiveManifest.for_storage(storage)
+        result = manifest.reconcile()
+        assert (result.added, result.updated, result.removed, result.unchanged) == (1, 0, 0, 1)
+        assert manifest.get("人民日报", "20260903").page_count == 2
+        assert manifest.dates("人民日报", "2026-09-01", "2026-09-30") == ["20260901", "20260903"]
+        assert manifest.missing("人民日报", ["2026-09-01", "2026-09-02", "2026-09-03"]) == ["2026-09-02"]
+
+        os.remove(first)
+        result = manifest.reconcile("人民日报")
+        assert result.removed == 1 and not manifest.has("人民日报", "2026-09-01")
+        assert manifest.stats()["editions"] == 1
+
+        # 没有存档目录的报纸
+        assert manifest.reconcile("光明日报").removed == 0
+        shutil.rmtree(os.path.join(tmp, "人民日报"))
+        assert manifest.reconcile("人民日报").removed == 1
+        assert manifest.stats()["editions"] == 0
+        assert manifest._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        manifest.close()
+    print("[OK] 扫描重建与范围查询")
+
+
+if __name__ == "__main__":
+    test_pipeline_records_and_skips()
+    test_reconcile_and_range_queries()
+    print("\n全部测试通过")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试性能指标 (离线)
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.utils.metrics import MetricsRegistry
+
+
+def test_prometheus_textfile():
+    """计数器和直方图按标签导出为 Prometheus 文本格式"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("newspaper_fetch_bytes_total", 2048, platform="rmrb", host="paper.people.com.cn")
+    registry.observe("newspaper_fetch_seconds", 0.05, platform="rmrb", host="paper.people.com.cn")
+    registry.observe("newspaper_fetch_seconds", 0.5, platform="rmrb", host="paper.people.com.cn")
+    registry.observe("newspaper_fetch_seconds", 3, platform="rmrb", host="paper.people.com.cn")
+
+    text = registry.to_prometheus()
+    labels = 'host="paper.people.com.cn",platform="rmrb"'
+    assert "# TYPE newspaper_fetch_seconds histogram" in text
+    assert f"newspaper_fetch_bytes_total{{{labels}}} 2048" in text
+    assert f'newspaper_fetch_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'newspaper_fetch_seconds_bucket{{{labels},le="1"}} 2' in text
+    assert f'newspaper_fetch_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f"newspaper_fetch_seconds_count{{{labels}}} 3" in text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics", "downloader.prom")
+        registry.write_textfile(path)
+        with open(path, encoding="utf-8") as f:
+            assert f.read() == text
+    print("[OK] Prometheus 导出")
+
+
+def test_run_summary_since_checkpoint():
+    """JSON 汇总只统计检查点之后的增量，并计算吞吐量"""
+    registry = MetricsRegistry()
+    labels = {"platform": "guangming", "host": "epaper.gmw.cn"}
+    registry.inc("newspaper_fetch_bytes_total", 999, **labels)
+    registry.observe("newspaper_fetch_seconds", 9, **labels)
+    since = registry.checkpoint()
+
+    registry.inc("newspaper_fetch_bytes_total", 1000, **labels)
+    registry.observe("newspaper_fetch_seconds", 0.4, **labels)
+    registry.observe("newspaper_fetch_seconds", 0.6, **labels)
+    registry.inc("newspaper_fetch_errors_total", reason="timeout", **labels)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "last_run.json")
+        registry.write_summary(path, since, success_count=2)
+        with open(path, encoding="utf-8") as f:
+            summary = json.load(f)
+
+    fetch = summary["histograms"]["newspaper_fetch_seconds"][0]
+    assert (fetch["count"], fetch["sum"], fetch["p50"]) == (2, 1.0, 0.5)
+    assert summary["counters"]["newspaper_fetch_bytes_total"][0]["value"] == 1000
+    assert summary["counters"]["newspaper_fetch_errors_total"][0]["labels"]["reason"] == "timeout"
+    assert summary["throughput"][0]["bytes_per_second"] == 1000.0
+    assert summary["success_count"] == 2
+    print("[OK] 运行汇总")
+
+
+if __name__ == "__main__":
+    test_prometheus_textfile()
+    test_run_summary_since_checkpoint()
+    print("[SUCCESS] 性能指标测试完成!")
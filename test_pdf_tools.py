@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试 PDF 合并工具 (离线)
+"""
+
+import io
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
+
+from benchmarks.fixtures import make_page_jpeg, make_rmrb_page
+from src.utils.pdf_writer import ImageProfile
+from src.utils.pdf_tools import merge_images_to_pdf, merge_pdfs, merge_pdfs_sorted, optimize_pdf
+
+
+def _make_image(path: str, mode: str = "RGB", size=(200, 300), fmt: str = "JPEG"):
+    color = 128 if mode == "L" else (200, 30, 30) if mode == "RGB" else None
+    img = Image.new(mode, size, color)
+    img.save(path, fmt)
+
+
+def test_merge_images_jpeg_passthrough():
+    """RGB JPEG 应原样嵌入，按页码排序，不留中间文件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in (2, 1, 3):
+            path = os.path.join(tmp, f"page_{i:02d}.jpg")
+            _make_image(path, size=(100 * i, 300))
+            files.append((i, path))
+        output = os.path.join(tmp, "out.pdf")
+
+        assert merge_images_to_pdf(files, output)
+
+        reader = PdfReader(output)
+        assert len(reader.pages) == 3
+        for page_num, page in enumerate(reader.pages, 1):
+            assert float(page.mediabox.width) == 100 * page_num * 72 / 100.0
+            xobject = page["/Resources"]["/XObject"]["/Im0"].get_object()
+            assert xobject["/Filter"] == "/DCTDecode"
+            with open(os.path.join(tmp, f"page_{page_num:02d}.jpg"), "rb") as f:
+                assert xobject.get_data() == f.read()
+
+        assert sorted(os.listdir(tmp)) == ["out.pdf", "page_01.jpg", "page_02.jpg", "page_03.jpg"]
+    print("[OK] JPEG 直接嵌入")
+
+
+def test_merge_images_converts_other_formats():
+    """非 RGB/灰度 JPEG 的图片解码转换后嵌入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        gray = os.path.join(tmp, "page_01.jpg")
+        _make_image(gray, mode="L")
+        png = os.path.join(tmp, "page_02.jpg")
+        _make_image(png, mode="RGBA", fmt="PNG")
+        output = os.path.join(tmp, "out.pdf")
+
+        assert merge_images_to_pdf([(1, gray), (2, png), (3, os.path.join(tmp, "missing.jpg"))], output)
+
+        reader = PdfReader(output)
+        assert len(reader.pages) == 2
+        first = reader.pages[0]["/Resources"]["/XObject"]["/Im0"].get_object()
+        second = reader.pages[1]["/Resources"]["/XObject"]["/Im0"].get_object()
+        assert first["/ColorSpace"] == "/DeviceGray"
+        assert second["/ColorSpace"] == "/DeviceRGB"
+        assert Image.open(io.BytesIO(second.get_data())).format == "JPEG"
+    print("[OK] 其他格式转换")
+
+
+def test_merge_images_process_pool_keeps_page_order():
+    """进程池转换的页面 (CMYK、超尺寸) 按页码顺序与直接嵌入的页面交错写入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(1, 7):
+            path = os.path.join(tmp, f"page_{i:02d}.jpg")
+            if i % 2:
+                _make_image(path, mode="CMYK", size=(100 + i, 150))
+            else:
+                _make_image(path, size=(100 + i, 150))
+            files.append((i, path))
+        big = os.path.join(tmp, "page_07.jpg")
+        _make_image(big, size=(800, 400))
+        files.append((7, big))
+        output = os.path.join(tmp, "out.pdf")
+
+        assert merge_images_to_pdf(files, output, workers=2, max_side=400)
+
+        reader = PdfReader(output)
+        assert len(reader.pages) == 7
+        for page_num, page in enumerate(reader.pages[:6], 1):
+            xobject = page["/Resources"]["/XObject"]["/Im0"].get_object()
+            assert xobject["/Width"] == 100 + page_num
+            assert xobject["/ColorSpace"] == "/DeviceRGB"
+        last = reader.pages[6]["/Resources"]["/XObject"]["/Im0"].get_object()
+        assert (last["/Width"], last["/Height"]) == (400, 200)
+    print("[OK] 进程池转换")
+
+
+def test_merge_images_mobile_profile():
+    """移动设备配置缩小并重新压缩版面，页面宽度为 page_width_mm，与存档版相同"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in (1, 2):
+            path = os.path.join(tmp, f"page_{i:02d}.jpg")
+            with open(path, "wb") as f:
+                f.write(make_page_jpeg(i, size=(3000, 4200), quality=92))
+            files.append((i, path))
+        archive = os.path.join(tmp, "archive.pdf")
+        mobile = os.path.join(tmp, "mobile.pdf")
+        profile = ImageProfile(name="mobile", dpi=96, quality=60, page_width_mm=330)
+
+        merge_images_to_pdf(files, archive, profile=ImageProfile())
+        merge_images_to_pdf(files, mobile, workers=2, profile=profile)
+
+        archive_page = PdfReader(archive).pages[0]
+        mobile_page = PdfReader(mobile).pages[0]
+        assert mobile_page.mediabox == archive_page.mediabox
+        assert round(float(mobile_page.mediabox.width) * 25.4 / 72, 1) == 330.0
+        assert round(float(mobile_page.mediabox.height) * 25.4 / 72, 1) == 462.0
+        image = mobile_page["/Resources"]["/XObject"]["/Im0"].get_object()
+        assert image["/Width"] == profile.max_width
+        assert os.path.getsize(mobile) * 2 < os.path.getsize(archive)
+    print("[OK] 图片质量配置")
+
+
+def _write_rmrb_pages(tmp: str, count: int) -> list:
+    files = []
+    for i in range(1, count + 1):
+        path = os.path.join(tmp, f"page_{i:02d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_rmrb_page(i, font_program=b"font" * 1000))
+        files.append((i, path))
+    return files
+
+
+def test_merge_pdfs_streaming():
+    """流式合并保持页序、文字和从父节点继承的资源"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _write_rmrb_pages(tmp, 3)
+        output = os.path.join(tmp, "out.pdf")
+
+        assert merge_pdfs_sorted(list(reversed(files)), output, streaming=True)
+
+        reader = PdfReader(output)
+        assert len(reader.pages) == 3
+        for page_num, page in enumerate(reader.pages, 1):
+            assert f"page {page_num}" in page.extract_text()
+            assert float(page.mediabox.height) == 1191
+            font = page["/Resources"]["/Font"]["/F1"]
+            assert font["/FontDescriptor"]["/FontFile2"].get_data() == b"font" * 1000
+        assert not os.path.exists(output + ".part")
+    print("[OK] 流式合并")
+
+
+def test_merge_pdfs_keeps_links_and_outlines():
+    """页内链接指向合并后的页面，书签随页面保留"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "linked.pdf")
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(595, 842)
+        # 第 1 页链接到第 3 页：复制时先于第 3 页本身遇到它
+        writer.add_annotation(0, Link(rect=(50, 50, 200, 80), target_page_index=2))
+        parent = writer.add_outline_item("要闻", 0)
+        writer.add_outline_item("第三版", 2, parent=parent)
+        with open(source, "wb") as f:
+            writer.write(f)
+
+        output = os.path.join(tmp, "out.pdf")
+        assert merge_pdfs([source, source], output, optimize=True)
+
+        reader = PdfReader(output)
+        page_refs = [page.indirect_reference.idnum for page in reader.pages]
+        assert len(page_refs) == 6
+        # 没有因链接多复制出页面或孤立的页面树
+        types = [
+            getattr(reader.get_object(idnum), "get", lambda key: None)("/Type")
+            for idnum in range(1, reader.trailer["/Size"])
+        ]
+        assert types.count("/Page") == 6 and types.count("/Pages") == 1
+        for offset in (0, 3):
+            link = reader.pages[offset]["/Annots"][0].get_object()
+            assert link["/Dest"][0].idnum == page_refs[offset + 2]
+
+        outline = reader.outline
+        assert [item.title for item in outline if not isinstance(item, list)] == ["要闻", "要闻"]
+        assert reader.get_destination_page_number(outline[0]) == 0
+        assert reader.get_destination_page_number(outline[1][0]) == 2
+        assert reader.get_destination_page_number(outline[2]) == 3
+        assert reader.get_destination_page_number(outline[3][0]) == 5
+    print("[OK] 链接与书签")
+
+
+def test_optimize_deduplicates_shared_fonts():
+    """每页重复嵌入的字体只保留一份"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _write_rmrb_pages(tmp, 4)
+        plain = os.path.join(tmp, "plain.pdf")
+        optimized = os.path.join(tmp, "optimized.pdf")
+
+        merge_pdfs([p for _, p in files], plain, streaming=True)
+        assert merge_pdfs([p for _, p in files], optimized, optimize=True)
+
+        reader = PdfReader(optimized)
+        font_files = {
+            page["/Resources"]["/Font"]["/F1"]["/FontDescriptor"].raw_get("/FontFile2").idnum
+            for page in reader.pages
+        }
+        assert len(font_files) == 1
+        assert [f"page {i}" in page.extract_text() for i, page in enumerate(reader.pages, 1)] == [True] * 4
+        assert os.path.getsize(optimized) < os.path.getsize(plain)
+
+        result = optimize_pdf(plain)
+        assert result.duplicates > 0
+        assert result.bytes_saved > 0
+        assert result.bytes_after == os.path.getsize(plain)
+    print("[OK] 输出优化")
+
+
+if __name__ == "__main__":
+    test_merge_images_jpeg_passthrough()
+    test_merge_images_converts_other_formats()
+    test_merge_images_process_pool_keeps_page_order()
+    test_merge_images_mobile_profile()
+    test_merge_pdfs_streaming()
+    test_merge_pdfs_keeps_links_and_outlines()
+    test_optimize_deduplicates_shared_fonts()
+    print("[SUCCESS] PDF 工具测试完成!")
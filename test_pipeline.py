@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试单期下载流程 (离线，使用内置的假 HTTP 适配器)
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from requests.adapters import BaseAdapter
+from pypdf import PdfReader
+
+from benchmarks.fake_server import FakeNewspaperServer
+from benchmarks.fixtures import make_page_jpeg, make_rmrb_page
+from src.config import config
+from src.downloaders import get_downloader
+from src.downloaders.base import PlatformDownloaderBase, EditionInfo
+from src.pipeline import EditionPipeline
+from src.utils.metrics import metrics
+from src.utils.profiling import tracer
+from src.utils import StorageManager
+from src.utils import process_pool
+
+
+class StubAdapter(BaseAdapter):
+    """按 URL 返回固定内容的 requests 适配器"""
+
+    def __init__(self, bodies: dict):
+        super().__init__()
+        self.bodies = bodies
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        body = self.bodies.get(request.url)
+        response.status_code = 200 if body is not None else 404
+        response.raw = io.BytesIO(body or b"")
+        response.headers["content-length"] = str(len(body or b""))
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class StubDownloader(PlatformDownloaderBase):
+    def __init__(self, platform_id: str, page_urls: list, bodies: dict):
+        super().__init__(config)
+        self._platform_id = platform_id
+        self._page_urls = page_urls
+        self._session.mount("http://stub/", StubAdapter(bodies))
+
+    def get_platform_name(self) -> str:
+        return self._platform_id
+
+    def get_platform_id(self) -> str:
+        return self._platform_id
+
+    def get_latest_edition(self, date: str = None):
+        return EditionInfo(url="", filename="stub.pdf", date=date, page_urls=self._page_urls)
+
+
+def _rmrb_downloader(pages: int) -> StubDownloader:
+    bodies = {f"http://stub/{i}.pdf": make_rmrb_page(i, font_program=b"x" * 4096) for i in range(1, pages + 1)}
+    return StubDownloader("rmrb", list(bodies), bodies)
+
+
+def test_pipeline_merges_from_memory():
+    """版面在内存中合并，不创建 temp 目录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        logs = []
+        pipeline = EditionPipeline("rmrb", storage, log=lambda level, msg: logs.append((level, msg)))
+        since = metrics.checkpoint()
+
+        success, output_path = pipeline.run(_rmrb_downloader(3), "2026-09-01")
+
+        assert success, logs
+        assert len(PdfReader(output_path).pages) == 3
+        assert os.listdir(os.path.dirname(output_path)) == [os.path.basename(output_path)]
+
+        summary = metrics.summary(since)
+        fetch = summary["histograms"]["newspaper_fetch_seconds"][0]
+        assert fetch["labels"] == {"platform": "rmrb", "host": "stub"} and fetch["count"] == 3
+        assert summary["histograms"]["newspaper_merge_seconds"][0]["count"] == 1
+        assert summary["counters"]["newspaper_editions_total"][0]["labels"]["result"] == "success"
+    print("[OK] 内存合并")
+
+
+def test_pipeline_spills_to_scratch_dir():
+    """超过内存上限时写入 scratch_dir，完成后清理"""
+    merge_config = config._config["merge"]
+    saved = dict(merge_config)
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch = os.path.join(tmp, "scratch")
+        merge_config.update({"memory_limit_mb": 0, "scratch_dir": scratch})
+        try:
+            storage = StorageManager(os.path.join(tmp, "archive"))
+            bodies = {f"http://stub/{i}.jpg": make_page_jpeg(i, size=(300, 400)) for i in (1, 2)}
+            downloader = StubDownloader("guangming", list(bodies), bodies)
+
+            success, output_path = EditionPipeline("guangming", storage).run(downloader, "2026-09-01")
+        finally:
+            merge_config.clear()
+            merge_config.update(saved)
+
+        assert success
+        assert len(PdfReader(output_path).pages) == 2
+        assert os.listdir(scratch) == []
+    print("[OK] 溢出到磁盘")
+
+
+def test_pipeline_spill_dirs_are_private():
+    """未配置 scratch_dir 时每次运行在输出目录下单独建临时目录，完成后删除"""
+    merge_config = config._config["merge"]
+    saved = dict(merge_config)
+    with tempfile.TemporaryDirectory() as tmp:
+        merge_config.update({"memory_limit_mb": 0, "scratch_dir": ""})
+        try:
+            storage = StorageManager(tmp)
+            pipeline = EditionPipeline("guangming", storage)
+            first, second = pipeline._spill_dir("2026-09-01"), pipeline._spill_dir("2026-09-01")
+            assert first != second
+            assert os.path.dirname(first) == os.path.dirname(second)
+            os.rmdir(first)
+            os.rmdir(second)
+
+            bodies = {f"http://stub/{i}.jpg": make_page_jpeg(i, size=(300, 400)) for i in (1, 2)}
+            downloader = StubDownloader("guangming", list(bodies), bodies)
+            success, output_path = pipeline.run(downloader, "2026-09-01")
+        finally:
+            merge_config.clear()
+            merge_config.update(saved)
+
+        assert success
+        assert [name for name in os.listdir(os.path.dirname(output_path)) if name.startswith("temp")] == []
+    print("[OK] 独立的溢出目录")
+
+
+def test_pipeline_process_execution():
+    """进程池模式：解析和合并在子进程中进行，结果与线程模式相同"""
+    execution = config._config.setdefault("execution", {})
+    saved = dict(execution)
+    with tempfile.TemporaryDirectory() as tmp, FakeNewspaperServer(pages=3, image_size=(200, 280)):
+        storage = StorageManager(tmp)
+        try:
+            for platform_id in ("guangming", "xinhua_daily", "rmrb"):
+                downloader = get_downloader(platform_id, config)
+                try:
+                    execution.update({"mode": "thread"})
+                    expected = downloader.fetch_edition("2026-09-01").page_urls
+                    execution.update({"mode": "process", "workers": 2})
+                    assert downloader.fetch_edition("2026-09-01").page_urls == expected, platform_id
+
+                    success, output_path = EditionPipeline(platform_id, storage, verbose=False).run(
+                        downloader, "2026-09-01")
+                finally:
+                    downloader.close()
+                assert success, platform_id
+                assert len(PdfReader(output_path).pages) == 3, platform_id
+            assert process_pool._pools
+        finally:
+            execution.clear()
+            execution.update(saved)
+            process_pool.shutdown_process_pool()
+    print("[OK] 进程池解析与合并")
+
+
+def test_process_pool_sizes_coexist():
+    """请求不同进程数时不关闭正在使用的进程池"""
+    try:
+        small = process_pool.get_process_pool(1)
+        pending = small.submit(abs, -1)
+        large = process_pool.get_process_pool(2)
+        assert large is not small
+        assert process_pool.get_process_pool(1) is small
+        assert small.submit(abs, -2).result() == 2
+        assert pending.result() == 1 and large.submit(abs, -3).result() == 3
+    finally:
+        process_pool.shutdown_process_pool()
+    assert not process_pool._pools
+    print("[OK] 进程池并存")
+
+
+def test_pipeline_profiling_trace():
+    """剖析模式记录每期、每版的区间，对抽样的一期收集 cProfile；无效版面在校验时跳过"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        downloader = _rmrb_downloader(2)
+        downloader._page_urls.append("http://stub/error.pdf")
+        downloader._session.adapters["http://stub/"].bodies["http://stub/error.pdf"] = b"<html>404</html>"
+        logs = []
+
+        tracer.start(cprofile=True, tracemalloc_enabled=True)
+        try:
+            success, output_path = EditionPipeline(
+                "rmrb", storage, log=lambda level, msg: logs.append((level, msg))
+            ).run(downloader, "2026-09-01")
+        finally:
+            paths = tracer.stop(os.path.join(tmp, "trace.json"))
+
+        assert success
+        assert len(PdfReader(output_path).pages) == 2
+        assert ("WARNING", "第 3 版数据无效，已跳过") in logs
+
+        with open(paths[0], encoding="utf-8") as f:
+            trace = json.load(f)
+        names = [event["name"] for event in trace["traceEvents"]]
+        for name in ("edition", "discovery", "fetch", "verify", "merge", "http"):
+            assert name in names, name
+        assert names.count("fetch") == 3
+        assert all(event["ph"] == "X" and event["dur"] >= 0 for event in trace["traceEvents"])
+        assert trace["metadata"]["sample"]["tracemalloc"]["peak_bytes"] > 0
+        assert paths[1].endswith(".pstats") and os.path.getsize(paths[1]) > 0
+        assert not tracer.enabled
+    print("[OK] 性能剖析")
+
+
+if __name__ == "__main__":
+    test_pipeline_merges_from_memory()
+    test_pipeline_spills_to_scratch_dir()
+    test_pipeline_spill_dirs_are_private()
+    test_pipeline_process_execution()
+    test_process_pool_sizes_coexist()
+    test_pipeline_profiling_trace()
+    print("[SUCCESS] 下载流程测试完成!")
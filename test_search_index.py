@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试全文检索索引 (离线)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.fixtures import make_rmrb_page
+from src.cli import main as cli_main
+from src.utils import SearchIndex, StorageManager, merge_pdfs
+from src.utils import search_index
+
+
+def _write_edition(storage: StorageManager, newspaper: str, date: str, texts: list) -> str:
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i, text in enumerate(texts, 1):
+            path = os.path.join(tmp, f"page_{i:02d}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_rmrb_page(i, text=text))
+            files.append(path)
+        output_path = storage.build_output_path(newspaper, date)
+        assert merge_pdfs(files, output_path, streaming=True)
+    return output_path
+
+
+def test_search_index_incremental():
+    """按报纸/日期/版面检索，已索引的文件不重复处理"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        _write_edition(storage, "人民日报", "2026-09-01", ["rural revitalization plan", "sports news"])
+        _write_edition(storage, "学习时报", "2026-09-02", ["theory study", "rural revitalization review"])
+
+        index = SearchIndex.for_storage(storage)
+        try:
+            assert index.index_archive(storage) == 2
+            assert index.index_archive(storage) == 0
+
+            hits = index.search("revitalization rural")
+            assert {(hit.newspaper, hit.date, hit.page) for hit in hits} == {
+                ("人民日报", "20260901", 1), ("学习时报", "20260902", 2)
+            }
+            assert "[" in hits[0].snippet
+
+            assert [hit.date for hit in index.search("revitalization", newspaper="学习时报")] == ["20260902"]
+            assert [hit.page for hit in index.search("rural", date_to="2026-09-01")] == [1]
+            assert [hit.page for hit in index.search("ts")] == [2]
+            assert index.search("nothing here") == []
+
+            path = _write_edition(storage, "人民日报", "2026-09-03", ["weather"])
+            assert index.add_edition("人民日报", "2026-09-03", path) == 1
+            os.remove(path)
+            assert index.remove_missing() == 1
+            assert index.stats() == {"editions": 2, "pages": 4}
+        finally:
+            index.close()
+    print("[OK] 全文检索")
+
+
+def test_short_chinese_terms_use_index():
+    """一两个字的中文词走 grams 索引；旧版 unicode61 索引也能检索中文子串"""
+    pages = {
+        "a.pdf": ["推进经济高质量发展", "两会召开"],
+        "b.pdf": ["深化改革开放", "经济日报评论"],
+    }
+    original = search_index.extract_page_texts
+    search_index.extract_page_texts = lambda path: pages[os.path.basename(path)]
+    try:
+        for tokenizer in ("trigram", "unicode61"):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "index.db")
+                if tokenizer == "unicode61":
+                    # 模拟旧版 SQLite 建立的索引
+                    conn = sqlite3.connect(db_path)
+                    conn.executescript(search_index.SCHEMA)
+                    conn.execute(search_index.FTS_SCHEMA.format(tokenizer="unicode61"))
+                    conn.close()
+                for name in pages:
+                    open(os.path.join(tmp, name), "wb").close()
+                index = SearchIndex(db_path)
+                try:
+                    index.add_edition("人民日报", "2026-09-01", os.path.join(tmp, "a.pdf"))
+                    index.add_edition("经济日报", "2026-09-02", os.path.join(tmp, "b.pdf"))
+
+                    found = lambda query, **kw: [(h.newspaper, h.page) for h in index.search(query, **kw)]
+                    assert found("经济") == [("经济日报", 2), ("人民日报", 1)]
+                    assert found("经济", newspaper="人民日报") == [("人民日报", 1)]
+                    assert found("两会") == [("人民日报", 2)]
+                    assert found("改") == [("经济日报", 1)]
+                    assert found("经发") == []
+                    assert found("高质量 经济") == [("人民日报", 1)]
+                    assert found("济高质") == [("人民日报", 1)]
+                    assert found("经济", date_from="2026-09-02") == [("经济日报", 2)]
+                    assert index.search("两会")[0].snippet == "[两会]召开"
+
+                    os.remove(os.path.join(tmp, "a.pdf"))
+                    assert index.remove_missing() == 1
+                    assert found("经济") == [("经济日报", 2)]
+                finally:
+                    index.close()
+    finally:
+        search_index.extract_page_texts = original
+    print("[OK] 中文短词检索")
+
+
+def test_cli_index_and_search(capsys=None):
+    """命令行 index / search"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_edition(StorageManager(tmp), "人民日报", "2026-09-01", ["harvest festival"])
+        assert cli_main(["-o", tmp, "index"]) == 0
+        assert cli_main(["-o", tmp, "search", "harvest"]) == 0
+        if capsys is not None:
+            output = capsys.readouterr().out
+            assert "人民日报 20260901 第1版" in output
+    print("[OK] 命令行检索")
+
+
+if __name__ == "__main__":
+    test_search_index_incremental()
+    test_short_chinese_terms_use_index()
+    test_cli_index_and_search()
+    print("[SUCCESS] 全文检索测试完成!")
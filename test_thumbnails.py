@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试缩略图缓存 (离线)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from benchmarks.fixtures import make_page_jpeg
+from src.utils import StorageManager, ThumbnailCache, merge_images_to_pdf
+
+
+def _write_image_edition(storage: StorageManager, date: str, pages: int = 2) -> tuple:
+    sources = [(i, make_page_jpeg(i, size=(600, 850))) for i in range(1, pages + 1)]
+    output_path = storage.build_output_path("光明日报", date)
+    assert merge_images_to_pdf(sources, output_path)
+    return output_path, sources
+
+
+def test_thumbnails_from_pages_and_pdf():
+    """图片版直接用版面生成；从 PDF 生成时取嵌入的版面图片"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        cache = ThumbnailCache.for_storage(storage, size=100, preview_size=300)
+        path, sources = _write_image_edition(storage, "2026-09-01")
+
+        thumbnails = cache.generate_from_pages(path, sources)
+        assert len(thumbnails.pages) == 2
+        assert max(Image.open(thumbnails.pages[1]).size) == 100
+        assert max(Image.open(thumbnails.preview).size) == 300
+
+        os.remove(os.path.join(cache.edition_dir(path), "meta.json"))
+        assert cache.get(path) is None
+        thumbnails = cache.generate(path)
+        assert max(Image.open(thumbnails.pages[0]).size) == 100
+    print("[OK] 缩略图生成")
+
+
+def test_thumbnails_backfill_and_eviction():
+    """并行补全缺少的缩略图，超过上限时淘汰最久未访问的"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        paths = [_write_image_edition(storage, f"2026-09-0{day}")[0] for day in (1, 2, 3)]
+        cache = ThumbnailCache.for_storage(storage, size=100, preview_size=300)
+
+        assert cache.backfill(storage, workers=2) == 3
+        assert cache.missing(storage) == []
+
+        for i, path in enumerate(paths):
+            os.utime(cache.edition_dir(path), (1000 + i, 1000 + i))
+        cache.get(paths[0])
+        edition_size = sum(
+            os.path.getsize(os.path.join(cache.edition_dir(paths[0]), name))
+            for name in os.listdir(cache.edition_dir(paths[0]))
+        )
+        cache.max_bytes = edition_size * 2 + edition_size // 2
+        assert cache.evict() == 1
+        assert cache.get(paths[1]) is None
+        assert cache.get(paths[0]) is not None and cache.get(paths[2]) is not None
+    print("[OK] 并行补全与淘汰")
+
+
+if __name__ == "__main__":
+    test_thumbnails_from_pages_and_pdf()
+    test_thumbnails_backfill_and_eviction()
+    print("[SUCCESS] 缩略图测试完成!")
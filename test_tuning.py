@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试按平台的下载配置和并发自动调整
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import config
+from src.downloaders import get_downloader
+from src.downloaders.tuning import DownloadProfile, HostController, TuningRegistry
+
+
+def test_platform_profiles():
+    """报纸的 download 配置覆盖全局默认值"""
+    profile = get_downloader("xinhua_daily", config).profile
+    assert profile.timeout == 30 and profile.max_retries == 4
+    assert profile.chunk_size == config.chunk_size
+    assert get_downloader("rmrb", config).profile.concurrency == 4
+    print("[OK] 平台下载配置")
+
+
+def test_aimd_adjustment():
+    """无错误时每个窗口加 1，失败率超过阈值时减半，响应明显变慢时减小"""
+    controller = HostController("example", DownloadProfile(auto_tune=True, concurrency=2, max_concurrency=6))
+    for _ in range(2 + 3 + 4 + 5 + 6):
+        controller.record(0.1, True)
+    assert controller.limit == 6
+
+    for _ in range(6):
+        controller.record(0.1, False)
+    assert controller.limit == 3
+
+    for _ in range(3):
+        controller.record(1.0, True)
+    assert controller.limit == 2
+    print("[OK] AIMD 调整")
+
+
+def test_limit_and_persistence():
+    """并发不超过上限；调整结果保存后下次读取"""
+    controller = HostController("example", DownloadProfile(concurrency=2))
+    active = []
+    peak = []
+
+    def work():
+        with controller.slot():
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.02)
+            active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, ".download_tuning.json")
+        profile = DownloadProfile(auto_tune=True, concurrency=1)
+        registry = TuningRegistry()
+        registry.attach(path)
+        tuned = registry.controller("example", profile)
+        for _ in range(1 + 2):
+            tuned.record(0.1, True)
+        assert tuned.limit == 3
+        registry.save()
+
+        reloaded = TuningRegistry()
+        reloaded.attach(path)
+        assert reloaded.controller("example", profile).limit == 3
+    print("[OK] 并发上限与保存")
+
+
+if __name__ == "__main__":
+    test_platform_profiles()
+    test_aimd_adjustment()
+    test_limit_and_persistence()
+    print("\n全部测试通过")
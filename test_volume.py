@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+测试合订本生成与增量更新 (离线)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pypdf import PdfReader, PdfWriter
+
+from benchmarks.fixtures import make_rmrb_page
+from src.utils import StorageManager, VolumeBuilder, merge_pdfs
+
+
+def _write_edition(storage: StorageManager, newspaper: str, date: str, pages: int = 2):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(1, pages + 1):
+            path = os.path.join(tmp, f"page_{i:02d}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_rmrb_page(i, text=f"{date} page {i}", font_program=b"font" * 500))
+            files.append(path)
+        assert merge_pdfs(files, storage.build_output_path(newspaper, date), streaming=True)
+
+
+def _outline_titles(path: str) -> list:
+    return [item.title for item in PdfReader(path).outline]
+
+
+def test_volume_appends_incrementally():
+    """新日期以增量更新追加，原有内容不变；补下载的早期日期按日期排序"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        builder = VolumeBuilder(storage, "人民日报")
+        _write_edition(storage, "人民日报", "2026-09-01")
+        _write_edition(storage, "人民日报", "2026-09-03")
+        _write_edition(storage, "人民日报", "2026-10-01")
+
+        assert builder.pending() == {"202609": ["20260901", "20260903"], "202610": ["20261001"]}
+        result = builder.update("202609")
+        assert result.rebuilt and result.added == ["20260901", "20260903"]
+        with open(result.path, "rb") as f:
+            original = f.read()
+
+        _write_edition(storage, "人民日报", "2026-09-02", pages=3)
+        result = builder.update("202609")
+        assert not result.rebuilt and result.added == ["20260902"]
+        with open(result.path, "rb") as f:
+            assert f.read(len(original)) == original
+
+        reader = PdfReader(result.path)
+        assert len(reader.pages) == 7
+        assert "2026-09-02 page 3" in reader.pages[4].extract_text()
+        assert _outline_titles(result.path) == ["2026-09-01", "2026-09-02", "2026-09-03"]
+        assert reader.get_destination_page_number(reader.outline[1]) == 2
+        assert builder.included_days("202609") == ["20260901", "20260902", "20260903"]
+        assert builder.update("202609").added == []
+    print("[OK] 增量追加")
+
+
+def test_volume_recovers_from_interrupted_append():
+    """追加中断留下的多余数据会被截掉；日报文件变化时整本重建"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        builder = VolumeBuilder(storage, "人民日报", period="year")
+        _write_edition(storage, "人民日报", "2026-09-01")
+        path = builder.update("2026").path
+
+        with open(path, "ab") as f:
+            f.write(b"garbage")
+        _write_edition(storage, "人民日报", "2026-09-02")
+        result = builder.update("2026")
+        assert not result.rebuilt
+        assert len(PdfReader(path).pages) == 4
+
+        os.remove(storage.build_output_path("人民日报", "2026-09-01"))
+        _write_edition(storage, "人民日报", "2026-09-01", pages=1)
+        result = builder.update("2026")
+        assert result.rebuilt
+        assert len(PdfReader(path).pages) == 3
+        assert _outline_titles(path) == ["2026-09-01", "2026-09-02"]
+    print("[OK] 中断恢复")
+
+
+def test_volume_survives_interrupted_rebuild():
+    """整本重建后未保存记录就中断：旧记录不会截断新文件；没有页面的日报不占用对象编号"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(tmp)
+        builder = VolumeBuilder(storage, "人民日报")
+        _write_edition(storage, "人民日报", "2026-09-01", pages=1)
+        path = builder.update("202609").path
+        state_path = builder.state_path("202609")
+        shutil.copy(state_path, state_path + ".old")
+
+        # 合订本丢失后重建 (同时收录新的日期)，然后换回旧记录，模拟保存记录前中断
+        os.remove(path)
+        _write_edition(storage, "人民日报", "2026-09-03")
+        assert builder.update("202609").rebuilt
+        os.replace(state_path + ".old", state_path)
+
+        empty = storage.build_output_path("人民日报", "2026-09-02")
+        with open(empty, "wb") as f:
+            PdfWriter().write(f)
+        result = builder.update("202609")
+        assert result.rebuilt and result.added == ["20260901", "20260902", "20260903"]
+
+        reader = PdfReader(path)
+        assert len(reader.pages) == 3
+        assert _outline_titles(path) == ["2026-09-01", "2026-09-03"]
+        assert builder.included_days("202609") == ["20260901", "20260903"]
+        # 交叉引用表覆盖 1 .. /Size-1 的全部编号
+        assert all(reader.get_object(idnum) is not None for idnum in range(1, reader.trailer["/Size"]))
+    print("[OK] 重建中断恢复")
+
+
+if __name__ == "__main__":
+    test_volume_appends_incrementally()
+    test_volume_recovers_from_interrupted_append()
+    test_volume_survives_interrupted_rebuild()
+    print("[SUCCESS] 合订本测试完成!")